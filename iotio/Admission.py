@@ -0,0 +1,149 @@
+# default
+import collections
+import math
+import random
+import time
+from typing import Dict, Union
+
+# external
+from eventlet.semaphore import Semaphore
+
+# internal
+from .RateLimit import RateLimit, TokenBucket
+
+
+# key of the environ entry marking a connection which holds a handshake slot
+ADMISSION_TICKET = "iotio.admission"
+
+
+class AdmissionControl:
+    def __init__(self, max_handshakes: int = 0, max_queue: int = 0, queue_timeout: float = 5,
+                 ip_rate_limit: RateLimit = None, type_rate_limit: RateLimit = None, retry_after: float = 1,
+                 jitter: float = 1, max_tracked: int = 10000):
+        """
+        Decides which connection attempts are let through to the handshake, used to survive reconnect storms. Attempts
+        which are refused are answered with a 503 and a Retry-After header before the websocket is upgraded, the
+        retry after is jittered so that refused clients spread their retries out.
+
+        :param max_handshakes: Maximum number of handshakes in progress at once, 0 for no limit.
+        :param max_queue: Maximum number of connections waiting for a handshake slot, connections over it are refused.
+        :param queue_timeout: Seconds a connection waits for a handshake slot before it is refused.
+        :param ip_rate_limit: Connection attempts allowed per remote address, RateLimit.messages is the number of
+                              connections per second.
+        :param type_rate_limit: Connection attempts allowed per device type, RateLimit.messages is the number of
+                                connections per second.
+        :param retry_after: Minimum number of seconds a refused client is told to wait.
+        :param jitter: The retry after is multiplied by a random factor between 1 and 1 + jitter.
+        :param max_tracked: Maximum number of addresses and types whose rate limit buckets are kept, the least recently
+                            seen are forgotten first.
+        """
+        self.max_handshakes = max_handshakes
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.ip_rate_limit = ip_rate_limit
+        self.type_rate_limit = type_rate_limit
+        self.retry_after = retry_after
+        self.jitter = jitter
+        self.max_tracked = max_tracked
+
+        # number of connection attempts refused so far
+        self.rejected = 0
+
+        self.__semaphore = Semaphore(max_handshakes) if max_handshakes else None
+        self.__waiting = 0
+
+        # rate limit buckets keyed by remote address and by device type
+        self.__ip_buckets: Dict[str, TokenBucket] = collections.OrderedDict()
+        self.__type_buckets: Dict[str, TokenBucket] = collections.OrderedDict()
+
+    @property
+    def active(self) -> int:
+        """
+        Number of handshakes in progress.
+        """
+        return self.max_handshakes - self.__semaphore.counter if self.__semaphore is not None else 0
+
+    @property
+    def waiting(self) -> int:
+        """
+        Number of connections waiting for a handshake slot.
+        """
+        return self.__waiting
+
+    def admit(self, environ: dict) -> Union[int, None]:
+        """
+        Decide if a connection attempt is let through, waits for a handshake slot if none is free.
+
+        :param environ: WSGI environ of the connection attempt.
+        :return: None if the connection is admitted, otherwise the seconds the client should wait before retrying.
+        """
+        now = time.monotonic()
+
+        wait = max(self.__consume(self.__ip_buckets, self.ip_rate_limit, environ.get("REMOTE_ADDR", ""), now),
+                   self.__consume(self.__type_buckets, self.type_rate_limit, environ.get("HTTP_IOT_IO_TYPE", ""), now))
+
+        if wait:
+            return self.reject(wait)
+
+        if self.__semaphore is None:
+            return None
+
+        # wait in the queue if every handshake slot is taken
+        if not self.__semaphore.acquire(blocking=False):
+            if self.__waiting >= self.max_queue:
+                return self.reject()
+
+            self.__waiting += 1
+
+            try:
+                acquired = self.__semaphore.acquire(timeout=self.queue_timeout)
+            finally:
+                self.__waiting -= 1
+
+            if not acquired:
+                return self.reject()
+
+        environ[ADMISSION_TICKET] = True
+
+        return None
+
+    def release(self, environ: dict):
+        """
+        Give up the handshake slot held by a connection, once its handshake completed or failed. Releasing more than
+        once has no effect.
+
+        :param environ: WSGI environ of the connection.
+        :return:
+        """
+        if environ.pop(ADMISSION_TICKET, False):
+            self.__semaphore.release()
+
+    def __consume(self, buckets: Dict[str, TokenBucket], limit: Union[RateLimit, None], key: str, now: float) \
+            -> float:
+        if limit is None or not limit.messages:
+            return 0.0
+
+        bucket = buckets.get(key, None)
+
+        if bucket is None:
+            bucket = buckets[key] = limit.buckets()[0]
+            bucket.stamp = now
+
+            # forget the least recently seen key, its bucket has most likely refilled anyway
+            if len(buckets) > self.max_tracked:
+                buckets.popitem(last=False)
+        else:
+            buckets.move_to_end(key)
+
+        return bucket.consume(1, now, False)
+
+    def reject(self, wait: float = 0) -> int:
+        """
+        Count a refused connection attempt.
+
+        :param wait: Seconds until the client could be admitted, if known.
+        :return: The jittered seconds the client should wait before retrying.
+        """
+        self.rejected += 1
+
+        return math.ceil(max(wait, self.retry_after) * random.uniform(1, 1 + self.jitter))
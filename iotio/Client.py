@@ -1,14 +1,17 @@
 # default
-from typing import TYPE_CHECKING, Tuple, Union
+from typing import TYPE_CHECKING, Tuple, Union, Mapping, List, Hashable
 if TYPE_CHECKING:
     from .Manager import IoTManager
 import logging
+import time
 
 # external
 from eventlet.websocket import WebSocket
 
 # internal
 from .PacketEncoder import AbstractPacketEncoder, DefaultPacketEncoder
+from .Control import Priority
+from .Lanes import Outbox
 from .types import sendable
 from .Endpoint import EndpointManager, EndpointParseResponse, ValidationResponse, AbstractEndpointValidator
 
@@ -53,6 +56,12 @@ class IoTClient:
         # endpoint validation manager
         self.__endpoint_manager = EndpointManager()
 
+        # time (as returned by time.monotonic()) the client last sent anything to the server
+        self.last_activity = time.monotonic()
+
+        # frames waiting for the connection while another frame is being written
+        self.outbox = Outbox()
+
     # properties for id, type, and data
     @property
     def id(self):
@@ -80,23 +89,114 @@ class IoTClient:
     def parse_endpoints(self, endpoints) -> Tuple[str, EndpointParseResponse]:
         return self.__endpoint_manager.parse(endpoints)
 
-    def emit(self, event: str, data: sendable):
+    def update_endpoints(self, add: List[dict] = None, remove: List[str] = None,
+                         replace: List[dict] = None) -> Tuple[str, EndpointParseResponse]:
+        return self.__endpoint_manager.update(add, remove, replace)
+
+    def load_endpoints(self, endpoints: Mapping[str, AbstractEndpointValidator]):
+        self.__endpoint_manager.load(endpoints)
+
+    @property
+    def endpoints(self) -> Mapping[str, AbstractEndpointValidator]:
+        return self.__endpoint_manager.endpoints
+
+    def emit(self, event: str, data: sendable, priority: Priority = Priority.NORMAL, conflate: bool = False,
+             key: str = None):
         """
         Emit function for sending data to the client.
 
         :param event: The client side event to send the data to.
         :param data: The data to be sent to the client(s).
+        :param priority: Priority class of the data, low priority data is shed while the server is overloaded.
+        :param conflate: If True the data replaces data with the same key which is still waiting to be written, so a
+                         slow client only receives the latest value.
+        :param key: Conflation key, defaults to the event.
         :return:
         """
         if not isinstance(event, str):
             raise TypeError("'event' must be of type str")
 
-        if not self.socket.websocket_closed:
+        if not self.socket.websocket_closed and self.manager.overload.admits(priority):
             self.logger.debug("Sending a message for event '", event, "' with type: '", type(data), "'")
 
-            self.socket.send(self.encoder.encode(event, data))
+            self.send(self.encoder.encode(event, data), event, data, priority,
+                      (key if key is not None else event) if conflate else None)
+
+    def send(self, frame: bytes, event: str, data: sendable, priority: Priority = Priority.NORMAL,
+             key: Hashable = None):
+        """
+        Send an already encoded frame to the client, used by the IoTManager so a frame only has to be encoded once
+        when it is being sent to many clients.
+
+        :param frame: The packet as encoded by this client's encoder.
+        :param event: The client side event the frame was encoded for.
+        :param data: The data contained in the frame.
+        :param priority: Priority class of the frame.
+        :param key: Conflation key of the frame, None if it should not be conflated.
+        :return:
+        """
+        if not self.socket.websocket_closed:
+            self.write(frame, priority, key)
             self.manager.log_update(self, event, data)
 
+    def send_batch(self, messages: List[Tuple[str, sendable]], priority: Priority = Priority.NORMAL):
+        """
+        Send several messages to the client in a single frame.
+
+        :param messages: A list of event and data pairs.
+        :param priority: Priority class of the frame.
+        :return:
+        """
+        if not messages or self.socket.websocket_closed:
+            return
+
+        self.write(self.encoder.encode_batch([self.encoder.encode(event, data) for event, data in messages]),
+                   priority)
+
+        for event, data in messages:
+            self.manager.log_update(self, event, data)
+
+    def write(self, frame: bytes, priority: Priority = Priority.NORMAL, key: Hashable = None):
+        """
+        Write a frame to the client's connection. If another frame is being written the frame waits in the outbox
+        and the writer sends it once it is done, more urgent frames first. Waiting frames and frames which are being
+        written are counted as outbound by the manager's OverloadDetector.
+
+        :param frame: The encoded frame.
+        :param priority: Priority class of the frame.
+        :param key: Conflation key, replaces a waiting frame with the same key instead of queueing behind it.
+        :return:
+        """
+        overload = self.manager.overload
+
+        if self.outbox.writing:
+            if self.outbox.put(frame, priority, key):
+                overload.outbound += 1
+            return
+
+        overload.outbound += 1
+
+        self.outbox.writing = True
+
+        try:
+            entry = (frame, priority, key)
+
+            while entry is not None:
+                # sub-clients hand the frame to the outbox of their gateway
+                if getattr(self.socket, "routed", False):
+                    self.socket.send(*entry)
+                else:
+                    self.socket.send(entry[0])
+
+                overload.outbound -= 1
+                entry = self.outbox.pop()
+        except BaseException:
+            # the connection failed, nothing waiting for it can be delivered
+            overload.outbound -= 1 + self.outbox.clear()
+            raise
+        finally:
+            self.outbox.writing = False
+
     def join(self, room: str, **kwargs):
         """
         Have the client join the specified room.
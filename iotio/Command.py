@@ -0,0 +1,170 @@
+# default
+import collections
+import enum
+import logging
+import secrets
+import time
+from typing import TYPE_CHECKING, Deque, Dict, Union
+if TYPE_CHECKING:
+    from .Manager import IoTManager
+
+# external
+import eventlet
+
+# internal
+from .Control import Priority
+from .RPC import Call
+from .types import sendable
+
+
+class CommandStatus(enum.Enum):
+    QUEUED = "queued"
+    SENT = "sent"
+    ACKNOWLEDGED = "acknowledged"
+    FAILED = "failed"
+
+
+class Command:
+    __slots__ = ("id", "client_id", "endpoint_id", "data", "ack", "status", "error", "timestamps")
+
+    def __init__(self, command_id: str, client_id: str, endpoint_id: str, data: sendable, ack: bool):
+        """
+        An endpoint command which is sent to a client in the background.
+
+        :param command_id: ID of the command.
+        :param client_id: ID of the client the command is for.
+        :param endpoint_id: ID of the endpoint the data is sent to.
+        :param data: The validated data.
+        :param ack: If True the command is sent as a call and is acknowledged by the client's answer.
+        """
+        self.id = command_id
+        self.client_id = client_id
+        self.endpoint_id = endpoint_id
+        self.data = data
+        self.ack = ack
+
+        self.status = CommandStatus.QUEUED
+        self.error: Union[str, None] = None
+
+        # unix time each status was reached, keyed by status
+        self.timestamps: Dict[str, float] = {CommandStatus.QUEUED.value: time.time()}
+
+    def update(self, status: CommandStatus, error: str = None):
+        self.status = status
+        self.error = error
+        self.timestamps[status.value] = time.time()
+
+    def __dict__(self):
+        return {
+            "id": self.id,
+            "clientId": self.client_id,
+            "endpointId": self.endpoint_id,
+            "status": self.status.value,
+            "error": self.error,
+            "timestamps": self.timestamps
+        }
+
+
+class CommandQueue:
+    def __init__(self, manager: 'IoTManager', ack_timeout: float = 10, max_commands: int = 10000,
+                 logging_level: int = logging.ERROR):
+        """
+        Queue of endpoint commands which are sent to clients by green threads instead of by the request which issued
+        them, the status of each command is kept so it can be looked up later. Each client's commands are sent by a
+        green thread of their own in the order they were queued, so a client which is slow to write to does not hold
+        up the commands of the others.
+
+        :param manager: The IoTManager the commands are sent through.
+        :param ack_timeout: Seconds a client has to acknowledge a command before it fails.
+        :param max_commands: Maximum number of commands whose status is kept, the oldest are forgotten first.
+        :param logging_level: Logging level of the instance, useful for debugging.
+        """
+        self.logger = logging.Logger("iot.io-commands")
+        self.logger.setLevel(logging_level)
+
+        self.manager = manager
+        self.ack_timeout = ack_timeout
+        self.max_commands = max_commands
+
+        # commands waiting to be sent keyed by client id, a queue exists while its green thread is sending it
+        self.__queues: Dict[str, Deque[Command]] = {}
+        self.__commands: Dict[str, Command] = collections.OrderedDict()
+
+    def get(self, command_id: str) -> Union[Command, None]:
+        """
+        Get a command.
+
+        :param command_id: ID of the command.
+        :return: The Command, None if there is no such command or it was forgotten.
+        """
+        return self.__commands.get(command_id, None)
+
+    def put(self, client_id: str, endpoint_id: str, data: sendable, ack: bool = False) -> Command:
+        """
+        Queue a command, the data must already be validated.
+
+        :param client_id: ID of the client the command is for.
+        :param endpoint_id: ID of the endpoint the data is sent to.
+        :param data: The validated data.
+        :param ack: If True the command is sent as a call and is acknowledged by the client's answer.
+        :return: The queued Command.
+        """
+        command = Command(secrets.token_urlsafe(12), client_id, endpoint_id, data, ack)
+
+        self.__commands[command.id] = command
+
+        if len(self.__commands) > self.max_commands:
+            self.__commands.popitem(last=False)
+
+        queue = self.__queues.get(client_id, None)
+
+        if queue is None:
+            queue = self.__queues[client_id] = collections.deque()
+            eventlet.spawn(self.__drain, client_id, queue)
+
+        queue.append(command)
+
+        return command
+
+    def __drain(self, client_id: str, queue: Deque[Command]):
+        try:
+            while queue:
+                self.__send(queue.popleft())
+        finally:
+            del self.__queues[client_id]
+
+    def __send(self, command: Command):
+        client = self.manager.get_client(command.client_id)
+
+        # the frame would be dropped without being written if the connection is closed
+        if client is None or client.socket.websocket_closed:
+            return command.update(CommandStatus.FAILED, "client_not_connected")
+
+        try:
+            if command.ack:
+                call = self.manager.call(command.client_id, command.endpoint_id, command.data, self.ack_timeout,
+                                         Priority.HIGH)
+                call.add_callback(lambda answered, sent=command: self.__answered(sent, answered))
+            else:
+                self.manager.send([client], command.endpoint_id, command.data, Priority.HIGH)
+        except Exception as e:
+            self.logger.error("Error when sending command '" + command.id + "': " + str(e))
+            return command.update(CommandStatus.FAILED, "send_failed")
+
+        # a call can already have failed by the time it returns
+        if command.status == CommandStatus.QUEUED:
+            command.update(CommandStatus.SENT)
+
+            # commands which wait for an answer are recorded once they are acknowledged
+            if not command.ack:
+                self.manager.states.command(command.client_id, command.endpoint_id, command.data)
+
+    def __answered(self, command: Command, call: Call):
+        if command.status == CommandStatus.QUEUED:
+            command.update(CommandStatus.SENT)
+
+        if call.error is not None:
+            command.update(CommandStatus.FAILED, call.error.error)
+        else:
+            command.update(CommandStatus.ACKNOWLEDGED)
+            self.manager.states.command(command.client_id, command.endpoint_id, command.data)
@@ -0,0 +1,53 @@
+import enum
+
+
+# prefix reserved for events used by the iot.io protocol itself, these are never passed to DeviceType handlers
+CONTROL_PREFIX = "$iotio."
+
+
+# enumerator for control events between client and server
+class ControlEvent(enum.Enum):
+    # gateway multiplexing
+    ATTACH = "$iotio.attach"
+    DETACH = "$iotio.detach"
+    ROUTE = "$iotio.route"
+
+    # endpoint declarations
+    ENDPOINTS = "$iotio.endpoints"
+
+    # session resumption
+    SESSION = "$iotio.session"
+
+    # several packets sent in a single frame
+    BATCH = "$iotio.batch"
+
+    # heartbeats
+    PING = "$iotio.ping"
+    PONG = "$iotio.pong"
+
+    # delta encoded state pushes
+    DELTA = "$iotio.delta"
+    ACK = "$iotio.ack"
+    RESYNC = "$iotio.resync"
+
+    # calls answered by the client
+    CALL = "$iotio.call"
+    RESULT = "$iotio.result"
+
+    # endpoint values reported by the client
+    STATE = "$iotio.state"
+
+    # device shadows
+    SHADOW = "$iotio.shadow"
+    REPORT = "$iotio.report"
+
+
+# priority class of a message, lower values are more urgent
+class Priority(enum.IntEnum):
+    # control plane traffic (errors, sessions, heartbeats), never shed
+    CONTROL = 0
+    # commands which should pre-empt everything else
+    HIGH = 1
+    NORMAL = 2
+    # bulk telemetry, the first to be shed when the server is overloaded
+    LOW = 3
@@ -0,0 +1,221 @@
+# default
+import collections
+import copy
+from typing import TYPE_CHECKING, Dict, List, Union
+if TYPE_CHECKING:
+    from .Manager import IoTManager
+
+# internal
+from .Client import IoTClient
+from .Control import ControlEvent, Priority
+from .types import sendable
+
+
+def _contains_null(value) -> bool:
+    return value is None or (isinstance(value, dict) and any(_contains_null(v) for v in value.values()))
+
+
+def merge_diff(old: dict, new: dict) -> Union[dict, None]:
+    """
+    Create a JSON merge patch (RFC 7386) which turns one object into another.
+
+    :param old: The object the patch is applied to.
+    :param new: The object the patch should produce.
+    :return: The patch, or None if the change can not be expressed as a merge patch (a value set to null).
+    """
+    patch = {}
+
+    for key in old:
+        if key not in new:
+            patch[key] = None
+
+    for key, value in new.items():
+        if key in old and isinstance(value, dict) and isinstance(old[key], dict):
+            sub_patch = merge_diff(old[key], value)
+
+            if sub_patch is None:
+                return None
+            elif sub_patch:
+                patch[key] = sub_patch
+        elif key not in old or old[key] != value or type(old[key]) != type(value):
+            # null removes a member, so it can not be used as a value
+            if _contains_null(value):
+                return None
+
+            patch[key] = value
+
+    return patch
+
+
+def merge_patch(target: sendable, patch: sendable) -> sendable:
+    """
+    Apply a JSON merge patch (RFC 7386), the reference implementation of what clients do with a delta.
+
+    :param target: The object being patched, it is not modified.
+    :param patch: The patch.
+    :return: The patched object.
+    """
+    if not isinstance(patch, dict):
+        return patch
+
+    result = dict(target) if isinstance(target, dict) else {}
+
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key, None), value)
+
+    return result
+
+
+class DeltaState:
+    __slots__ = ("seq", "acked_seq", "acked", "latest", "unacked", "since_keyframe")
+
+    def __init__(self):
+        """
+        State of one delta encoded event of one client.
+        """
+        self.seq = 0
+
+        # the last state the client acknowledged, patches are made against it
+        self.acked_seq: Union[int, None] = None
+        self.acked: Union[dict, None] = None
+
+        # the last state sent to the client
+        self.latest: Union[dict, None] = None
+
+        # states which were sent but not acknowledged yet, keyed by sequence number
+        self.unacked: Dict[int, dict] = collections.OrderedDict()
+
+        self.since_keyframe = 0
+
+
+class DeltaTracker:
+    def __init__(self, manager: 'IoTManager', keyframe_interval: int = 20, window: int = 16):
+        """
+        Sends repeated JSON state pushes as merge patches against the last state the client acknowledged. Events are
+        opted in through DeviceType.delta_events.
+
+        Frames are sent on the delta control event as either a keyframe {"event": str, "seq": int, "state": dict} or a
+        patch {"event": str, "seq": int, "base": int, "patch": dict}, where base is the sequence number of the state
+        the patch applies to. Clients acknowledge every frame they applied with {"event": str, "seq": int} on the ack
+        control event, keep the states of the sequence numbers they did not see acknowledged in a patch yet, and can
+        request a keyframe with {"event": str} (or {} for every event) on the resync control event.
+
+        :param manager: The IoTManager whose clients the deltas are sent to.
+        :param keyframe_interval: Number of patches sent before the full state is sent again.
+        :param window: Number of unacknowledged states remembered per client and event, acknowledgements of older
+                       states are ignored.
+        """
+        self.manager = manager
+        self.keyframe_interval = keyframe_interval
+        self.window = window
+
+        # state of each delta encoded event keyed by client id, then by event
+        self.__states: Dict[str, Dict[str, DeltaState]] = {}
+
+        manager.add_control_handler(ControlEvent.ACK.value, self.ack)
+        manager.add_control_handler(ControlEvent.RESYNC.value, self.resync)
+
+    def send(self, clients: List[IoTClient], event: str, data: dict, priority: Priority = Priority.NORMAL,
+             key: str = None):
+        """
+        Send a state to clients as patches, or as keyframes to clients for which no patch can be made.
+
+        :param clients: The clients.
+        :param event: The client side event of the state.
+        :param data: The state.
+        :param priority: Priority class of the frames.
+        :param key: Conflation key of the frames, patches are made against acknowledged states so a conflated patch
+                    never leaves the client without its base.
+        :return:
+        """
+        # the state is copied once and shared by every client
+        latest = copy.deepcopy(data)
+
+        for client in clients:
+            states = self.__states.setdefault(client.id, {})
+            state = states.get(event, None)
+
+            if state is None:
+                state = states[event] = DeltaState()
+
+            self.__send(client, state, event, latest, priority, key)
+
+    def __send(self, client: IoTClient, state: DeltaState, event: str, data: dict, priority: Priority,
+               key: Union[str, None]):
+        state.seq += 1
+        state.latest = data
+
+        patch = None
+
+        if state.acked is not None and state.since_keyframe < self.keyframe_interval:
+            patch = merge_diff(state.acked, data)
+
+        if patch is None:
+            message = {"event": event, "seq": state.seq, "state": data}
+            state.since_keyframe = 0
+        else:
+            message = {"event": event, "seq": state.seq, "base": state.acked_seq, "patch": patch}
+            state.since_keyframe += 1
+
+        state.unacked[state.seq] = data
+
+        if len(state.unacked) > self.window:
+            state.unacked.popitem(last=False)
+
+        client.send(client.encoder.encode(ControlEvent.DELTA.value, message), event, data, priority, key)
+
+    def ack(self, client: IoTClient, message: sendable):
+        """
+        Handler for the ack control event, makes the acknowledged state the base of the following patches.
+
+        :param client: The client which applied the state.
+        :param message: The ack message.
+        :return:
+        """
+        if not isinstance(message, dict) or not isinstance(message.get("event", None), str) or \
+                not isinstance(message.get("seq", None), int):
+            return
+
+        state = self.__states.get(client.id, {}).get(message["event"], None)
+
+        if state is None or message["seq"] not in state.unacked:
+            return
+
+        seq = message["seq"]
+        state.acked_seq, state.acked = seq, state.unacked[seq]
+
+        # older states can no longer become the base
+        while next(iter(state.unacked)) < seq:
+            state.unacked.popitem(last=False)
+
+    def resync(self, client: IoTClient, message: sendable):
+        """
+        Handler for the resync control event, sends the latest state of the event (or of every event) as a keyframe.
+
+        :param client: The client which lost track of its state.
+        :param message: The resync message.
+        :return:
+        """
+        event = message.get("event", None) if isinstance(message, dict) else None
+
+        for state_event, state in self.__states.get(client.id, {}).items():
+            if event is not None and state_event != event:
+                continue
+
+            state.acked_seq, state.acked = None, None
+            state.unacked.clear()
+
+            if state.latest is not None:
+                self.__send(client, state, state_event, state.latest, Priority.CONTROL, None)
+
+    def removed(self, client: IoTClient):
+        """
+        Called by the manager whenever a client is removed, forgets its states.
+
+        :param client: The client which was removed.
+        :return:
+        """
+        self.__states.pop(client.id, None)
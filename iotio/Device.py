@@ -1,14 +1,31 @@
 # default
-from typing import TYPE_CHECKING
+from types import MappingProxyType
+from typing import TYPE_CHECKING, AbstractSet, Mapping
 if TYPE_CHECKING:
     from .Manager import IoTManager
 
 # internal
 from .Client import IoTClient
+from .Control import Priority
+from .RateLimit import RateLimit
 from .types import event_pair
 
 
 class DeviceType:
+    # limit applied to each client of the type, replaces the manager's rate_limit if set
+    rate_limit: RateLimit = None
+
+    # limit shared by all clients of the type
+    type_rate_limit: RateLimit = None
+
+    # priority class of events received from clients of the type, events which are not listed are normal priority,
+    # read-only so subclasses set their own mapping instead of sharing one
+    event_priorities: Mapping[str, Priority] = MappingProxyType({})
+
+    # events emitted to clients of the type whose JSON object data is sent as patches against the last acknowledged
+    # state, see DeltaTracker, read-only so subclasses set their own set instead of sharing one
+    delta_events: AbstractSet[str] = frozenset()
+
     def __init__(self, type_name: str):
         """
         Type of device as a string, should match the device_type string provided by clients when they connect.
@@ -37,6 +54,15 @@ class DeviceType:
         """
         self.__context = context
 
+    def priority(self, event: str) -> Priority:
+        """
+        Get the priority class of an event received from a client of the type.
+
+        :param event: The event.
+        :return: The Priority of the event.
+        """
+        return self.event_priorities.get(event, Priority.NORMAL)
+
     def call_event_handler(self, event: str, message: str, client: IoTClient) -> event_pair:
         """
         Calls the event handler for the given event if it exists, if it doesnt exist then it does nothing.
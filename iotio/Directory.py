@@ -0,0 +1,173 @@
+# default
+import base64
+import bisect
+import collections
+import hashlib
+import json
+from typing import TYPE_CHECKING, Dict, List, Tuple, Union
+if TYPE_CHECKING:
+    from .Manager import IoTManager
+
+
+# maximum number of clients in a single page
+MAX_PAGE_SIZE = 1000
+
+
+class ClientSnapshot:
+    __slots__ = ("version", "entries", "views")
+
+    def __init__(self, version: int, entries: List[dict]):
+        """
+        The connected clients at one version of the directory, sorted by id.
+
+        :param version: Version of the directory the snapshot was taken at.
+        :param entries: The clients as {"id": str, "type": str, "rooms": list}, sorted by id.
+        """
+        self.version = version
+        self.entries = entries
+
+        # ids and entries of the clients matching a filter, keyed by the type and room filtered for
+        self.views: Dict[Tuple[Union[str, None], Union[str, None]], Tuple[List[str], List[dict]]] = {}
+
+    def view(self, client_type: str = None, room: str = None) -> Tuple[List[str], List[dict]]:
+        """
+        Get the clients matching a filter, the result is kept for the following pages.
+
+        :param client_type: Only include clients of this type.
+        :param room: Only include clients in this room.
+        :return: The ids and the entries of the clients, sorted by id.
+        """
+        view = self.views.get((client_type, room), None)
+
+        if view is None:
+            entries = [entry for entry in self.entries if (client_type is None or entry["type"] == client_type) and
+                       (room is None or room in entry["rooms"])]
+            view = self.views[(client_type, room)] = [entry["id"] for entry in entries], entries
+
+        return view
+
+
+class ClientPage:
+    __slots__ = ("clients", "cursor", "version", "etag")
+
+    def __init__(self, clients: List[dict], cursor: Union[str, None], version: int):
+        """
+        A page of the client listing.
+
+        :param clients: The clients as {"id": str, "type": str, "rooms": list}, sorted by id.
+        :param cursor: Cursor of the next page, None if this is the last page.
+        :param version: Version of the snapshot the page was read from.
+        """
+        self.clients = clients
+        self.cursor = cursor
+        self.version = version
+
+        # depends only on the clients in the page and on whether a next page exists, not on the version in the cursor,
+        # so an unchanged page keeps its tag across versions
+        self.etag = hashlib.sha1(json.dumps([clients, cursor is not None],
+                                            sort_keys=True).encode("utf-8")).hexdigest()
+
+    def __dict__(self):
+        return {
+            "clients": self.clients,
+            "next": self.cursor,
+            "version": self.version
+        }
+
+
+class ClientDirectory:
+    def __init__(self, manager: 'IoTManager', retained: int = 4):
+        """
+        Cursor paginated listing of the connected clients. Pages are read from a snapshot of the clients which is
+        taken at most once per version of the directory, the version changes whenever a client connects, disconnects,
+        joins or leaves a room. A cursor keeps reading from the snapshot it was created on while that snapshot is
+        retained, after that it continues after the last client it returned in the latest snapshot.
+
+        :param manager: The IoTManager whose clients are listed.
+        :param retained: Number of snapshots kept for cursors created on older versions.
+        """
+        self.manager = manager
+        self.retained = retained
+        self.version = 0
+
+        self.__snapshots: Dict[int, ClientSnapshot] = collections.OrderedDict()
+
+    def changed(self):
+        """
+        Called by the manager whenever a client connected, disconnected, joined or left a room.
+
+        :return:
+        """
+        self.version += 1
+
+    def snapshot(self) -> ClientSnapshot:
+        """
+        Get the snapshot of the current version, taking it if it does not exist yet.
+
+        :return: The ClientSnapshot.
+        """
+        snapshot = self.__snapshots.get(self.version, None)
+
+        if snapshot is not None:
+            return snapshot
+
+        entries = []
+
+        for client_id in sorted(self.manager.clients):
+            client = self.manager.get_client(client_id)
+            entries.append({"id": client.id, "type": client.type, "rooms": sorted(client.rooms)})
+
+        snapshot = self.__snapshots[self.version] = ClientSnapshot(self.version, entries)
+
+        while len(self.__snapshots) > self.retained:
+            self.__snapshots.popitem(last=False)
+
+        return snapshot
+
+    def page(self, limit: int = 100, cursor: str = None, client_type: str = None, room: str = None) -> ClientPage:
+        """
+        Read a page of the connected clients.
+
+        :param limit: Maximum number of clients in the page, at most MAX_PAGE_SIZE.
+        :param cursor: Cursor returned with the previous page, None for the first page.
+        :param client_type: Only include clients of this type.
+        :param room: Only include clients in this room.
+        :return: The ClientPage.
+        :raises ValueError: If the cursor is invalid or the limit is out of range.
+        """
+        if not 0 < limit <= MAX_PAGE_SIZE:
+            raise ValueError("limit must be between 1 and " + str(MAX_PAGE_SIZE))
+
+        snapshot, after = None, None
+
+        if cursor is not None:
+            version, after = self.__decode(cursor)
+            snapshot = self.__snapshots.get(version, None)
+
+        if snapshot is None:
+            snapshot = self.snapshot()
+
+        ids, entries = snapshot.view(client_type, room)
+
+        start = bisect.bisect_right(ids, after) if after is not None else 0
+        clients = entries[start:start + limit]
+
+        if start + limit < len(entries):
+            cursor = self.__encode(snapshot.version, clients[-1]["id"])
+        else:
+            cursor = None
+
+        return ClientPage(clients, cursor, snapshot.version)
+
+    @staticmethod
+    def __encode(version: int, after: str) -> str:
+        return base64.urlsafe_b64encode((str(version) + ":" + after).encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def __decode(cursor: str) -> Tuple[int, str]:
+        try:
+            version, after = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split(":", 1)
+
+            return int(version), after
+        except (ValueError, UnicodeError):
+            raise ValueError("invalid cursor")
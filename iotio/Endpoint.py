@@ -1,5 +1,7 @@
 # default
-from typing import Union, Dict, List, Tuple
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Union, Dict, List, Tuple, Mapping, Callable, Iterable, Any
 import enum
 
 filter_list = Union[str, List[str]]
@@ -51,6 +53,50 @@ class EndpointType(enum.Enum):
     ENUM = "enum"
 
 
+# a constraint check, returns True if the data satisfies the constraint
+check_function = Callable[[Any], bool]
+validate_function = Callable[[Any], ValidationResponse]
+
+
+def compile_checks(data_type: type, checks: List[Tuple[check_function, ValidationResponse]]) -> validate_function:
+    """
+    Build a validate function from the checks of the constraints an endpoint actually has.
+
+    :param data_type: The type the data must be an instance of.
+    :param checks: Each check with the response returned when it fails, in the order they are made.
+    :return: The validate function.
+    """
+    checks = tuple(checks)
+
+    # endpoints without constraints only check the type
+    if not checks:
+        def validate(data) -> ValidationResponse:
+            if not isinstance(data, data_type):
+                return ValidationResponse.INVALID_TYPE
+
+            return ValidationResponse.VALID
+    elif len(checks) == 1:
+        (check, failed), = checks
+
+        def validate(data) -> ValidationResponse:
+            if not isinstance(data, data_type):
+                return ValidationResponse.INVALID_TYPE
+
+            return ValidationResponse.VALID if check(data) else failed
+    else:
+        def validate(data) -> ValidationResponse:
+            if not isinstance(data, data_type):
+                return ValidationResponse.INVALID_TYPE
+
+            for check, failed in checks:
+                if not check(data):
+                    return failed
+
+            return ValidationResponse.VALID
+
+    return validate
+
+
 # abstract validator class
 class AbstractEndpointValidator:
     def __init__(self, endpoint_id: str, name: str, special_id: Union[str, None]):
@@ -59,8 +105,37 @@ class AbstractEndpointValidator:
         self.special_id = special_id
         self.type = None
 
+        # replaced by the subclasses once their constraints are set
+        self._compiled = AbstractEndpointValidator.compile(self)
+
     def validate(self, data) -> ValidationResponse:
-        pass
+        """
+        Validate a value using the compiled validate function of the validator.
+
+        :param data: The value.
+        :return: The ValidationResponse of the value.
+        """
+        return self._compiled(data)
+
+    def validate_many(self, values: Iterable) -> List[ValidationResponse]:
+        """
+        Validate a batch of values.
+
+        :param values: The values.
+        :return: The ValidationResponse of each value, in order.
+        """
+        validate = self.validate
+
+        return [validate(data) for data in values]
+
+    def compile(self) -> validate_function:
+        """
+        Build the validate function of the validator from its constraints, the validator is compiled when it is
+        created and has to be compiled again (validator._compiled = validator.compile()) if its constraints change.
+
+        :return: The validate function.
+        """
+        return lambda data: None
 
     def __dict__(self):
         return {
@@ -98,13 +173,10 @@ class BooleanEndpointValidator(AbstractEndpointValidator):
     def __init__(self, endpoint_id: str, name: str, special_id: Union[str, None]):
         super().__init__(endpoint_id, name, special_id)
         self.type = EndpointType.BOOLEAN
+        self._compiled = self.compile()
 
-    def validate(self, data) -> ValidationResponse:
-        # check that data is a boolean value
-        if not isinstance(data, bool):
-            return ValidationResponse.INVALID_TYPE
-
-        return ValidationResponse.VALID
+    def compile(self) -> validate_function:
+        return compile_checks(bool, [])
 
     def __dict__(self):
         return {
@@ -140,25 +212,23 @@ class IntegerEndpointValidator(AbstractEndpointValidator):
         self.min = min_v
         self.max = max_v
         self.increment = increment
+        self._compiled = self.compile()
 
-    def validate(self, data) -> ValidationResponse:
-        # check if it is a number
-        if not isinstance(data, int):
-            return ValidationResponse.INVALID_TYPE
+    def compile(self) -> validate_function:
+        checks = []
 
-        # check if a minimum value was provided
         if self.min is not None:
-            # check if it is less than the minimum
-            if data < self.min:
-                return ValidationResponse.LOWER_THAN_MIN
+            checks.append((self.min.__le__, ValidationResponse.LOWER_THAN_MIN))
 
-        # check if a maximum value was provided
         if self.max is not None:
-            # check if it is more than the maximum
-            if data > self.max:
-                return ValidationResponse.HIGHER_THAN_MAX
+            checks.append((self.max.__ge__, ValidationResponse.HIGHER_THAN_MAX))
 
-        return ValidationResponse.VALID
+        # values are counted in steps of the increment from the minimum (or from 0 if there is no minimum)
+        if self.increment:
+            increment, start = self.increment, self.min or 0
+            checks.append((lambda data: (data - start) % increment == 0, ValidationResponse.INVALID_INCREMENT))
+
+        return compile_checks(int, checks)
 
     def __dict__(self):
         return {
@@ -220,45 +290,31 @@ class StringEndpointValidator(AbstractEndpointValidator):
         self.length = length
         self.allow_list = allow_list
         self.deny_list = deny_list
+        self._compiled = self.compile()
 
-    def validate(self, data) -> ValidationResponse:
-        # check if it is a string
-        if not isinstance(data, str):
-            return ValidationResponse.INVALID_TYPE
+    def compile(self) -> validate_function:
+        checks = []
 
-        # check if the length constraint was provided
         if self.length is not None:
-            # check if the length is correct
-            if len(data) != self.length:
-                return ValidationResponse.INVALID_LENGTH
+            length = self.length
+            checks.append((lambda data: len(data) == length, ValidationResponse.INVALID_LENGTH))
 
-        # check if allow_list is provided
+        # a string allow list is a set of allowed characters, a list of strings is a set of allowed values
         if self.allow_list is not None:
             if isinstance(self.allow_list, str):
-                # for each char in the provided string
-                for char in data:
-                    # check if it is not in the allow_list
-                    if char not in self.allow_list:
-                        return ValidationResponse.VIOLATES_ALLOW_LIST
-            # if the allow_list is an array of strings
+                checks.append((frozenset(self.allow_list).issuperset, ValidationResponse.VIOLATES_ALLOW_LIST))
             else:
-                # if allow_list is a list of strings check if provided string matches one of those strings
-                if data not in self.allow_list:
-                    return ValidationResponse.VIOLATES_ALLOW_LIST
+                checks.append((frozenset(self.allow_list).__contains__, ValidationResponse.VIOLATES_ALLOW_LIST))
 
-        # check if deny_list is provided
+        # a string deny list is a set of denied characters, a list of strings is a set of denied values
         if self.deny_list is not None:
             if isinstance(self.deny_list, str):
-                # for each char in the deny list
-                for char in self.deny_list:
-                    # check if the deny_list contains that char
-                    if char in data:
-                        return ValidationResponse.VIOLATES_DENY_LIST
+                checks.append((frozenset(self.deny_list).isdisjoint, ValidationResponse.VIOLATES_DENY_LIST))
             else:
-                if data in self.deny_list:
-                    return ValidationResponse.VIOLATES_DENY_LIST
+                denied = frozenset(self.deny_list)
+                checks.append((lambda data: data not in denied, ValidationResponse.VIOLATES_DENY_LIST))
 
-        return ValidationResponse.VALID
+        return compile_checks(str, checks)
 
     def __dict__(self):
         return {
@@ -339,17 +395,10 @@ class EnumEndpointValidator(AbstractEndpointValidator):
         super().__init__(endpoint_id, name, special_id)
         self.type = EndpointType.ENUM
         self.values = values
+        self._compiled = self.compile()
 
-    def validate(self, data) -> ValidationResponse:
-        # check if it is a string
-        if not isinstance(data, str):
-            return ValidationResponse.INVALID_TYPE
-
-        # check if the value is a valid enum for this endpoint
-        if data not in self.values.keys():
-            return ValidationResponse.INVALID_ENUM_VALUE
-
-        return ValidationResponse.VALID
+    def compile(self) -> validate_function:
+        return compile_checks(str, [(frozenset(self.values).__contains__, ValidationResponse.INVALID_ENUM_VALUE)])
 
     def __dict__(self):
         return {
@@ -406,11 +455,36 @@ class EndpointManager:
         self.__endpoints = {}
         self.__initialized = False
 
+        # set while the endpoints are a mapping shared with other managers, it is copied before being modified
+        self.__shared = False
+
     @property
     def initialized(self):
         return self.__initialized
 
+    @property
+    def endpoints(self) -> Mapping[str, AbstractEndpointValidator]:
+        """
+        A read only view of the validators of the manager keyed by endpoint id.
+        """
+        return MappingProxyType(self.__endpoints)
+
+    def load(self, endpoints: Mapping[str, AbstractEndpointValidator]):
+        """
+        Use an already parsed set of validators, the mapping is shared and not copied unless the manager is modified.
+
+        :param endpoints: Validators keyed by endpoint id, usually from an EndpointCache.
+        :return:
+        """
+        self.__endpoints = endpoints
+        self.__shared = True
+        self.__initialized = True
+
     def __add_endpoint(self, validator: AbstractEndpointValidator):
+        if self.__shared:
+            self.__endpoints = dict(self.__endpoints)
+            self.__shared = False
+
         self.__endpoints[validator.id] = validator
 
     def get_validator(self, endpoint_id: str) -> Union[AbstractEndpointValidator, ValidationResponse]:
@@ -451,3 +525,87 @@ class EndpointManager:
         self.__initialized = True
 
         return "", EndpointParseResponse.VALID
+
+    def update(self, add: List[dict] = None, remove: List[str] = None,
+               replace: List[dict] = None) -> Tuple[str, EndpointParseResponse]:
+        """
+        Modify the endpoints of a manager which is already in use. The update is only applied if every endpoint
+        definition can be parsed.
+
+        :param add: Endpoint definitions which are added, replacing existing endpoints with the same id.
+        :param remove: IDs of endpoints which are removed.
+        :param replace: Endpoint definitions which replace all existing endpoints.
+        :return: The id of the endpoint which failed to parse and the reason, or a valid response.
+        """
+        parsed = EndpointManager()
+
+        endpoint_id, response = parsed.parse((replace or []) + (add or []))
+
+        if response != EndpointParseResponse.VALID:
+            return endpoint_id, response
+
+        endpoints = {} if replace is not None else dict(self.__endpoints)
+
+        for endpoint_id in remove or []:
+            endpoints.pop(endpoint_id, None)
+
+        endpoints.update(parsed.endpoints)
+
+        self.__endpoints = endpoints
+        self.__shared = False
+        self.__initialized = True
+
+        return "", EndpointParseResponse.VALID
+
+
+class EndpointCache:
+    def __init__(self, size: int = 256):
+        """
+        A bounded LRU cache of parsed endpoint declarations. Devices of the same model send identical declarations,
+        caching them means the declaration is only parsed once and the validators are shared between every client
+        which sent it.
+
+        :param size: Maximum number of declarations which are kept, 0 disables the cache.
+        """
+        self.size = size
+        self.__entries: Dict[str, Mapping[str, AbstractEndpointValidator]] = OrderedDict()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, key: str) -> Union[Mapping[str, AbstractEndpointValidator], None]:
+        """
+        Get the validators for a declaration.
+
+        :param key: The raw endpoint declaration.
+        :return: The read only validators keyed by endpoint id, or None if the declaration is not cached.
+        """
+        endpoints = self.__entries.get(key, None)
+
+        if endpoints is not None:
+            self.__entries.move_to_end(key)
+
+        return endpoints
+
+    def put(self, key: str, endpoints: Mapping[str, AbstractEndpointValidator]) \
+            -> Mapping[str, AbstractEndpointValidator]:
+        """
+        Cache the validators parsed from a declaration.
+
+        :param key: The raw endpoint declaration.
+        :param endpoints: The validators keyed by endpoint id.
+        :return: The read only mapping which was cached.
+        """
+        endpoints = MappingProxyType(dict(endpoints))
+
+        if self.size <= 0:
+            return endpoints
+
+        self.__entries[key] = endpoints
+        self.__entries.move_to_end(key)
+
+        # evict the least recently used declarations
+        while len(self.__entries) > self.size:
+            self.__entries.popitem(last=False)
+
+        return endpoints
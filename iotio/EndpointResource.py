@@ -1,36 +1,118 @@
 try:
     # default
     import functools
-    from typing import Callable, TYPE_CHECKING
+    from typing import Callable, TYPE_CHECKING, Dict, List, Tuple, Union
 
     if TYPE_CHECKING:
         from .Manager import IoTManager
 
     # external
     import flask
-    from flask_restful import Resource, reqparse
+    from flask_restful import Resource, inputs
 
     # internal
-    from .Endpoint import ValidationResponse, EndpointType
+    from .Endpoint import ValidationResponse, EndpointType, AbstractEndpointValidator
+    from .Control import Priority
+    from .Directory import MAX_PAGE_SIZE
+    from .types import sendable
 
 
-    class EndpointResource(Resource):
-        def __init__(self, manager: 'IoTManager', auth_decorator: Callable):
+    # maximum number of commands accepted in a single batch
+    MAX_BATCH_SIZE = 10000
+
+
+    def coerce(validator: AbstractEndpointValidator, data: sendable) -> Tuple[ValidationResponse, sendable]:
+        """
+        Convert data received over the api to the type of an endpoint and validate it.
+
+        :param validator: Validator of the endpoint.
+        :param data: The received data.
+        :return: The ValidationResponse and the converted data.
+        """
+        try:
+            # convert data to boolean
+            if validator.type == EndpointType.BOOLEAN:
+                data = bool(data)
+            # convert data to int
+            elif validator.type == EndpointType.INTEGER:
+                data = int(data)
+            elif validator.type == EndpointType.STRING:
+                pass
+            elif validator.type == EndpointType.ENUM:
+                pass
+            else:
+                return ValidationResponse.INVALID_TYPE, data
+        except (TypeError, ValueError):
+            return ValidationResponse.INVALID_TYPE, data
+
+        return validator.validate(data), data
+
+
+    # arguments of an endpoint command, with the message returned when a required one is missing
+    COMMAND_ARGUMENTS = {
+        "clientId": "ID of Client.",
+        "endpointId": "ID of Endpoint where data should be sent.",
+        "data": "Data to be sent."
+    }
+
+
+    class EndpointCommands:
+        def __init__(self, manager: 'IoTManager', auth_decorator: Callable = None):
+            """
+            Handles the requests of the endpoint command resources. Built once by the IoTManager so requests do not
+            pay for building parsers or decorating handlers, the resources only pass requests on to it.
+
+            :param manager: The IoTManager the commands are sent through.
+            :param auth_decorator: A wrapper function used to wrap the handlers if user authentication is required.
+            """
             self.manager = manager
 
-            # decorate post method with the provided decorator
-            if auth_decorator:
-                self.post = auth_decorator(self.post)
+            # decorate the handlers once
+            self.post = auth_decorator(self.__post) if auth_decorator else self.__post
+            self.post_batch = auth_decorator(self.__post_batch) if auth_decorator else self.__post_batch
+            self.get_command = auth_decorator(self.__get_command) if auth_decorator else self.__get_command
+            self.post_special = auth_decorator(self.__post_special) if auth_decorator else self.__post_special
+            self.get = auth_decorator(self.__get) if auth_decorator else self.__get
 
-            self.post_parser = reqparse.RequestParser()
-            self.post_parser.add_argument("clientId", location=["json", "args"], required=True, type=str,
-                                          help="ID of Client.")
-            self.post_parser.add_argument("endpointId", location=["json", "args"], required=True, type=str,
-                                          help="ID of Endpoint where data should be sent.")
-            self.post_parser.add_argument("data", location=["json", "args"], required=True, help="Data to be sent.")
+        @staticmethod
+        def __arguments() -> Union[dict, Tuple[dict, int]]:
+            """
+            Read the arguments of an endpoint command from the JSON body, or from the query string if the body does
+            not hold them.
 
-        def post(self):
-            args = self.post_parser.parse_args()
+            :return: The arguments, or the error response if one is missing or invalid.
+            """
+            body = flask.request.get_json(silent=True)
+
+            if not isinstance(body, dict):
+                body = {}
+
+            args = {}
+
+            for name in ["clientId", "endpointId", "data", "async", "ack"]:
+                if name in body:
+                    args[name] = body[name]
+                elif name in flask.request.args:
+                    args[name] = flask.request.args[name]
+                elif name in COMMAND_ARGUMENTS:
+                    return {"message": {name: COMMAND_ARGUMENTS[name]}}, 400
+
+            args["clientId"] = str(args["clientId"])
+            args["endpointId"] = str(args["endpointId"])
+
+            for name in ["async", "ack"]:
+                try:
+                    args[name] = inputs.boolean(args.get(name, False))
+                except ValueError as e:
+                    return {"message": {name: str(e)}}, 400
+
+            return args
+
+        def __post(self):
+            args = self.__arguments()
+
+            if isinstance(args, tuple):
+                return args
 
             # get validator for the specified client and endpoint
             validator = self.manager.get_validator(args["clientId"], args["endpointId"])
@@ -41,22 +123,9 @@ try:
                     "success": False,
                     "error": validator.value
                 }, 400
-            else:
-                # convert data to boolean
-                if validator.type == EndpointType.BOOLEAN:
-                    args["data"] = bool(args["data"])
-                # convert data to int
-                elif validator.type == EndpointType.INTEGER:
-                    args["data"] = int(args["data"])
-                elif validator.type == EndpointType.STRING:
-                    pass
-                elif validator.type == EndpointType.ENUM:
-                    pass
-                else:
-                    return {}, 400
 
-            # try and validate the data
-            response = validator.validate(args["data"])
+            # convert and validate the data
+            response, args["data"] = coerce(validator, args["data"])
 
             # if validation failed
             if response != ValidationResponse.VALID:
@@ -65,12 +134,333 @@ try:
                     "error": response.value
                 }, 400
 
+            # commands which would not change the value of the endpoint
+            if self.manager.states.suppressed(args["clientId"], validator.id, args["data"]):
+                return {
+                    "success": True,
+                    "suppressed": True
+                }
+
+            # queue the command and let the client of the api follow its status
+            if args["async"]:
+                command = self.manager.commands.put(args["clientId"], validator.id, args["data"], args["ack"])
+
+                return {
+                    "success": True,
+                    "commandId": command.id
+                }, 202
+
             # if validation worked then send the data and return a success
-            self.manager.emit(validator.id, args["data"], client_id=args["clientId"])
+            self.manager.emit(validator.id, args["data"], client_id=args["clientId"], priority=Priority.HIGH)
+            self.manager.states.command(args["clientId"], validator.id, args["data"])
 
             return {
                 "success": True
             }
 
+        def __post_batch(self):
+            """
+            Send many endpoint commands at once, the body is {"commands": [{"clientId", "endpointId", "data"}, ...]}.
+            Commands are validated once per distinct validator and data, and the commands for each client are sent to
+            it in a single frame. The response holds a result for every command, in order.
+            """
+            body = flask.request.get_json(silent=True)
+            commands = body.get("commands", None) if isinstance(body, dict) else None
+
+            if not isinstance(commands, list):
+                return {
+                    "success": False,
+                    "error": "invalid_batch"
+                }, 400
+
+            if len(commands) > MAX_BATCH_SIZE:
+                return {
+                    "success": False,
+                    "error": "batch_too_large"
+                }, 400
+
+            results: List[dict] = [{"success": True}] * len(commands)
+
+            # indices of the commands grouped by the validator they are checked with
+            groups: Dict[AbstractEndpointValidator, List[int]] = {}
+
+            for i, command in enumerate(commands):
+                if not isinstance(command, dict) or not isinstance(command.get("clientId", None), str) or \
+                        not isinstance(command.get("endpointId", None), str) or "data" not in command:
+                    results[i] = {"success": False, "error": "invalid_command"}
+                    continue
+
+                validator = self.manager.get_validator(command["clientId"], command["endpointId"])
+
+                if isinstance(validator, ValidationResponse):
+                    results[i] = {"success": False, "error": validator.value}
+                    continue
+
+                groups.setdefault(validator, []).append(i)
+
+            # validated commands grouped by client, with the indices of the commands they were sent as
+            messages: Dict[str, List[Tuple[str, sendable]]] = {}
+            positions: Dict[str, List[int]] = {}
+
+            for validator, indices in groups.items():
+                # validators are shared between clients, identical data is only validated once
+                validated = {}
+
+                for i in indices:
+                    data = commands[i]["data"]
+                    key = (type(data), data) if isinstance(data, (bool, int, str)) else None
+
+                    if key is not None and key in validated:
+                        response, data = validated[key]
+                    else:
+                        response, data = coerce(validator, data)
+
+                        if key is not None:
+                            validated[key] = response, data
+
+                    if response != ValidationResponse.VALID:
+                        results[i] = {"success": False, "error": response.value}
+                        continue
+
+                    if self.manager.states.suppressed(commands[i]["clientId"], validator.id, data):
+                        results[i] = {"success": True, "suppressed": True}
+                        continue
+
+                    messages.setdefault(commands[i]["clientId"], []).append((validator.id, data))
+                    positions.setdefault(commands[i]["clientId"], []).append(i)
+
+            for client_id, client_messages in messages.items():
+                client = self.manager.get_client(client_id)
+
+                # the client can disconnect while the frames of other clients are being written
+                if client is None or client.socket.websocket_closed:
+                    for i in positions[client_id]:
+                        results[i] = {"success": False, "error": "client_not_connected"}
+                    continue
+
+                if len(client_messages) == 1:
+                    client.emit(client_messages[0][0], client_messages[0][1], Priority.HIGH)
+                else:
+                    client.send_batch(client_messages, Priority.HIGH)
+
+                for endpoint_id, data in client_messages:
+                    self.manager.states.command(client_id, endpoint_id, data)
+
+            return {
+                "success": all(result["success"] for result in results),
+                "results": results
+            }
+
+        def __get(self):
+            """
+            Read the cached values of the endpoints of a client, or of a single endpoint if endpointId is given.
+            """
+            client_id = flask.request.args.get("clientId", None)
+            endpoint_id = flask.request.args.get("endpointId", None)
+
+            if client_id is None:
+                return {"message": {"clientId": COMMAND_ARGUMENTS["clientId"]}}, 400
+
+            client = self.manager.get_client(client_id)
+
+            if client is None:
+                return {
+                    "success": False,
+                    "error": ValidationResponse.CLIENT_NOT_CONNECTED.value
+                }, 400
+
+            if endpoint_id is None:
+                return {
+                    "success": True,
+                    "endpoints": {
+                        endpoint_id: value.__dict__() for endpoint_id, value in
+                        self.manager.states.values(client_id).items()
+                    }
+                }
+
+            validator = client.get_validator(endpoint_id)
+
+            if isinstance(validator, ValidationResponse):
+                return {
+                    "success": False,
+                    "error": validator.value
+                }, 400
+
+            value = self.manager.states.get(client_id, endpoint_id)
+
+            return {
+                "success": True,
+                "value": value.__dict__() if value is not None else None
+            }
+
+        def __post_special(self):
+            """
+            Send a command to every client exposing an endpoint with a specialId, the body is
+            {"specialId": str, "data": ..., "endpointType": str, "clientType": str} where the types are optional.
+            """
+            body = flask.request.get_json(silent=True)
+
+            if not isinstance(body, dict) or not isinstance(body.get("specialId", None), str) or "data" not in body:
+                return {
+                    "success": False,
+                    "error": "invalid_command"
+                }, 400
+
+            endpoint_type = body.get("endpointType", None)
+
+            if endpoint_type is not None and endpoint_type not in [t.value for t in EndpointType]:
+                return {
+                    "success": False,
+                    "error": "invalid_endpoint_type"
+                }, 400
+
+            results = self.manager.fleet.send(body["specialId"], body["data"], endpoint_type,
+                                              body.get("clientType", None), Priority.HIGH, coerce)
+
+            return {
+                "success": all(result == ValidationResponse.VALID.value for result in results.values()),
+                "results": results
+            }
+
+        def __get_command(self, command_id: str):
+            command = self.manager.commands.get(command_id)
+
+            if command is None:
+                return {
+                    "success": False,
+                    "error": "command_not_found"
+                }, 404
+
+            return {
+                "success": True,
+                "command": command.__dict__()
+            }
+
+
+    class ClientListing:
+        def __init__(self, manager: 'IoTManager', auth_decorator: Callable = None):
+            """
+            Handles the requests of the client listing resource, built once by the IoTManager like EndpointCommands.
+
+            :param manager: The IoTManager whose clients are listed.
+            :param auth_decorator: A wrapper function used to wrap the handler if user authentication is required.
+            """
+            self.manager = manager
+
+            # decorate the handler once
+            self.get = auth_decorator(self.__get) if auth_decorator else self.__get
+
+        def __get(self):
+            """
+            List the connected clients a page at a time, filtered by the type and room query arguments. The next
+            page is read by passing the cursor of the response, pages which did not change are answered with 304 if
+            their ETag is sent in If-None-Match.
+            """
+            try:
+                limit = inputs.int_range(1, MAX_PAGE_SIZE, "limit")(flask.request.args.get("limit", 100))
+            except ValueError as e:
+                return {"message": {"limit": str(e)}}, 400
+
+            try:
+                page = self.manager.list_clients(limit, flask.request.args.get("cursor", None),
+                                                 flask.request.args.get("type", None),
+                                                 flask.request.args.get("room", None))
+            except ValueError:
+                return {
+                    "success": False,
+                    "error": "invalid_cursor"
+                }, 400
+
+            headers = {"ETag": '"' + page.etag + '"'}
+
+            if flask.request.if_none_match.contains(page.etag):
+                return flask.Response(status=304, headers=headers)
+
+            return page.__dict__(), 200, headers
+
+
+    class FeedStream:
+        def __init__(self, manager: 'IoTManager', auth_decorator: Callable = None):
+            """
+            Handles the requests of the change feed resource, built once by the IoTManager like EndpointCommands.
+
+            :param manager: The IoTManager whose change feed is streamed.
+            :param auth_decorator: A wrapper function used to wrap the handler if user authentication is required.
+            """
+            self.manager = manager
+
+            # decorate the handler once
+            self.get = auth_decorator(self.__get) if auth_decorator else self.__get
+
+        def __get(self):
+            """
+            Stream the change feed as server-sent events, a snapshot of the clients followed by batches of changes.
+            """
+            feed = self.manager.feed
+
+            return flask.Response(feed.stream(feed.subscribe()), mimetype="text/event-stream", headers={
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no"
+            })
+
+
+    class EndpointResource(Resource):
+        def __init__(self, commands: EndpointCommands):
+            self.commands = commands
+
+        def get(self):
+            return self.commands.get()
+
+        def post(self):
+            return self.commands.post()
+
+
+    class BatchEndpointResource(Resource):
+        def __init__(self, commands: EndpointCommands):
+            self.commands = commands
+
+        def post(self):
+            return self.commands.post_batch()
+
+
+    class SpecialEndpointResource(Resource):
+        def __init__(self, commands: EndpointCommands):
+            self.commands = commands
+
+        def post(self):
+            return self.commands.post_special()
+
+
+    class ClientsResource(Resource):
+        def __init__(self, listing: ClientListing):
+            self.listing = listing
+
+        def get(self):
+            return self.listing.get()
+
+
+    class FeedResource(Resource):
+        def __init__(self, stream: FeedStream):
+            self.stream = stream
+
+        def get(self):
+            return self.stream.get()
+
+
+    class CommandResource(Resource):
+        def __init__(self, commands: EndpointCommands):
+            self.commands = commands
+
+        def get(self, command_id: str):
+            return self.commands.get_command(command_id)
+
 except ImportError:
+    EndpointCommands = None
+    ClientListing = None
+    FeedStream = None
     EndpointResource = None
+    BatchEndpointResource = None
+    CommandResource = None
+    SpecialEndpointResource = None
+    ClientsResource = None
+    FeedResource = None
@@ -0,0 +1,193 @@
+# default
+import enum
+import time
+from typing import TYPE_CHECKING, Dict, Union
+if TYPE_CHECKING:
+    from .Manager import IoTManager
+
+# internal
+from .Client import IoTClient
+from .Control import ControlEvent
+from .Endpoint import ValidationResponse
+from .types import sendable
+
+
+class SuppressPolicy(enum.Enum):
+    # every command is sent
+    NEVER = "never"
+    # commands equal to the last commanded value are not sent
+    COMMANDED = "commanded"
+    # commands equal to the current value (the most recent of the commanded and reported values) are not sent
+    CURRENT = "current"
+
+
+def _same(a: sendable, b: sendable) -> bool:
+    # True == 1 but they are different commands
+    return type(a) is type(b) and a == b
+
+
+class EndpointValue:
+    __slots__ = ("commanded", "commanded_at", "reported", "reported_at")
+
+    def __init__(self):
+        """
+        The last value commanded to, and reported by, an endpoint of a client.
+        """
+        self.commanded: sendable = None
+        self.reported: sendable = None
+
+        # unix time the values were commanded and reported, None if they never were
+        self.commanded_at: Union[float, None] = None
+        self.reported_at: Union[float, None] = None
+
+    @property
+    def current(self) -> sendable:
+        """
+        The most recent of the commanded and reported values.
+        """
+        if self.reported_at is not None and (self.commanded_at is None or self.reported_at >= self.commanded_at):
+            return self.reported
+
+        return self.commanded
+
+    def __dict__(self):
+        return {
+            "commanded": self.commanded,
+            "commandedAt": self.commanded_at,
+            "reported": self.reported,
+            "reportedAt": self.reported_at,
+            "current": self.current
+        }
+
+
+class EndpointStateCache:
+    def __init__(self, manager: 'IoTManager', policy: SuppressPolicy = SuppressPolicy.NEVER):
+        """
+        Keeps the last value commanded to each endpoint of the connected clients, and the value the client reported
+        for it, so the state of a device can be read without asking the device. Commands which would not change the
+        state can be suppressed.
+
+        Clients report values on the state control event as {endpointId: value, ...}, values which do not validate
+        for their endpoint are ignored.
+
+        :param manager: The IoTManager whose clients are tracked.
+        :param policy: Which commands are suppressed.
+        """
+        self.manager = manager
+        self.policy = policy
+
+        # values keyed by client id, then by endpoint id
+        self.__values: Dict[str, Dict[str, EndpointValue]] = {}
+
+        manager.add_control_handler(ControlEvent.STATE.value, self.report)
+
+    def get(self, client_id: str, endpoint_id: str) -> Union[EndpointValue, None]:
+        """
+        Get the value of an endpoint.
+
+        :param client_id: ID of the client.
+        :param endpoint_id: ID of the endpoint.
+        :return: The EndpointValue, None if no value was commanded or reported since the client connected.
+        """
+        return self.__values.get(client_id, {}).get(endpoint_id, None)
+
+    def values(self, client_id: str) -> Dict[str, EndpointValue]:
+        """
+        Get the values of every endpoint of a client.
+
+        :param client_id: ID of the client.
+        :return: The EndpointValues keyed by endpoint id, endpoints without a value are left out.
+        """
+        return dict(self.__values.get(client_id, {}))
+
+    def suppressed(self, client_id: str, endpoint_id: str, data: sendable) -> bool:
+        """
+        Check if the policy suppresses a validated command.
+
+        :param client_id: ID of the client.
+        :param endpoint_id: ID of the endpoint.
+        :param data: The validated data.
+        :return: True if the command should not be sent, False if it should.
+        """
+        value = self.get(client_id, endpoint_id)
+
+        if value is None:
+            return False
+        elif self.policy == SuppressPolicy.COMMANDED and value.commanded_at is not None:
+            return _same(value.commanded, data)
+        elif self.policy == SuppressPolicy.CURRENT and (value.commanded_at is not None or
+                                                         value.reported_at is not None):
+            return _same(value.current, data)
+
+        return False
+
+    def command(self, client_id: str, endpoint_id: str, data: sendable):
+        """
+        Record a command once it was sent to the client, or acknowledged by it if the command asked for an answer.
+        Commands which fail to be delivered are never recorded.
+
+        :param client_id: ID of the client.
+        :param endpoint_id: ID of the endpoint.
+        :param data: The validated data.
+        :return:
+        """
+        value = self.__values.setdefault(client_id, {}).get(endpoint_id, None)
+
+        if value is None:
+            value = self.__values[client_id][endpoint_id] = EndpointValue()
+
+        value.commanded = data
+        value.commanded_at = time.time()
+
+        self.manager.feed.endpoint(client_id, endpoint_id, value)
+
+    def report(self, client: IoTClient, message: sendable):
+        """
+        Handler for the state control event, records the values reported by the client.
+
+        :param client: The client.
+        :param message: The reported values keyed by endpoint id.
+        :return:
+        """
+        if not isinstance(message, dict):
+            return
+
+        for endpoint_id, data in message.items():
+            validator = client.get_validator(endpoint_id)
+
+            if isinstance(validator, ValidationResponse) or validator.validate(data) != ValidationResponse.VALID:
+                continue
+
+            value = self.__values.setdefault(client.id, {}).get(endpoint_id, None)
+
+            if value is None:
+                value = self.__values[client.id][endpoint_id] = EndpointValue()
+
+            value.reported = data
+            value.reported_at = time.time()
+
+            self.manager.feed.endpoint(client.id, endpoint_id, value)
+
+    def updated(self, client: IoTClient):
+        """
+        Called by the manager whenever the endpoints of a client changed, forgets the values of removed endpoints.
+
+        :param client: The client.
+        :return:
+        """
+        values = self.__values.get(client.id, None)
+
+        if values is None:
+            return
+
+        for endpoint_id in [endpoint_id for endpoint_id in values if endpoint_id not in client.endpoints]:
+            del values[endpoint_id]
+
+    def removed(self, client: IoTClient):
+        """
+        Called by the manager whenever a client is removed, forgets its values.
+
+        :param client: The client.
+        :return:
+        """
+        self.__values.pop(client.id, None)
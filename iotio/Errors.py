@@ -11,3 +11,5 @@ class Errors(enum.Enum):
     CLIENT_NO_PROTOCOL_VERSION = "client_no_protocol_version"
     CLIENT_INCOMPATIBLE_PROTOCOL_VERSION = "client_incompatible_protocol_version"
     CLIENT_INVALID_PACKET = "client_invalid_packet"
+    CLIENT_RATE_LIMITED = "client_rate_limited"
+    CLIENT_ID_IN_USE = "client_id_in_use"
@@ -0,0 +1,209 @@
+# default
+import collections
+import itertools
+import json
+from typing import TYPE_CHECKING, Dict, Hashable, Iterator, Set, Tuple, Union
+if TYPE_CHECKING:
+    from .Manager import IoTManager
+
+# external
+from eventlet.queue import Queue, Empty
+
+# internal
+from .Client import IoTClient
+from .EndpointState import EndpointValue
+from .Timer import Timer
+
+
+def _frame(event: str, data: dict, frame_id: int = None) -> str:
+    """
+    Encode a server-sent event.
+
+    :param event: Name of the event.
+    :param data: The data of the event, encoded as JSON.
+    :param frame_id: ID of the event.
+    :return: The encoded event.
+    """
+    frame = "id: " + str(frame_id) + "\n" if frame_id is not None else ""
+
+    return frame + "event: " + event + "\ndata: " + json.dumps(data, separators=(",", ":")) + "\n\n"
+
+
+class FeedSubscriber:
+    __slots__ = ("queue", "start", "closed")
+
+    def __init__(self, start: int):
+        """
+        A subscriber of the change feed.
+
+        :param start: Sequence number of the last change contained in the snapshot the subscriber was sent.
+        """
+        # encoded frames waiting to be streamed, None once the subscriber was dropped
+        self.queue = Queue()
+        self.start = start
+        self.closed = False
+
+
+class ChangeFeed:
+    def __init__(self, manager: 'IoTManager', interval: float = 1, max_queued: int = 100, keepalive: float = 15):
+        """
+        Publishes the changes of the fleet (connects, disconnects, room changes and endpoint values) to subscribers
+        such as dashboards. Subscribers are sent a snapshot of every connected client first and then only changes,
+        which are collected for an interval and sent in one batch. Only the latest value of an endpoint within an
+        interval is sent. Nothing is collected while there are no subscribers.
+
+        The snapshot is the snapshot event {"clients": [{"id", "type", "rooms", "endpoints"}, ...]}, batches are the
+        changes event, a list of {"type": "connect" | "disconnect" | "join" | "leave" | "endpoint", ...}.
+
+        :param manager: The IoTManager whose clients are published.
+        :param interval: Seconds changes are collected for before they are sent.
+        :param max_queued: Maximum number of batches waiting to be streamed to a subscriber, slower subscribers are
+                           dropped and have to subscribe again.
+        :param keepalive: Seconds without a batch after which a comment is streamed to keep the connection open.
+        """
+        self.manager = manager
+        self.interval = interval
+        self.max_queued = max_queued
+        self.keepalive = keepalive
+
+        self.subscribers: Set[FeedSubscriber] = set()
+
+        # changes which were not sent yet keyed by their coalescing key, with their sequence number
+        self.__pending: Dict[Hashable, Tuple[int, dict]] = collections.OrderedDict()
+        self.__seq = itertools.count(1)
+        self.__last = 0
+
+        self.__timer: Union[Timer, None] = None
+
+    def snapshot(self) -> dict:
+        """
+        Build the snapshot of the connected clients and their endpoint values.
+
+        :return: The snapshot.
+        """
+        clients = []
+
+        for entry in self.manager.directory.snapshot().entries:
+            client = dict(entry)
+            client["endpoints"] = {
+                endpoint_id: value.__dict__() for endpoint_id, value in self.manager.states.values(entry["id"]).items()
+            }
+            clients.append(client)
+
+        return {"clients": clients}
+
+    def subscribe(self) -> FeedSubscriber:
+        """
+        Subscribe to the feed, the snapshot is the first frame queued for the subscriber.
+
+        :return: The FeedSubscriber.
+        """
+        subscriber = FeedSubscriber(self.__last)
+        subscriber.queue.put(_frame("snapshot", self.snapshot(), self.__last))
+
+        self.subscribers.add(subscriber)
+
+        return subscriber
+
+    def unsubscribe(self, subscriber: FeedSubscriber):
+        self.subscribers.discard(subscriber)
+
+    def stream(self, subscriber: FeedSubscriber) -> Iterator[str]:
+        """
+        Stream the frames of a subscriber, the subscriber is unsubscribed once the stream is closed.
+
+        :param subscriber: The FeedSubscriber.
+        :return: The frames as they are published.
+        """
+        try:
+            while True:
+                try:
+                    frame = subscriber.queue.get(timeout=self.keepalive)
+                except Empty:
+                    yield ": keepalive\n\n"
+                    continue
+
+                if frame is None:
+                    return
+
+                yield frame
+        finally:
+            self.unsubscribe(subscriber)
+
+    def publish(self, change: dict, key: Hashable = None):
+        """
+        Publish a change, it is sent with the next batch.
+
+        :param change: The change.
+        :param key: Coalescing key, a pending change with the same key is replaced by this one.
+        :return:
+        """
+        if not self.subscribers:
+            return
+
+        self.__last = seq = next(self.__seq)
+
+        if key is None:
+            key = seq
+        else:
+            # the replacement is ordered after the changes published in between
+            self.__pending.pop(key, None)
+
+        self.__pending[key] = seq, change
+
+        if self.__timer is None:
+            self.__timer = self.manager.timers.schedule(self.interval, self.flush)
+
+    def flush(self):
+        """
+        Send the pending changes to every subscriber.
+
+        :return:
+        """
+        self.__timer = None
+
+        pending, self.__pending = list(self.__pending.values()), collections.OrderedDict()
+
+        if not pending:
+            return
+
+        # the batch is encoded once, subscribers which joined during the interval get the changes after their snapshot
+        frame = _frame("changes", [change for _, change in pending], pending[-1][0])
+
+        for subscriber in list(self.subscribers):
+            if subscriber.start:
+                changes = [change for seq, change in pending if seq > subscriber.start]
+                subscriber.start = 0
+
+                if not changes:
+                    continue
+
+                self.__put(subscriber, _frame("changes", changes, pending[-1][0]))
+            else:
+                self.__put(subscriber, frame)
+
+    def connected(self, client: IoTClient):
+        self.publish({"type": "connect", "client": {"id": client.id, "type": client.type,
+                                                    "rooms": sorted(client.rooms)}})
+
+    def disconnected(self, client: IoTClient):
+        self.publish({"type": "disconnect", "clientId": client.id})
+
+    def joined(self, client_id: str, room: str):
+        self.publish({"type": "join", "clientId": client_id, "room": room})
+
+    def left(self, client_id: str, room: str):
+        self.publish({"type": "leave", "clientId": client_id, "room": room})
+
+    def endpoint(self, client_id: str, endpoint_id: str, value: EndpointValue):
+        self.publish({"type": "endpoint", "clientId": client_id, "endpointId": endpoint_id,
+                      "value": value.__dict__()}, ("endpoint", client_id, endpoint_id))
+
+    def __put(self, subscriber: FeedSubscriber, frame: str):
+        if subscriber.queue.qsize() >= self.max_queued:
+            # the subscriber can not keep up, its stream is ended
+            self.unsubscribe(subscriber)
+            subscriber.closed = True
+            subscriber.queue.put(None)
+        else:
+            subscriber.queue.put(frame)
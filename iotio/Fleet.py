@@ -0,0 +1,162 @@
+# default
+from typing import TYPE_CHECKING, Callable, Dict, List, Set, Tuple, Union
+if TYPE_CHECKING:
+    from .Manager import IoTManager
+
+# internal
+from .Client import IoTClient
+from .Control import Priority
+from .Endpoint import AbstractEndpointValidator, EndpointType, ValidationResponse
+from .types import sendable
+
+
+# validates data for an endpoint, returns the ValidationResponse and the data to send
+validate_function = Callable[[AbstractEndpointValidator, sendable], Tuple[ValidationResponse, sendable]]
+
+
+def _validate(validator: AbstractEndpointValidator, data: sendable) -> Tuple[ValidationResponse, sendable]:
+    return validator.validate(data), data
+
+
+class FleetIndex:
+    def __init__(self, manager: 'IoTManager'):
+        """
+        Index of the endpoints of every connected client by their specialId, used to send a command to every client
+        which exposes an endpoint with a given specialId.
+
+        :param manager: The IoTManager whose clients are indexed.
+        """
+        self.manager = manager
+
+        # endpoints keyed by special id, then by client id
+        self.__index: Dict[str, Dict[str, List[AbstractEndpointValidator]]] = {}
+
+        # special ids each client is indexed under
+        self.__special_ids: Dict[str, Set[str]] = {}
+
+    @property
+    def special_ids(self) -> List[str]:
+        """
+        The special ids exposed by at least one connected client.
+        """
+        return list(self.__index.keys())
+
+    def find(self, special_id: str, endpoint_type: Union[EndpointType, str] = None, client_type: str = None) \
+            -> List[Tuple[IoTClient, AbstractEndpointValidator]]:
+        """
+        Find the endpoints with a special id.
+
+        :param special_id: The special id.
+        :param endpoint_type: Only find endpoints of this type.
+        :param client_type: Only find endpoints of clients of this type.
+        :return: A list of clients and the validator of their endpoint.
+        """
+        if isinstance(endpoint_type, str):
+            endpoint_type = EndpointType(endpoint_type)
+
+        found = []
+
+        for client_id, validators in self.__index.get(special_id, {}).items():
+            client = self.manager.get_client(client_id)
+
+            if client is None or (client_type is not None and client.type != client_type):
+                continue
+
+            for validator in validators:
+                if endpoint_type is None or validator.type == endpoint_type:
+                    found.append((client, validator))
+
+        return found
+
+    def send(self, special_id: str, data: sendable, endpoint_type: Union[EndpointType, str] = None,
+             client_type: str = None, priority: Priority = Priority.HIGH, validate: validate_function = _validate) \
+            -> Dict[str, str]:
+        """
+        Send data to every endpoint with a special id. The data is validated once per distinct validator (validators
+        of identical endpoint declarations are shared) and encoded once per endpoint id. Commands suppressed by the
+        manager's SuppressPolicy are not sent.
+
+        :param special_id: The special id.
+        :param data: The data to send.
+        :param endpoint_type: Only send to endpoints of this type.
+        :param client_type: Only send to clients of this type.
+        :param priority: Priority class of the data.
+        :param validate: Function validating the data for an endpoint, returns the ValidationResponse and the data to
+                         send.
+        :return: The ValidationResponse value for each client the endpoint was found for, keyed by client id.
+        """
+        results = {}
+
+        # validation results of each distinct validator
+        validated: Dict[AbstractEndpointValidator, Tuple[ValidationResponse, sendable]] = {}
+
+        # clients grouped by the endpoint (event) and data they are sent
+        targets: Dict[Tuple[str, int], Tuple[sendable, List[IoTClient]]] = {}
+
+        for client, validator in self.find(special_id, endpoint_type, client_type):
+            if validator not in validated:
+                validated[validator] = validate(validator, data)
+
+            response, converted = validated[validator]
+            results[client.id] = response.value
+
+            if response != ValidationResponse.VALID or \
+                    self.manager.states.suppressed(client.id, validator.id, converted):
+                continue
+
+            targets.setdefault((validator.id, id(converted)), (converted, []))[1].append(client)
+
+        for (endpoint_id, _), (converted, clients) in targets.items():
+            self.manager.send(clients, endpoint_id, converted, priority)
+
+            for client in clients:
+                self.manager.states.command(client.id, endpoint_id, converted)
+
+        return results
+
+    def added(self, client: IoTClient):
+        """
+        Called by the manager whenever a client is added or its endpoints changed, indexes its endpoints.
+
+        :param client: The client.
+        :return:
+        """
+        special_ids = set()
+
+        for validator in client.endpoints.values():
+            if validator.special_id is None:
+                continue
+
+            self.__index.setdefault(validator.special_id, {}).setdefault(client.id, []).append(validator)
+            special_ids.add(validator.special_id)
+
+        if special_ids:
+            self.__special_ids[client.id] = special_ids
+
+    def removed(self, client: IoTClient):
+        """
+        Called by the manager whenever a client is removed or its endpoints changed, removes its endpoints.
+
+        :param client: The client.
+        :return:
+        """
+        for special_id in self.__special_ids.pop(client.id, ()):
+            clients = self.__index.get(special_id, None)
+
+            if clients is None:
+                continue
+
+            clients.pop(client.id, None)
+
+            if not clients:
+                del self.__index[special_id]
+
+    def updated(self, client: IoTClient):
+        """
+        Called by the manager whenever the endpoints of a client changed.
+
+        :param client: The client.
+        :return:
+        """
+        self.removed(client)
+        self.added(client)
@@ -0,0 +1,273 @@
+# default
+from typing import TYPE_CHECKING, Dict, List, Tuple, Set, Hashable
+if TYPE_CHECKING:
+    from .Manager import IoTManager
+import logging
+
+# internal
+from .Client import IoTClient
+from .Control import ControlEvent, Priority
+from .Endpoint import EndpointParseResponse
+from .Errors import Errors
+from .exceptions import InvalidPacket
+from .PacketEncoder import PacketProblem
+from .types import sendable
+
+
+def encode_route(client_ids: List[str], frame: bytes) -> bytearray:
+    """
+    Encode a routed frame, used to carry a packet for one or more sub-clients over their gateway's connection.
+
+    Format: [2 byte id count] + ([2 byte id size] + [id]) * id count + [packet]
+
+    :param client_ids: IDs of the sub-clients the packet is for.
+    :param frame: The packet as encoded by the gateway's encoder.
+    :return: The routed frame.
+    """
+    data = bytearray(len(client_ids).to_bytes(2, byteorder="big", signed=False))
+
+    for client_id in client_ids:
+        client_id = client_id.encode("UTF-8", "ignore")
+        data += len(client_id).to_bytes(2, byteorder="big", signed=False) + client_id
+
+    return data + frame
+
+
+def decode_route(data: bytes) -> Tuple[List[str], bytes]:
+    """
+    Decode a routed frame.
+
+    :param data: The routed frame.
+    :return: The IDs of the sub-clients and the packet they are addressed by.
+    """
+    count = int.from_bytes(data[0:2], byteorder="big", signed=False)
+    offset = 2
+    client_ids = []
+
+    for _ in range(count):
+        size = int.from_bytes(data[offset:offset + 2], byteorder="big", signed=False)
+        client_ids.append(bytes(data[offset + 2:offset + 2 + size]).decode("UTF-8", "ignore"))
+        offset += 2 + size
+
+    if offset > len(data):
+        raise ValueError("route header exceeds the bounds of the frame")
+
+    return client_ids, bytes(data[offset:])
+
+
+class GatewaySocket:
+    # frames are written through the gateway, IoTClient.write passes their priority along
+    routed = True
+
+    def __init__(self, gateway: IoTClient, client_id: str):
+        """
+        Socket used by sub-clients, packets are routed over the connection of the gateway.
+
+        :param gateway: The client whose connection the sub-client is multiplexed over.
+        :param client_id: ID of the sub-client.
+        """
+        self.gateway = gateway
+        self.client_id = client_id
+        self.detached = False
+        self.environ = gateway.socket.environ
+
+    @property
+    def websocket_closed(self):
+        return self.detached or self.gateway.socket.websocket_closed
+
+    def send(self, data: bytearray, priority: Priority = Priority.NORMAL, key: Hashable = None):
+        # conflation keys are scoped to the sub-clients the routed frame is for
+        self.gateway.write(self.gateway.encoder.encode(ControlEvent.ROUTE.value, encode_route([self.client_id], data)),
+                           priority, ((self.client_id,), key) if key is not None else None)
+
+    def wait(self):
+        # sub-clients receive their packets through the gateway's connection
+        return None
+
+
+class GatewayManager:
+    def __init__(self, manager: 'IoTManager', logging_level: int = logging.ERROR):
+        """
+        Manages logical sub-clients which are multiplexed over the connection of a gateway client. Sub-clients are
+        created and destroyed using the attach and detach control events and otherwise behave like any other client,
+        they have their own id, type, endpoints and rooms.
+
+        :param manager: The IoTManager the sub-clients are added to.
+        :param logging_level: Logging level of the instance, useful for debugging.
+        """
+        self.logger = logging.Logger("iot.io-gateway")
+        self.logger.setLevel(logging_level)
+
+        self.manager = manager
+
+        # ids of the sub-clients attached to each gateway, keyed by the id of the gateway
+        self.__sub_clients: Dict[str, Set[str]] = {}
+
+        manager.add_control_handler(ControlEvent.ATTACH.value, self.attach)
+        manager.add_control_handler(ControlEvent.DETACH.value, self.detach)
+        manager.add_control_handler(ControlEvent.ROUTE.value, self.route)
+
+    def sub_clients(self, gateway: IoTClient) -> List[str]:
+        """
+        Get the IDs of the sub-clients attached to a gateway.
+
+        :param gateway: The gateway client.
+        :return: A list of sub-client IDs.
+        """
+        return list(self.__sub_clients.get(gateway.id, ()))
+
+    def __send_error(self, gateway: IoTClient, client_id: str, error: Errors, info: dict = None):
+        self.logger.warning("Error being sent to gateway '" + gateway.id + "' for sub-client '" + str(client_id)
+                            + "': '" + error.value + "'")
+
+        gateway.emit("error", {
+            "error": error.value,
+            "info": info,
+            "clientId": client_id
+        }, priority=Priority.CONTROL)
+
+    def attach(self, gateway: IoTClient, message: sendable):
+        """
+        Handler for the attach control event, creates a sub-client.
+
+        Message format: {"id": str, "type": str, "data": dict, "endpoints": list}
+
+        :param gateway: The gateway the sub-client is attached to.
+        :param message: The attach message.
+        :return:
+        """
+        if not isinstance(message, dict) or not isinstance(message.get("id", None), str):
+            return self.__send_error(gateway, None, Errors.CLIENT_NO_ID)
+
+        client_id = message["id"]
+
+        # a gateway can only replace its own sub-clients, never itself or a client connected by other means
+        if client_id == gateway.id or (self.manager.get_client(client_id) is not None and
+                                       client_id not in self.__sub_clients.get(gateway.id, ())):
+            return self.__send_error(gateway, client_id, Errors.CLIENT_ID_IN_USE)
+
+        if not isinstance(message.get("type", None), str):
+            return self.__send_error(gateway, client_id, Errors.CLIENT_NO_TYPE)
+
+        if self.manager.device_type(message["type"]) is None:
+            return self.__send_error(gateway, client_id, Errors.CLIENT_INVALID_TYPE)
+
+        if not isinstance(message.get("data", {}), dict):
+            return self.__send_error(gateway, client_id, Errors.CLIENT_INVALID_DATA)
+
+        if not isinstance(message.get("endpoints", []), list) or \
+                not all(isinstance(endpoint, dict) for endpoint in message.get("endpoints", [])):
+            return self.__send_error(gateway, client_id, Errors.CLIENT_INVALID_ENDPOINTS, {
+                "endpointId": "",
+                "endpointProblem": "invalid_json"
+            })
+
+        client = IoTClient(GatewaySocket(gateway, client_id), client_id, message["type"], message.get("data", {}),
+                           self.manager, logging_level=self.manager.client_logging_level, encoder=gateway.encoder)
+
+        endpoint_id, response = client.parse_endpoints(message.get("endpoints", []))
+
+        if response != EndpointParseResponse.VALID:
+            return self.__send_error(gateway, client_id, Errors.CLIENT_INVALID_ENDPOINTS, {
+                "endpointId": endpoint_id,
+                "endpointProblem": response.value
+            })
+
+        # remove a client with the same id if it exists (getting rid of ghost clients)
+        self.manager.remove(client_id)
+
+        self.__sub_clients.setdefault(gateway.id, set()).add(client_id)
+        self.manager.add(client)
+
+    def detach(self, gateway: IoTClient, message: sendable):
+        """
+        Handler for the detach control event, removes a sub-client.
+
+        Message format: {"id": str}
+
+        :param gateway: The gateway the sub-client is attached to.
+        :param message: The detach message.
+        :return:
+        """
+        if not isinstance(message, dict) or message.get("id", None) not in self.__sub_clients.get(gateway.id, ()):
+            return
+
+        self.manager.remove(message["id"])
+
+    def route(self, gateway: IoTClient, message: sendable):
+        """
+        Handler for the route control event, passes the packet it contains to each of the addressed sub-clients.
+
+        :param gateway: The gateway which sent the packet.
+        :param message: The routed frame.
+        :return:
+        """
+        if not isinstance(message, (bytes, bytearray)):
+            return
+
+        try:
+            client_ids, frame = decode_route(message)
+
+            gateway.encoder.check(frame, self.manager.packet_limits)
+            event, data = gateway.encoder.decode(frame)
+        except ValueError:
+            return self.__send_error(gateway, None, Errors.CLIENT_INVALID_PACKET, {
+                "packetProblem": PacketProblem.TRUNCATED.value
+            })
+        except InvalidPacket as e:
+            return self.__send_error(gateway, None, Errors.CLIENT_INVALID_PACKET, {
+                "packetProblem": e.problem.value
+            })
+
+        for client_id in client_ids:
+            if client_id not in self.__sub_clients.get(gateway.id, ()):
+                continue
+
+            client = self.manager.get_client(client_id)
+
+            if client is not None:
+                self.manager.handle(client, event, data)
+
+    def send(self, gateway: IoTClient, clients: List[IoTClient], frame: bytes, event: str, data: sendable,
+             priority: Priority = Priority.NORMAL, key: Hashable = None):
+        """
+        Send a packet to several sub-clients of the same gateway using a single routed frame.
+
+        :param gateway: The gateway the sub-clients are attached to.
+        :param clients: The sub-clients the packet is for.
+        :param frame: The packet as encoded by the gateway's encoder.
+        :param event: The client side event the packet was encoded for.
+        :param data: The data contained in the packet.
+        :param priority: Priority class of the packet.
+        :param key: Conflation key of the packet.
+        :return:
+        """
+        if gateway.socket.websocket_closed:
+            return
+
+        client_ids = [client.id for client in clients]
+
+        gateway.write(gateway.encoder.encode(ControlEvent.ROUTE.value, encode_route(client_ids, frame)), priority,
+                      (tuple(client_ids), key) if key is not None else None)
+
+        for client in clients:
+            self.manager.log_update(client, event, data)
+
+    def removed(self, client: IoTClient):
+        """
+        Called by the manager whenever a client is removed, removes the sub-clients of gateways and forgets removed
+        sub-clients.
+
+        :param client: The client which was removed.
+        :return:
+        """
+        if isinstance(client.socket, GatewaySocket):
+            client.socket.detached = True
+
+            sub_clients = self.__sub_clients.get(client.socket.gateway.id, None)
+
+            if sub_clients is not None:
+                sub_clients.discard(client.id)
+
+        for client_id in self.__sub_clients.pop(client.id, ()):
+            self.manager.remove(client_id)
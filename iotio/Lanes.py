@@ -0,0 +1,152 @@
+# default
+import collections
+from typing import Deque, Dict, Hashable, List, Tuple, Union
+
+# external
+from eventlet.event import Event
+
+# internal
+from .Control import Priority
+
+
+class Outbox:
+    __slots__ = ("lanes", "keys", "writing")
+
+    def __init__(self):
+        """
+        Frames waiting to be written to a client, one lane per priority class. Frames only wait here while another
+        frame is being written to the client's connection.
+        """
+        # each entry is a [frame, conflation key] pair
+        self.lanes: List[Deque[list]] = [collections.deque() for _ in Priority]
+
+        # waiting entries which carry a conflation key
+        self.keys: Dict[Hashable, list] = {}
+
+        # True while a green thread is writing to the connection
+        self.writing = False
+
+    def put(self, frame: bytes, priority: Priority, key: Hashable = None) -> bool:
+        """
+        Queue a frame.
+
+        :param frame: The encoded frame.
+        :param priority: Priority class of the frame.
+        :param key: Conflation key, a waiting frame with the same key is replaced in place by this one.
+        :return: True if the frame was added, False if it replaced a waiting frame.
+        """
+        entry = self.keys.get(key, None) if key is not None else None
+
+        if entry is not None:
+            entry[0] = frame
+            return False
+
+        entry = [frame, key]
+        self.lanes[priority].append(entry)
+
+        if key is not None:
+            self.keys[key] = entry
+
+        return True
+
+    def pop(self) -> Union[Tuple[bytes, Priority, Hashable], None]:
+        """
+        Take the next frame to be written.
+
+        :return: The oldest frame of the most urgent lane with its priority and conflation key, None if the outbox is
+                 empty.
+        """
+        for priority, lane in enumerate(self.lanes):
+            if lane:
+                frame, key = lane.popleft()
+
+                if key is not None:
+                    del self.keys[key]
+
+                return frame, Priority(priority), key
+
+        return None
+
+    def clear(self) -> int:
+        """
+        Drop every waiting frame.
+
+        :return: Number of frames which were dropped.
+        """
+        count = len(self)
+
+        for lane in self.lanes:
+            lane.clear()
+
+        self.keys.clear()
+
+        return count
+
+    def __len__(self):
+        return sum(len(lane) for lane in self.lanes)
+
+
+class HandlerLanes:
+    def __init__(self, limit: int = 0):
+        """
+        Limits the number of event handlers running at once. Once the limit is reached green threads wait for a free
+        slot in one lane per priority class and slots are handed to the most urgent waiter first, so control events
+        pre-empt bulk data.
+
+        :param limit: Maximum number of handlers running at once, 0 for no limit.
+        """
+        self.limit = limit
+        self.active = 0
+
+        self.__waiting: List[Deque[Event]] = [collections.deque() for _ in Priority]
+
+    @property
+    def waiting(self) -> int:
+        """
+        Number of green threads waiting for a slot.
+        """
+        return sum(len(lane) for lane in self.__waiting)
+
+    def acquire(self, priority: Priority):
+        """
+        Take a slot, waiting for one if every slot is taken.
+
+        :param priority: Priority of the event which will be handled.
+        :return:
+        """
+        if not self.limit:
+            return
+
+        if self.active < self.limit and not self.waiting:
+            self.active += 1
+            return
+
+        event = Event()
+        self.__waiting[priority].append(event)
+
+        try:
+            event.wait()
+        except BaseException:
+            # give up the place in the lane, or the slot if it was handed over already
+            if event.ready():
+                self.release()
+            else:
+                self.__waiting[priority].remove(event)
+
+            raise
+
+    def release(self):
+        """
+        Give up a slot, handing it to the most urgent waiter.
+
+        :return:
+        """
+        if not self.limit:
+            return
+
+        for lane in self.__waiting:
+            if lane:
+                lane.popleft().send()
+                return
+
+        self.active -= 1
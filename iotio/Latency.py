@@ -0,0 +1,185 @@
+# default
+import bisect
+import time
+from typing import TYPE_CHECKING, Dict, List, Union
+if TYPE_CHECKING:
+    from .Manager import IoTManager
+
+# internal
+from .Client import IoTClient
+from .Control import ControlEvent, Priority
+from .Timer import Timer
+from .types import sendable
+
+
+class LatencyStats:
+    __slots__ = ("last", "ewma", "samples")
+
+    def __init__(self):
+        """
+        Round trip time of a single client in milliseconds.
+        """
+        self.last: Union[float, None] = None
+        self.ewma: Union[float, None] = None
+        self.samples = 0
+
+    def record(self, rtt: float, alpha: float):
+        self.last = rtt
+        self.ewma = rtt if self.ewma is None else alpha * rtt + (1 - alpha) * self.ewma
+        self.samples += 1
+
+    def __dict__(self):
+        return {
+            "last": self.last,
+            "ewma": self.ewma,
+            "samples": self.samples
+        }
+
+
+class LatencyHistogram:
+    # upper bounds of the buckets in milliseconds, the last bucket holds everything above the largest bound
+    bounds = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+    def __init__(self):
+        """
+        Histogram of round trip times in milliseconds.
+        """
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+
+    def record(self, rtt: float):
+        self.counts[bisect.bisect_left(self.bounds, rtt)] += 1
+        self.total += 1
+
+    def percentile(self, p: float) -> Union[float, None]:
+        """
+        Estimate a percentile of the recorded round trip times.
+
+        :param p: The percentile between 0 and 100.
+        :return: The upper bound of the bucket containing the percentile, None if nothing was recorded.
+        """
+        if self.total == 0:
+            return None
+
+        rank = self.total * p / 100
+        seen = 0
+
+        for i, count in enumerate(self.counts):
+            seen += count
+
+            if seen >= rank and count:
+                return self.bounds[i] if i < len(self.bounds) else float("inf")
+
+        return float("inf")
+
+    def __dict__(self):
+        return {
+            "bounds": self.bounds,
+            "counts": self.counts,
+            "total": self.total
+        }
+
+
+class LatencyTracker:
+    def __init__(self, manager: 'IoTManager', interval: float = 0, alpha: float = 0.2):
+        """
+        Measures the round trip time of clients using ping control frames carrying a timestamp which the client echoes
+        back in a pong. Results are kept per client (last and EWMA) and per device type (histogram).
+
+        :param manager: The IoTManager whose clients are measured.
+        :param interval: Seconds between pings sent to each client, 0 disables periodic pings.
+        :param alpha: Smoothing factor of the exponentially weighted moving average.
+        """
+        self.manager = manager
+        self.interval = interval
+        self.alpha = alpha
+
+        self.__stats: Dict[str, LatencyStats] = {}
+        self.__histograms: Dict[str, LatencyHistogram] = {}
+        self.__timers: Dict[str, Timer] = {}
+
+    def get(self, client_id: str) -> Union[LatencyStats, None]:
+        """
+        Get the round trip time of a client.
+
+        :param client_id: ID of the client.
+        :return: The LatencyStats of the client, None if the client is not connected.
+        """
+        return self.__stats.get(client_id, None)
+
+    def histogram(self, client_type: str) -> LatencyHistogram:
+        """
+        Get the round trip time histogram of a device type.
+
+        :param client_type: The device type.
+        :return: The LatencyHistogram of the type.
+        """
+        return self.__histograms.setdefault(client_type, LatencyHistogram())
+
+    @property
+    def types(self) -> List[str]:
+        """
+        Device types which have a histogram.
+        """
+        return list(self.__histograms.keys())
+
+    def added(self, client: IoTClient):
+        """
+        Called by the manager whenever a client is added, starts measuring it.
+
+        :param client: The client which was added.
+        :return:
+        """
+        self.__stats[client.id] = LatencyStats()
+
+        if self.interval:
+            self.__timers[client.id] = self.manager.timers.schedule(self.interval, self.__periodic_ping, client)
+
+    def removed(self, client: IoTClient):
+        """
+        Called by the manager whenever a client is removed, stops measuring it.
+
+        :param client: The client which was removed.
+        :return:
+        """
+        self.__stats.pop(client.id, None)
+
+        timer = self.__timers.pop(client.id, None)
+        if timer is not None:
+            timer.cancel()
+
+    def ping(self, client: IoTClient):
+        """
+        Send a ping carrying the current time to a client.
+
+        :param client: The client to ping.
+        :return:
+        """
+        client.emit(ControlEvent.PING.value, {"t": time.monotonic() * 1000}, priority=Priority.CONTROL)
+
+    def pong(self, client: IoTClient, message: sendable):
+        """
+        Handler for the pong control event, records the round trip time of the ping it answers.
+
+        :param client: The client which answered.
+        :param message: The payload of the ping echoed by the client.
+        :return:
+        """
+        if not isinstance(message, dict) or not isinstance(message.get("t", None), (int, float)):
+            return
+
+        stats = self.__stats.get(client.id, None)
+        if stats is None:
+            return
+
+        rtt = max(0.0, time.monotonic() * 1000 - message["t"])
+
+        stats.record(rtt, self.alpha)
+        self.histogram(client.type).record(rtt)
+
+    def __periodic_ping(self, client: IoTClient):
+        if self.manager.get_client(client.id) is not client:
+            return
+
+        self.ping(client)
+        self.__timers[client.id] = self.manager.timers.schedule(self.interval, self.__periodic_ping, client)
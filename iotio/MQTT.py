@@ -0,0 +1,496 @@
+# default
+import enum
+import json
+import logging
+import socket
+import time
+from typing import TYPE_CHECKING, Tuple, Union, List
+if TYPE_CHECKING:
+    from .Manager import IoTManager
+
+# external
+import eventlet
+
+# internal
+from .Client import IoTClient
+from .PacketEncoder import AbstractPacketEncoder, PacketLimits, PacketProblem
+from .exceptions import InvalidPacket
+from .types import sendable
+
+
+class MQTTPacketType(enum.IntEnum):
+    # control packet types used by the MQTT 3.1.1 front-end
+    CONNECT = 1
+    CONNACK = 2
+    PUBLISH = 3
+    PUBACK = 4
+    SUBSCRIBE = 8
+    SUBACK = 9
+    UNSUBSCRIBE = 10
+    UNSUBACK = 11
+    PINGREQ = 12
+    PINGRESP = 13
+    DISCONNECT = 14
+
+
+class MQTTConnectReturnCode(enum.IntEnum):
+    ACCEPTED = 0
+    UNACCEPTABLE_PROTOCOL_VERSION = 1
+    IDENTIFIER_REJECTED = 2
+    SERVER_UNAVAILABLE = 3
+    BAD_USERNAME_OR_PASSWORD = 4
+    NOT_AUTHORIZED = 5
+
+
+def encode_remaining_length(length: int) -> bytearray:
+    """
+    Encode the remaining length field of a MQTT fixed header.
+
+    :param length: Number of bytes which follow the fixed header.
+    :return: The variable length encoded field.
+    """
+    encoded = bytearray()
+
+    while True:
+        byte = length % 128
+        length //= 128
+
+        if length > 0:
+            byte |= 0x80
+
+        encoded.append(byte)
+
+        if length == 0:
+            return encoded
+
+
+def encode_string(value: Union[str, bytes]) -> bytearray:
+    """
+    Encode a length prefixed MQTT string.
+
+    :param value: The string to be encoded.
+    :return: The encoded string.
+    """
+    if isinstance(value, str):
+        value = value.encode("UTF-8", "ignore")
+
+    return bytearray(len(value).to_bytes(2, byteorder="big", signed=False)) + value
+
+
+def encode_packet(packet_type: MQTTPacketType, flags: int, body: Union[bytes, bytearray]) -> bytearray:
+    """
+    Encode a full MQTT control packet.
+
+    :param packet_type: Type of the control packet.
+    :param flags: The lower 4 bits of the first byte of the fixed header.
+    :param body: The variable header and payload of the packet.
+    :return: The encoded packet.
+    """
+    return bytearray([(packet_type << 4) | flags]) + encode_remaining_length(len(body)) + body
+
+
+def decode_string(data: Union[bytes, bytearray], offset: int) -> Tuple[str, int]:
+    """
+    Decode a length prefixed MQTT string.
+
+    :param data: Buffer containing the string.
+    :param offset: Position of the length prefix in the buffer.
+    :return: The decoded string and the offset directly after it.
+    """
+    size = int.from_bytes(data[offset:offset + 2], byteorder="big", signed=False)
+
+    if offset + 2 + size > len(data):
+        raise ValueError("string exceeds the bounds of the packet")
+
+    return bytes(data[offset + 2:offset + 2 + size]).decode("UTF-8", "ignore"), offset + 2 + size
+
+
+class MQTTPacketEncoder(AbstractPacketEncoder):
+    """
+    PacketEncoder used for clients connected through the MQTT front-end. Events are mapped onto PUBLISH topics,
+    payloads are sent as raw bytes, UTF-8 text or JSON depending on the type of the message.
+    """
+    @staticmethod
+    def encode(event: str, message: sendable) -> bytearray:
+        # serialize the payload
+        if isinstance(message, bytearray) or isinstance(message, bytes):
+            payload = bytes(message)
+        elif isinstance(message, str):
+            payload = message.encode("UTF-8", "ignore")
+        elif isinstance(message, (bool, int, dict, list)):
+            payload = json.dumps(message).encode("UTF-8", "ignore")
+        else:
+            raise ValueError("Cannot encode message of type '" + str(type(message)) + "' for MQTT clients.")
+
+        # QoS 0 publish with the event as the topic
+        return encode_packet(MQTTPacketType.PUBLISH, 0, encode_string(event) + payload)
+
+    @staticmethod
+    def check(data: bytearray, limits: PacketLimits):
+        if not isinstance(data, (bytes, bytearray)):
+            raise InvalidPacket(PacketProblem.NOT_BINARY)
+
+        AbstractPacketEncoder.check(data, limits)
+
+        # skip the fixed header
+        offset = 1
+        while offset < len(data) and data[offset] & 0x80:
+            offset += 1
+        offset += 1
+
+        if offset + 2 > len(data):
+            raise InvalidPacket(PacketProblem.TRUNCATED)
+
+        topic_size = int.from_bytes(data[offset:offset + 2], byteorder="big", signed=False)
+
+        if topic_size > limits.max_event_size:
+            raise InvalidPacket(PacketProblem.EVENT_TOO_LARGE)
+
+        # the payload is whatever follows the topic and the packet identifier
+        payload_offset = offset + 2 + topic_size + (2 if (data[0] >> 1) & 0x03 else 0)
+
+        if payload_offset > len(data):
+            raise InvalidPacket(PacketProblem.TRUNCATED)
+
+        if len(data) - payload_offset > limits.max_payload_size:
+            raise InvalidPacket(PacketProblem.PAYLOAD_TOO_LARGE)
+
+    @staticmethod
+    def decode(data: bytearray) -> Tuple[str, sendable]:
+        # skip the fixed header
+        offset = 1
+        while data[offset] & 0x80:
+            offset += 1
+        offset += 1
+
+        # get the topic, which is used as the event
+        event, offset = decode_string(data, offset)
+
+        # skip the packet identifier of QoS 1 and 2 publishes
+        if (data[0] >> 1) & 0x03:
+            offset += 2
+
+        payload = bytes(data[offset:])
+
+        # payloads are parsed as JSON when possible, otherwise as text, otherwise they are kept as bytes
+        try:
+            text = payload.decode("UTF-8")
+        except UnicodeDecodeError:
+            return event, payload
+
+        try:
+            return event, json.loads(text)
+        except ValueError:
+            return event, text
+
+    @classmethod
+    def encode_batch(cls, packets: List[bytes]) -> bytearray:
+        # MQTT packets are self delimiting so a batch is sent as consecutive publishes in one write
+        return bytearray(b"".join(packets))
+
+
+class MQTTConnection:
+    def __init__(self, sock: socket.socket, manager: 'IoTManager', room_prefix: str = "rooms/"):
+        """
+        Wraps a MQTT connection so that it can be used by an IoTClient in the place of a WebSocket. Control packets
+        are answered internally, wait() only returns PUBLISH packets.
+
+        :param sock: Green socket of the accepted connection.
+        :param manager: The IoTManager the connection belongs to.
+        :param room_prefix: Subscriptions to topics starting with the prefix are mapped onto rooms.
+        """
+        self.sock = sock
+        self.manager = manager
+        self.room_prefix = room_prefix
+        self.client = None
+        self.environ = {}
+
+        self.__file = sock.makefile("rb")
+        self.__closed = False
+
+    @property
+    def websocket_closed(self):
+        return self.__closed
+
+    def read_packet(self) -> Union[Tuple[int, int, bytes], None]:
+        """
+        Read a single control packet from the connection.
+
+        :return: The packet type, the flags and the body of the packet, or None if the connection ended.
+        """
+        try:
+            header = self.__file.read(1)
+
+            if not header:
+                return None
+
+            # decode the remaining length
+            length = 0
+            multiplier = 1
+
+            for _ in range(4):
+                byte = self.__file.read(1)
+
+                if not byte:
+                    return None
+
+                length += (byte[0] & 0x7F) * multiplier
+                multiplier *= 128
+
+                if not byte[0] & 0x80:
+                    break
+            else:
+                return None
+
+            # oversized packets are rejected before they are read
+            if length > self.manager.packet_limits.max_frame_size:
+                return None
+
+            body = self.__file.read(length)
+
+            if len(body) != length:
+                return None
+        except (socket.timeout, OSError):
+            return None
+
+        return header[0] >> 4, header[0] & 0x0F, body
+
+    def wait(self) -> Union[bytearray, None]:
+        while not self.__closed:
+            packet = self.read_packet()
+
+            if packet is None:
+                break
+
+            packet_type, flags, body = packet
+
+            # a malformed packet ends the connection
+            try:
+                if packet_type == MQTTPacketType.PUBLISH:
+                    qos = (flags >> 1) & 0x03
+
+                    # QoS 2 is not supported by the front-end
+                    if qos == 2:
+                        break
+
+                    if qos == 1:
+                        _, offset = decode_string(body, 0)
+                        self.send(encode_packet(MQTTPacketType.PUBACK, 0, body[offset:offset + 2]))
+
+                    return encode_packet(MQTTPacketType.PUBLISH, flags, body)
+                elif packet_type == MQTTPacketType.SUBSCRIBE:
+                    self.__subscribe(body)
+                elif packet_type == MQTTPacketType.UNSUBSCRIBE:
+                    self.__unsubscribe(body)
+                elif packet_type == MQTTPacketType.PINGREQ:
+                    if self.client is not None:
+                        self.client.last_activity = time.monotonic()
+
+                    self.send(encode_packet(MQTTPacketType.PINGRESP, 0, b""))
+                elif packet_type == MQTTPacketType.DISCONNECT:
+                    break
+                else:
+                    # any other packet is a protocol violation
+                    break
+            except (ValueError, IndexError):
+                break
+
+        self.close()
+        return None
+
+    def send(self, data: bytearray):
+        if self.__closed:
+            return
+
+        self.sock.sendall(data)
+
+    def close(self):
+        if self.__closed:
+            return
+
+        self.__closed = True
+
+        # the socket is only released once its file is closed as well
+        try:
+            self.__file.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+    def __topics(self, body: bytes, with_qos: bool) -> List[str]:
+        topics = []
+        offset = 2
+
+        while offset < len(body):
+            topic, offset = decode_string(body, offset)
+
+            # skip the requested QoS
+            if with_qos:
+                offset += 1
+
+            topics.append(topic)
+
+        return topics
+
+    def __subscribe(self, body: bytes):
+        topics = self.__topics(body, True)
+
+        for topic in topics:
+            if topic.startswith(self.room_prefix) and self.client is not None:
+                self.manager.join(self.client, topic[len(self.room_prefix):])
+
+        # every subscription is granted with QoS 0
+        self.send(encode_packet(MQTTPacketType.SUBACK, 0, body[0:2] + bytes(len(topics))))
+
+    def __unsubscribe(self, body: bytes):
+        for topic in self.__topics(body, False):
+            if topic.startswith(self.room_prefix) and self.client is not None:
+                self.manager.leave(self.client, topic[len(self.room_prefix):])
+
+        self.send(encode_packet(MQTTPacketType.UNSUBACK, 0, body[0:2]))
+
+
+class MQTTServer:
+    def __init__(self, manager: 'IoTManager', host: str = "0.0.0.0", port: int = 1883, default_type: str = None,
+                 room_prefix: str = "rooms/", logging_level: int = logging.ERROR):
+        """
+        A MQTT 3.1.1 front-end for the IoTManager. Clients connecting over MQTT are added to the manager like any
+        other client, publishes are passed to the on_* handlers of their DeviceType using the topic as the event,
+        subscriptions to topics starting with room_prefix join the matching room and data emitted to the client is
+        published to it using the event as the topic.
+
+        The client id of the CONNECT packet is used as the id of the client and the username as its device type.
+
+        :param manager: The IoTManager clients should be added to.
+        :param host: Address the listener should bind to.
+        :param port: Port the listener should bind to, 0 picks a free port.
+        :param default_type: Device type used for clients which do not provide a username.
+        :param room_prefix: Prefix of topics which are mapped onto rooms.
+        :param logging_level: Logging level of the instance, useful for debugging.
+        """
+        self.logger = logging.Logger("iot.io-mqtt")
+        self.logger.setLevel(logging_level)
+
+        self.manager = manager
+        self.host = host
+        self.port = port
+        self.default_type = default_type
+        self.room_prefix = room_prefix
+
+        self.__listener = None
+        self.__thread = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """
+        The address the listener is bound to, only available once the server is started.
+        """
+        return self.__listener.getsockname()
+
+    def start(self):
+        """
+        Start listening for MQTT clients in a new green thread.
+
+        :return:
+        """
+        self.__listener = eventlet.listen((self.host, self.port))
+        self.__thread = eventlet.spawn(self.__accept)
+
+    def stop(self):
+        """
+        Stop listening for new MQTT clients, already connected clients are not disconnected.
+
+        :return:
+        """
+        if self.__thread is not None:
+            self.__thread.kill()
+            self.__thread = None
+
+        if self.__listener is not None:
+            self.__listener.close()
+
+    def __accept(self):
+        while True:
+            sock, address = self.__listener.accept()
+            eventlet.spawn_n(self.__handle, sock, address)
+
+    def __handle(self, sock: socket.socket, address: tuple):
+        connection = MQTTConnection(sock, self.manager, self.room_prefix)
+
+        # the first packet must be a CONNECT packet
+        packet = connection.read_packet()
+
+        if packet is None or packet[0] != MQTTPacketType.CONNECT:
+            connection.close()
+            return
+
+        try:
+            client_id, client_type, keep_alive, code = self.__parse_connect(packet[2])
+        except (ValueError, IndexError):
+            connection.close()
+            return
+
+        if code == MQTTConnectReturnCode.ACCEPTED and self.manager.device_type(client_type) is None:
+            self.logger.warning("MQTT client with ID '" + client_id + "' claimed a device type of '"
+                                + str(client_type) + "' but no such device type was defined. Refusing connection.")
+
+            code = MQTTConnectReturnCode.NOT_AUTHORIZED
+
+        # admitted like a websocket connection, the type is only known once the CONNECT packet was read
+        if code == MQTTConnectReturnCode.ACCEPTED:
+            connection.environ = {"REMOTE_ADDR": address[0], "HTTP_IOT_IO_TYPE": client_type}
+
+            if self.manager.admit(connection.environ) is not None:
+                code = MQTTConnectReturnCode.SERVER_UNAVAILABLE
+
+        try:
+            connection.send(encode_packet(MQTTPacketType.CONNACK, 0, bytes([0, code])))
+
+            if code != MQTTConnectReturnCode.ACCEPTED:
+                return
+
+            # the server may close the connection after one and a half times the keep alive interval
+            if keep_alive:
+                sock.settimeout(keep_alive * 1.5)
+
+            # remove a client with the same id if it exists (getting rid of ghost clients)
+            self.manager.remove(client_id)
+
+            client = IoTClient(connection, client_id, client_type, {}, self.manager,
+                               logging_level=self.manager.client_logging_level, encoder=MQTTPacketEncoder)
+            connection.client = client
+
+            self.manager.serve(client)
+        finally:
+            # give up the handshake slot if the connection ended before the manager released it
+            self.manager.admission.release(connection.environ)
+
+            # the client is gone, whether the connection ended or the manager dropped it
+            connection.close()
+
+    def __parse_connect(self, body: bytes) -> Tuple[str, str, int, MQTTConnectReturnCode]:
+        protocol, offset = decode_string(body, 0)
+        level = body[offset]
+        flags = body[offset + 1]
+        keep_alive = int.from_bytes(body[offset + 2:offset + 4], byteorder="big", signed=False)
+        offset += 4
+
+        if protocol != "MQTT" or level != 4:
+            return "", "", 0, MQTTConnectReturnCode.UNACCEPTABLE_PROTOCOL_VERSION
+
+        client_id, offset = decode_string(body, offset)
+
+        # skip the will topic and message
+        if flags & 0x04:
+            _, offset = decode_string(body, offset)
+            _, offset = decode_string(body, offset)
+
+        client_type = self.default_type
+
+        if flags & 0x80:
+            client_type, offset = decode_string(body, offset)
+
+        if client_id == "":
+            return "", "", 0, MQTTConnectReturnCode.IDENTIFIER_REJECTED
+
+        return client_id, client_type, keep_alive, MQTTConnectReturnCode.ACCEPTED
@@ -1,10 +1,13 @@
 # default
 import json
 import logging
+import time
+import zlib
 from cgi import parse
 from typing import List, Dict, Union, Callable
 
 # external
+import eventlet
 import flask
 from eventlet import websocket
 from eventlet.websocket import WebSocket
@@ -19,14 +22,35 @@ except ImportError:
 
 # internal
 from .Client import IoTClient
+from .Control import CONTROL_PREFIX, ControlEvent, Priority
 from .Device import DeviceType
-from .PacketEncoder import AbstractPacketEncoder, DefaultPacketEncoder
+from .Gateway import GatewayManager, GatewaySocket
+from .Session import SessionManager, SuspendedSocket
+from .OfflineQueue import OfflineQueue
+from .Timer import TimingWheel, Timer
+from .Latency import LatencyTracker
+from .RateLimit import RateLimit, RateLimiter, RateLimitAction
+from .Admission import AdmissionControl
+from .Overload import OverloadDetector
+from .Lanes import HandlerLanes
+from .Delta import DeltaTracker
+from .RPC import Call, CallManager
+from .Command import CommandQueue
+from .Fleet import FleetIndex
+from .EndpointState import EndpointStateCache, SuppressPolicy
+from .Shadow import ShadowManager, AbstractShadowStore
+from .Directory import ClientDirectory, ClientPage
+from .Feed import ChangeFeed
+from .PacketEncoder import AbstractPacketEncoder, DefaultPacketEncoder, PacketLimits, PacketProblem
 from .types import event_pair, sendable
 from .exceptions import ConnectionEnded, ConnectionFailed, ClientNoId, ClientNoType, ClientInvalidType, \
-    ClientInvalidData, ClientInvalidEndpoints, ClientNoProtocolVersion, ClientIncompatibleProtocolVersion
+    ClientInvalidData, ClientInvalidEndpoints, ClientNoProtocolVersion, ClientIncompatibleProtocolVersion, \
+    InvalidPacket
 from .Errors import Errors
-from .Endpoint import EndpointParseResponse, ValidationResponse, AbstractEndpointValidator
-from .EndpointResource import EndpointResource
+from .Endpoint import EndpointParseResponse, ValidationResponse, AbstractEndpointValidator, EndpointCache, \
+    EndpointType
+from .EndpointResource import EndpointCommands, ClientListing, FeedStream, EndpointResource, \
+    BatchEndpointResource, CommandResource, SpecialEndpointResource, ClientsResource, FeedResource
 from .__main__ import __protocol_version__
 
 
@@ -43,12 +67,20 @@ class IoTManagerMiddleware(object):
         self.wsgi_app = wsgi_app
         self.manager = manager
 
-        # eventlet websocket server handler
-        self.ws = websocket.WebSocketWSGI(self.socket)
+        # eventlet websocket server handler, frames over the size limit are rejected before they are read
+        self.ws = websocket.WebSocketWSGI(self.socket, max_frame_length=manager.packet_limits.max_frame_size)
 
     def __call__(self, environ, start_response):
         # if the path belongs to the iot.io server
         if environ["PATH_INFO"].startswith("/iot.io"):
+            # refuse the connection before upgrading it if the manager is overloaded or not admitting it
+            retry_after = self.manager.admit(environ)
+
+            if retry_after is not None:
+                start_response("503 Service Unavailable", [('Content-Type', 'text/plain'),
+                                                           ('Retry-After', str(retry_after))])
+                return [b""]
+
             # try to handle the request normally
             try:
                 # handle using websocket function
@@ -58,6 +90,9 @@ class IoTManagerMiddleware(object):
                 # start response for a 400 code
                 start_response("400 Bad Request", [('Content-Type', 'text/plain')])
                 return [""]
+            finally:
+                # give up the handshake slot if the handshake did not complete
+                self.manager.admission.release(environ)
 
         # hand down other requests
         return self.wsgi_app(environ, start_response)
@@ -74,7 +109,14 @@ class IoTManager(object):
 
     def __init__(self, app: flask.Flask, logging_level: int = logging.ERROR, client_logging_level: int = logging.ERROR,
                  encoder: AbstractPacketEncoder = DefaultPacketEncoder, endpoint_api: Union[Api, bool] = None,
-                 endpoint_auth_decorator: Callable[[Callable[..., None]], Callable[..., None]] = None):
+                 endpoint_auth_decorator: Callable[[Callable[..., None]], Callable[..., None]] = None,
+                 endpoint_cache_size: int = 256, session_grace_period: float = 0, session_max_pending: int = 100,
+                 offline_queue: OfflineQueue = None, heartbeat_interval: float = 0, idle_timeout: float = 0,
+                 latency_interval: float = 0, rate_limit: RateLimit = None,
+                 packet_limits: PacketLimits = None, admission: AdmissionControl = None,
+                 overload: OverloadDetector = None, max_handlers: int = 0, delta_keyframe_interval: int = 20,
+                 command_suppression: SuppressPolicy = SuppressPolicy.NEVER, shadow_store: AbstractShadowStore = None,
+                 feed_interval: float = 1):
         """
         A Flask extension used to allow IoT.IO clients to connect to the given flask server.
 
@@ -87,6 +129,37 @@ class IoTManager(object):
                              REST Api for endpoints defined by clients, requires Flask-Restful to be installed.
         :param endpoint_auth_decorator: A wrapper function used to wrap the methods of the Flask-Restful Resource if
                                         user authentication is a desired requirement for accessing the resource.
+        :param endpoint_cache_size: Number of distinct IoT-IO-Endpoints declarations whose parsed validators are
+                                    cached and shared between clients, 0 disables the cache.
+        :param session_grace_period: Seconds the state of a disconnected client is held for so that it can resume its
+                                     session by reconnecting with the IoT-IO-Session header, 0 disables sessions.
+        :param session_max_pending: Maximum number of frames held for a disconnected client until it resumes.
+        :param offline_queue: An OfflineQueue used to hold data emitted to a client_id which is not connected, the
+                              data is delivered in one batch when the client connects.
+        :param heartbeat_interval: Seconds a client can be idle before it is sent a heartbeat, which it answers with
+                                   a pong, 0 disables heartbeats.
+        :param idle_timeout: Seconds a client can be idle before its connection is considered dead and the client is
+                             removed, 0 disables the timeout.
+        :param latency_interval: Seconds between pings sent to each client to measure its round trip time, 0
+                                 disables periodic pings. Heartbeats are measured as well.
+        :param rate_limit: Limit on the messages and bytes each client can send per second, can be replaced for a
+                           device type by setting DeviceType.rate_limit.
+        :param packet_limits: Size limits enforced on packets received from clients before they are decoded, packets
+                              violating them are answered with the client_invalid_packet error.
+        :param admission: AdmissionControl deciding which connection attempts are let through to the handshake, by
+                          default every attempt is.
+        :param overload: OverloadDetector which sheds low priority messages and refuses new connections when the hub
+                         lags or too many frames are waiting to be written, by default nothing is shed.
+        :param max_handlers: Maximum number of event handlers running at once, once it is reached events wait for a
+                             free slot and more urgent events are handled first. 0 for no limit.
+        :param delta_keyframe_interval: Number of patches sent for an event listed in DeviceType.delta_events before
+                                        the full state is sent again.
+        :param command_suppression: Which endpoint commands are not sent because they would not change the cached
+                                    value of the endpoint, by default every command is sent.
+        :param shadow_store: Where the desired and reported state documents of clients are kept, use a
+                             SQLiteShadowStore for them to survive a restart. Kept in memory by default.
+        :param feed_interval: Seconds the changes published on the change feed are collected for before they are
+                              sent to its subscribers as one batch.
         """
         # logger for the manager
         self.logger = logging.Logger("iot.io-server")
@@ -98,8 +171,9 @@ class IoTManager(object):
         # reference to flask app
         self.app = app
 
-        # reference to Api if it exists
+        # reference to Api if it exists, and the handler of its requests
         self.api = None
+        self.endpoint_commands = None
 
         # decorator used to authorize
         self.auth_decorator = endpoint_auth_decorator
@@ -107,6 +181,29 @@ class IoTManager(object):
         # encoder used by clients
         self.encoder = encoder
 
+        # size limits of received packets and admission control, needed by the middleware
+        self.packet_limits = packet_limits if packet_limits is not None else PacketLimits()
+        self.admission = admission if admission is not None else AdmissionControl()
+        self.overload = overload if overload is not None else OverloadDetector(logging_level=logging_level)
+
+        # priority scheduling of event handlers
+        self.handlers = HandlerLanes(max_handlers)
+
+        # cache of parsed endpoint declarations
+        self.endpoint_cache = EndpointCache(endpoint_cache_size)
+
+        # queue of messages for clients which are not connected
+        self.offline_queue = offline_queue
+
+        # timers for heartbeats, idle timeouts and other deadlines
+        self.timers = TimingWheel(logging_level=logging_level)
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+
+        # expired offline messages are purged and spilled messages committed in the background
+        if self.offline_queue is not None:
+            self.timers.schedule(self.offline_queue.commit_interval, self.__maintain_offline_queue)
+
         # if app is provided initialize the app
         if app:
             self.init_app(app)
@@ -130,9 +227,28 @@ class IoTManager(object):
 
         # if the Api exists
         if self.api:
+            # request handling is set up once and shared by every request
+            self.endpoint_commands = EndpointCommands(self, self.auth_decorator)
+            self.client_listing = ClientListing(self, self.auth_decorator)
+            self.feed_stream = FeedStream(self, self.auth_decorator)
+
             self.api.add_resource(EndpointResource, "/iot.io", resource_class_kwargs={
-                "manager": self,
-                "auth_decorator": self.auth_decorator
+                "commands": self.endpoint_commands
+            })
+            self.api.add_resource(BatchEndpointResource, "/iot.io/batch", resource_class_kwargs={
+                "commands": self.endpoint_commands
+            })
+            self.api.add_resource(CommandResource, "/iot.io/commands/<string:command_id>", resource_class_kwargs={
+                "commands": self.endpoint_commands
+            })
+            self.api.add_resource(SpecialEndpointResource, "/iot.io/special", resource_class_kwargs={
+                "commands": self.endpoint_commands
+            })
+            self.api.add_resource(ClientsResource, "/iot.io/clients", resource_class_kwargs={
+                "listing": self.client_listing
+            })
+            self.api.add_resource(FeedResource, "/iot.io/feed", resource_class_kwargs={
+                "stream": self.feed_stream
             })
 
         # list of active clients
@@ -144,10 +260,82 @@ class IoTManager(object):
         # dict which is used for storing which clients are in which rooms
         self.__rooms: Dict[str, List[str]] = {}
 
+        # handlers for the control events of the iot.io protocol, keyed by event
+        self.__control_handlers: Dict[str, Callable[[IoTClient, sendable], None]] = {}
+
+        # heartbeat and idle timeout timer of each client, keyed by client id
+        self.__liveness_timers: Dict[str, Timer] = {}
+
+        # default rate limit of clients and the buckets of the limits shared by all clients of a type
+        self.rate_limit = rate_limit
+        self.__type_buckets: Dict[str, tuple] = {}
+
+        # manager for sub-clients multiplexed over the connection of a gateway
+        self.gateways = GatewayManager(self, logging_level=logging_level)
+
+        self.add_control_handler(ControlEvent.ENDPOINTS.value, self.__handle_endpoints_message)
+
+        # round trip time measurements of clients
+        self.latency = LatencyTracker(self, latency_interval)
+        self.add_control_handler(ControlEvent.PONG.value, self.latency.pong)
+
+        # manager for the sessions of clients, used for fast reconnects
+        self.sessions = SessionManager(self, session_grace_period, session_max_pending)
+
+        # patches for repeated state pushes
+        self.deltas = DeltaTracker(self, delta_keyframe_interval)
+
+        # calls waiting for an answer from a client
+        self.calls = CallManager(self, logging_level)
+
+        # endpoint commands sent in the background
+        self.commands = CommandQueue(self, logging_level=logging_level)
+
+        # endpoints of every client indexed by special id
+        self.fleet = FleetIndex(self)
+
+        # last commanded and reported value of each endpoint
+        self.states = EndpointStateCache(self, command_suppression)
+
+        # desired and reported state of each client
+        self.shadows = ShadowManager(self, shadow_store)
+
+        # paginated listing of the clients
+        self.directory = ClientDirectory(self)
+
+        # changes of the clients streamed to dashboards
+        self.feed = ChangeFeed(self, feed_interval)
+
     # function for adding middleware
     def init_app(self, app: flask.Flask):
         app.wsgi_app = IoTManagerMiddleware(app, app.wsgi_app, self)
 
+        # the overload detector only samples the hub once it serves clients
+        self.overload.start()
+
+    def admit(self, environ: dict) -> Union[int, None]:
+        """
+        Decide if a connection attempt is let through, every connection is refused while the manager is overloaded.
+        Used by each transport before it accepts a client.
+
+        :param environ: WSGI environ of the connection attempt, transports other than websockets pass REMOTE_ADDR and
+                        HTTP_IOT_IO_TYPE.
+        :return: None if the connection is admitted, otherwise the seconds the client should wait before retrying.
+        """
+        if self.overload.refusing:
+            return self.admission.reject()
+
+        return self.admission.admit(environ)
+
+    def stop(self):
+        """
+        Stop the green threads of the manager, the overload detector and the timing wheel.
+
+        :return:
+        """
+        self.overload.stop()
+        self.timers.stop()
+
     # function for handling new websocket clients
     def socket(self, ws: WebSocket):
         # parse out client information from url
@@ -182,6 +370,13 @@ class IoTManager(object):
 
             raise ClientNoProtocolVersion()
 
+        # re-attach the client to its session if it presented a valid token, skipping the rest of the handshake
+        if "IoT-IO-Session" in headers.keys() and headers["IoT-IO-ProtocolVersion"] == __protocol_version__:
+            client = self.sessions.resume(headers["IoT-IO-Session"], headers["IoT-IO-Id"], ws)
+
+            if client is not None:
+                return self.serve(client, resumed=True)
+
         # if data is omitted populate with default value
         if "IoT-IO-Data" not in headers.keys():
             headers["IoT-IO-Data"] = "{}"
@@ -199,16 +394,21 @@ class IoTManager(object):
 
             raise ClientInvalidData()
 
-        try:
-            headers["IoT-IO-Endpoints"] = json.loads(headers["IoT-IO-Endpoints"])
-        except json.JSONDecodeError:
-            # send error message to client
-            self.__send_error(ws, Errors.CLIENT_INVALID_ENDPOINTS, {
-                "endpointId": "",
-                "endpointProblem": "invalid_json"
-            })
+        # identical declarations are only deserialized and parsed once
+        raw_endpoints = headers["IoT-IO-Endpoints"]
+        endpoints = self.endpoint_cache.get(raw_endpoints)
 
-            raise ClientInvalidEndpoints()
+        if endpoints is None:
+            try:
+                headers["IoT-IO-Endpoints"] = json.loads(raw_endpoints)
+            except json.JSONDecodeError:
+                # send error message to client
+                self.__send_error(ws, Errors.CLIENT_INVALID_ENDPOINTS, {
+                    "endpointId": "",
+                    "endpointProblem": "invalid_json"
+                })
+
+                raise ClientInvalidEndpoints()
 
         # check if the client's protocol version matches that of the server
         if headers["IoT-IO-ProtocolVersion"] != __protocol_version__:
@@ -236,47 +436,203 @@ class IoTManager(object):
         client = IoTClient(ws, headers["IoT-IO-Id"], headers["IoT-IO-Type"], headers["IoT-IO-Data"], self,
                            logging_level=self.client_logging_level, encoder=self.encoder)
 
-        # parse endpoints
-        endpoint_id, response = client.parse_endpoints(headers["IoT-IO-Endpoints"])
+        if endpoints is not None:
+            client.load_endpoints(endpoints)
+        else:
+            # parse endpoints
+            endpoint_id, response = client.parse_endpoints(headers["IoT-IO-Endpoints"])
 
-        if response != EndpointParseResponse.VALID:
-            self.__send_error(ws, Errors.CLIENT_INVALID_ENDPOINTS, {
-                "endpointId": endpoint_id,
-                "endpointProblem": response.value
-            })
+            if response != EndpointParseResponse.VALID:
+                self.__send_error(ws, Errors.CLIENT_INVALID_ENDPOINTS, {
+                    "endpointId": endpoint_id,
+                    "endpointProblem": response.value
+                })
+
+                raise ClientInvalidEndpoints()
+
+            # cache the validators and share them with the client
+            client.load_endpoints(self.endpoint_cache.put(raw_endpoints, client.endpoints))
+
+        self.serve(client, issue_session=True)
+
+    def serve(self, client: IoTClient, resumed: bool = False, issue_session: bool = False):
+        """
+        Add a client to the manager and handle the messages it sends until its connection ends. Used by every
+        transport the manager accepts clients from, the client's socket must provide wait(), send() and
+        websocket_closed like an eventlet WebSocket does.
+
+        :param client: An IoTClient instance whose connection has already been accepted.
+        :param resumed: True if the client resumed its session and is already part of the manager.
+        :param issue_session: True if the client should be issued a session token it can use to resume.
+        :return:
+        """
+        # the connection being served, a resumed session can take the client over from it
+        ws = client.socket
+
+        limiter = self.__rate_limiter(client)
+
+        if not resumed:
+            self.add(client)
 
-            raise ClientInvalidEndpoints()
+            if issue_session:
+                self.sessions.issue(client)
 
-        self.add(client)
+        # the handshake is complete, let the next waiting connection in
+        self.admission.release(ws.environ)
+
+        # set if the client is disconnected for abusing the connection, it is not allowed to resume its session
+        dropped = False
 
         # client loop
         try:
             data = ""
 
             while data is not None:
-                # wait for message from the websocket
+                # wait for message from the socket
                 data = ws.wait()
 
                 # if the message is None check if the connection is closed
                 if data is None:
                     break
 
-                # decode received message
-                event, message = self.encoder.decode(data)
+                client.last_activity = time.monotonic()
 
-                # call the callback associated with the event
-                event, response = self.__handle_event_message(event, message, client)
+                # enforce the rate limits of the client
+                if limiter is not None:
+                    wait = limiter.check(len(data))
 
-                # check if there is a response to send to the client
-                if response is not None:
-                    try:
-                        client.emit(event, response)
-                    except ConnectionEnded:
-                        return
-        except BrokenPipeError:
+                    if wait:
+                        if limiter.exceeded is RateLimitAction.DELAY:
+                            eventlet.sleep(wait)
+                        elif limiter.exceeded is RateLimitAction.DROP:
+                            continue
+                        else:
+                            self.__send_error(client, Errors.CLIENT_RATE_LIMITED)
+                            dropped = True
+                            break
+
+                # reject malformed and oversized packets before decoding them
+                try:
+                    client.encoder.check(data, self.packet_limits)
+
+                    # decode received message
+                    event, message = client.encoder.decode(data)
+                except InvalidPacket as e:
+                    self.__send_error(client, Errors.CLIENT_INVALID_PACKET, {
+                        "packetProblem": e.problem.value
+                    })
+                    continue
+
+                try:
+                    self.handle(client, event, message)
+                except ConnectionEnded:
+                    return
+        except (BrokenPipeError, ConnectionResetError):
             pass
         finally:
-            self.remove(client)
+            # nothing is removed if the client was taken over by a newer connection or can still resume its session
+            if client.socket is ws and (dropped or not self.sessions.suspend(client)):
+                self.remove(client)
+
+    def __maintain_offline_queue(self):
+        try:
+            self.offline_queue.maintain()
+        except Exception as e:
+            self.logger.error("Error when maintaining the offline queue: '" + str(e) + "'")
+
+        self.timers.schedule(self.offline_queue.commit_interval, self.__maintain_offline_queue)
+
+    def __rate_limiter(self, client: IoTClient) -> Union[RateLimiter, None]:
+        """
+        Create the RateLimiter enforcing the limits which apply to a client.
+
+        :param client: The client.
+        :return: The RateLimiter, None if no limits apply.
+        """
+        device = self.__types.get(client.type, None)
+        limits = []
+
+        limit = device.rate_limit if device is not None and device.rate_limit is not None else self.rate_limit
+
+        if limit is not None:
+            limits.append((limit,) + limit.buckets())
+
+        if device is not None and device.type_rate_limit is not None:
+            if client.type not in self.__type_buckets:
+                self.__type_buckets[client.type] = (device.type_rate_limit,) + device.type_rate_limit.buckets()
+
+            limits.append(self.__type_buckets[client.type])
+
+        return RateLimiter(limits) if limits else None
+
+    def handle(self, client: IoTClient, event: str, message: sendable):
+        """
+        Pass a message received from a client to dispatch, scheduled by its priority class. Low priority events are
+        shed while the manager is overloaded and handlers wait for a slot in the lane of their priority. Routed frames
+        are passed on at once, the GatewayManager schedules the event of each sub-client by the sub-client's type.
+
+        :param client: The client which sent the message.
+        :param event: The event of the message.
+        :param message: The decoded message.
+        :return:
+        """
+        if event == ControlEvent.ROUTE.value:
+            return self.dispatch(client, event, message)
+
+        if event.startswith(CONTROL_PREFIX):
+            priority = Priority.CONTROL
+        else:
+            device = self.__types.get(client.type, None)
+            priority = device.priority(event) if device is not None else Priority.NORMAL
+
+        # shed low priority events while overloaded, control events always go through
+        if not self.overload.admits(priority):
+            return
+
+        self.handlers.acquire(priority)
+
+        try:
+            self.dispatch(client, event, message)
+        finally:
+            self.handlers.release()
+
+    def dispatch(self, client: IoTClient, event: str, message: sendable):
+        """
+        Pass a message received from a client to the handler of its event, control events are handled by the manager
+        and all other events by the client's DeviceType. If the handler has a response it is sent to the client.
+
+        :param client: The client which sent the message.
+        :param event: The event of the message.
+        :param message: The decoded message.
+        :return:
+        """
+        if event.startswith(CONTROL_PREFIX):
+            handler = self.__control_handlers.get(event, None)
+
+            if handler is not None:
+                handler(client, message)
+
+            return
+
+        # call the callback associated with the event
+        event, response = self.__handle_event_message(event, message, client)
+
+        # check if there is a response to send to the client
+        if response is not None:
+            client.emit(event, response)
+
+    def add_control_handler(self, event: str, handler: Callable[[IoTClient, sendable], None]):
+        """
+        Define the handler for a control event of the iot.io protocol.
+
+        :param event: The control event, must start with the reserved control prefix.
+        :param handler: Function which is called with the client and the message whenever the event is received.
+        :return:
+        """
+        if not event.startswith(CONTROL_PREFIX):
+            raise ValueError("control events must start with '" + CONTROL_PREFIX + "'")
+
+        self.__control_handlers[event] = handler
 
     def add(self, client: IoTClient):
         """
@@ -290,10 +646,27 @@ class IoTManager(object):
 
         # add the client to the client list
         self.__clients[client.id] = client
+        self.fleet.added(client)
+        self.directory.changed()
+        self.feed.connected(client)
+
+        # watch the connection of clients which have one of their own
+        if not isinstance(client.socket, GatewaySocket):
+            if self.heartbeat_interval or self.idle_timeout:
+                self.__schedule_liveness_check(client)
+
+            self.latency.added(client)
 
         # call the on_connect handler
         self.__on_connect_handlers(client)
 
+        # deliver the messages emitted while the client was not connected
+        if self.offline_queue is not None:
+            client.send_batch(self.offline_queue.pop(client.id))
+
+        # send the desired state the client has not reached yet
+        self.shadows.added(client)
+
     def remove(self, client: Union[IoTClient, str]):
         """
         Remove a client from the manager.
@@ -310,20 +683,41 @@ class IoTManager(object):
             else:
                 client = self.__clients[client]
         elif isinstance(client, IoTClient):
-            pass
+            # a client which has already been replaced or removed has nothing left to clean up
+            if self.__clients.get(client.id, None) is not client:
+                return False
         else:
             raise TypeError("client must be either the id of a client as a str, or an instance of an IoTClient")
 
         # call the on_disconnect handler
         self.__on_disconnect_handlers(client)
 
-        # remove the client from the rooms
-        for room in self.__rooms.keys():
-            # remove the client from the room
-            self.__rooms[room].remove(client.id)
+        # remove the client from the rooms it is in
+        for room in client.rooms:
+            if client.id in self.__rooms.get(room, []):
+                self.__rooms[room].remove(client.id)
 
         # remove the client from the list of clients
         self.__clients.pop(client.id, None)
+        self.fleet.removed(client)
+        self.directory.changed()
+        self.feed.disconnected(client)
+
+        # remove the sub-clients of gateways
+        self.gateways.removed(client)
+
+        # drop the client's session
+        self.sessions.removed(client)
+
+        self.deltas.removed(client)
+        self.calls.removed(client)
+        self.states.removed(client)
+
+        timer = self.__liveness_timers.pop(client.id, None)
+        if timer is not None:
+            timer.cancel()
+
+        self.latency.removed(client)
 
         return True
 
@@ -334,7 +728,69 @@ class IoTManager(object):
 
         :return: A list() of client IDs as strings.
         """
-        return self.__clients.keys()
+        return list(self.__clients.keys())
+
+    def list_clients(self, limit: int = 100, cursor: str = None, client_type: str = None,
+                     room: str = None) -> ClientPage:
+        """
+        Page through the connected clients, every page of a listing is read from the same snapshot of the clients.
+
+        :param limit: Maximum number of clients in the page.
+        :param cursor: Cursor of the page, as returned with the previous page. None for the first page.
+        :param client_type: Only list clients of this type.
+        :param room: Only list clients in this room.
+        :return: The ClientPage, its cursor is None if it is the last page.
+        :raises ValueError: If the cursor is invalid or the limit is out of range.
+        """
+        return self.directory.page(limit, cursor, client_type, room)
+
+    def __schedule_liveness_check(self, client: IoTClient):
+        deadlines = [d for d in [self.heartbeat_interval, self.idle_timeout] if d]
+        idle = time.monotonic() - client.last_activity
+
+        # check again once the next heartbeat or the idle timeout is due
+        delay = min([d - idle for d in deadlines if d > idle] or deadlines)
+        self.__liveness_timers[client.id] = self.timers.schedule(delay, self.__check_liveness, client)
+
+    def __check_liveness(self, client: IoTClient):
+        """
+        Send a heartbeat to an idle client, or remove it if it was idle for longer than the idle timeout.
+
+        :param client: The client being checked.
+        :return:
+        """
+        if self.__clients.get(client.id, None) is not client:
+            return
+
+        idle = time.monotonic() - client.last_activity
+
+        # a client which is waiting to resume its session has no connection to check
+        if isinstance(client.socket, SuspendedSocket):
+            client.last_activity = time.monotonic()
+        elif self.idle_timeout and idle >= self.idle_timeout:
+            self.logger.info("Client '" + client.id + "' was idle for " + str(round(idle, 1)) + "s, removing it.")
+
+            self.remove(client)
+
+            try:
+                client.socket.close()
+            except Exception as e:
+                self.logger.debug("Error when closing the connection of client '" + client.id + "': " + str(e))
+
+            return
+        elif self.heartbeat_interval and idle >= self.heartbeat_interval:
+            self.latency.ping(client)
+
+        self.__schedule_liveness_check(client)
+
+    def get_client(self, client_id: str) -> Union[IoTClient, None]:
+        """
+        Get a connected client.
+
+        :param client_id: ID of the client.
+        :return: The IoTClient or None if no client with the ID is connected.
+        """
+        return self.__clients.get(client_id, None)
 
     def get_validator(self, client_id: str, endpoint_id: str) -> Union[AbstractEndpointValidator, ValidationResponse]:
         client = self.__clients.get(client_id, None)
@@ -344,11 +800,20 @@ class IoTManager(object):
         else:
             return client.get_validator(endpoint_id)
 
-    def __send_error(self, ws: WebSocket, error: Errors, info: dict = None):
+    def device_type(self, type_name: str) -> Union[DeviceType, None]:
+        """
+        Get a device type which was added to the manager.
+
+        :param type_name: The type of the device as a string.
+        :return: The DeviceType or None if no such type was defined.
+        """
+        return self.__types.get(type_name, None)
+
+    def __send_error(self, ws: Union[WebSocket, IoTClient], error: Errors, info: dict = None):
         """
         Send an error to a client via the WebSocket connection.
 
-        :param ws: WebSocket object.
+        :param ws: WebSocket object, or the IoTClient if the error occurred after the client was connected.
         :param error: Error which has occurred.
         :param info: Additional info about the error if needed.
         :return:
@@ -356,6 +821,14 @@ class IoTManager(object):
         # log the error being sent
         self.logger.warning("Error being sent to client: '" + str(error.value) + "' | info: '" + str(info) + "'")
 
+        # send the error to a connected client using its own encoder
+        if isinstance(ws, IoTClient):
+            ws.emit("error", {
+                "error": error.value,
+                "info": info
+            }, priority=Priority.CONTROL)
+            return
+
         # send the error to the client via the websocket
         ws.send(self.encoder.encode("error", {
             "error": error.value,
@@ -412,6 +885,80 @@ class IoTManager(object):
             self.logger.error("Error when calling generic on_disconnect handler for client '" + client.id
                               + "': " + str(e))
 
+    # handles the endpoints control event used to modify the endpoints of a connected client
+    def __handle_endpoints_message(self, client: IoTClient, message: sendable):
+        """
+        Add, remove or replace the endpoints of a connected client.
+
+        The message is either a dict of the form {"add": [...], "remove": [...], "replace": [...]}, or a list of
+        endpoint definitions which replaces all endpoints. Either can also be sent as zlib compressed JSON in a binary
+        message, which allows large endpoint lists to be sent in the first frame instead of the IoT-IO-Endpoints header.
+
+        :param client: The client whose endpoints are modified.
+        :param message: The endpoints message.
+        :return:
+        """
+        key = None
+
+        if isinstance(message, (bytes, bytearray)):
+            key = bytes(message)
+
+            # identical compressed catalogs are only parsed once
+            endpoints = self.endpoint_cache.get(key)
+
+            if endpoints is not None:
+                client.load_endpoints(endpoints)
+                self.fleet.updated(client)
+                self.states.updated(client)
+                return
+
+            # the decompressed catalog is held to the same limit as a frame, so a small frame can not expand into a
+            # huge one
+            decompressor = zlib.decompressobj()
+
+            try:
+                catalog = decompressor.decompress(key, self.packet_limits.max_frame_size)
+
+                if decompressor.unconsumed_tail:
+                    return self.__send_error(client, Errors.CLIENT_INVALID_PACKET, {
+                        "packetProblem": PacketProblem.FRAME_TOO_LARGE.value
+                    })
+
+                message = json.loads(catalog.decode("UTF-8"))
+            except (zlib.error, ValueError):
+                return self.__send_error(client, Errors.CLIENT_INVALID_ENDPOINTS, {
+                    "endpointId": "",
+                    "endpointProblem": "invalid_json"
+                })
+
+        if isinstance(message, list):
+            message = {"replace": message}
+
+        if not isinstance(message, dict) or \
+                not all(isinstance(message.get(field, []), list) for field in ["add", "remove", "replace"]) or \
+                not all(isinstance(endpoint, dict)
+                        for endpoint in message.get("add", []) + message.get("replace", [])) or \
+                not all(isinstance(endpoint_id, str) for endpoint_id in message.get("remove", [])):
+            return self.__send_error(client, Errors.CLIENT_INVALID_ENDPOINTS, {
+                "endpointId": "",
+                "endpointProblem": "invalid_json"
+            })
+
+        endpoint_id, response = client.update_endpoints(message.get("add", None), message.get("remove", None),
+                                                        message.get("replace", None))
+        self.fleet.updated(client)
+        self.states.updated(client)
+
+        if response != EndpointParseResponse.VALID:
+            return self.__send_error(client, Errors.CLIENT_INVALID_ENDPOINTS, {
+                "endpointId": endpoint_id,
+                "endpointProblem": response.value
+            })
+
+        # cache full catalogs so they can be shared with other clients
+        if key is not None and list(message.keys()) == ["replace"]:
+            client.load_endpoints(self.endpoint_cache.put(key, client.endpoints))
+
     # callback for when a client receives a message, sends it to the proper handler and squashes errors
     def __handle_event_message(self, event: str, message: str, client: IoTClient) -> event_pair:
         """
@@ -456,7 +1003,8 @@ class IoTManager(object):
         self.__types[device.type] = device
         self.logger.debug("Successfully added DeviceType '" + device.type + "'.")
 
-    def emit(self, event: str, data: sendable, client_id: str = None, client_type: str = None, room: str = None):
+    def emit(self, event: str, data: sendable, client_id: str = None, client_type: str = None, room: str = None,
+             ttl: float = None, key: str = None, priority: Priority = Priority.NORMAL, conflate: bool = False):
         """
         Emit function for sending data to a single client, group of client types, or room of clients.
 
@@ -469,31 +1017,119 @@ class IoTManager(object):
                             specifier.
         :param room: A room id of which all clients should be specified. If client_type is provided it will act as a
                      filter and only send the data ot clients of that type which are also in the specified room.
+        :param ttl: Seconds the data is held in the offline queue if the client specified by client_id is not
+                    connected, defaults to the queue's default_ttl and 0 disables queueing.
+        :param key: Coalescing key used by the offline queue and by conflation, replaces queued data for the client with
+                    the same key.
+        :param priority: Priority class of the data, low priority data is shed while the server is overloaded.
+        :param conflate: If True the data replaces data with the same key (or event if no key is given) which is still
+                         waiting to be written to a client, so slow clients only receive the latest value.
         :return:
         """
         if client_id is not None:
             client = self.__clients.get(client_id, None)
 
-            if client:
-                client.emit(event, data)
+            # hold the data until the client connects
+            if client is None and self.offline_queue is not None and (ttl is None or ttl > 0):
+                self.offline_queue.put(client_id, event, data, ttl=ttl, key=key)
+
+            targets = [client] if client else []
         elif room is not None:
+            targets = []
+
             if self.__rooms.get(room, None) is not None:
                 for client_id in self.__rooms[room]:
                     client = self.__clients.get(client_id, None)
 
                     if client:
-                        if client_type is None:
-                            client.emit(event, data)
-                        else:
-                            if client.type == client_type:
-                                client.emit(event, data)
+                        if client_type is None or client.type == client_type:
+                            targets.append(client)
         elif client_type is not None:
-            for client in self.__clients.values():
-                if client.type == client_type:
-                    client.emit(event, data)
+            targets = [client for client in self.__clients.values() if client.type == client_type]
         else:
             raise ValueError("'client_id', 'client_type', or 'room' must be provided")
 
+        self.send(targets, event, data, priority, (key if key is not None else event) if conflate else None)
+
+    def send(self, clients: List[IoTClient], event: str, data: sendable, priority: Priority = Priority.NORMAL,
+             key: str = None):
+        """
+        Send data to a list of clients, the packet is only encoded once for every encoder used by the clients.
+
+        :param clients: The clients which the data should be sent to.
+        :param event: The client side event to send the data to.
+        :param data: The data to be sent to the client(s).
+        :param priority: Priority class of the data, low priority data is shed while the server is overloaded.
+        :param key: Conflation key, the data replaces data with the same key which is still waiting to be written to a
+                    client. None if the data should not be conflated.
+        :return:
+        """
+        if not isinstance(event, str):
+            raise TypeError("'event' must be of type str")
+
+        if not clients or not self.overload.admits(priority):
+            return
+
+        # encoded packets keyed by the encoder which produced them
+        frames = {}
+
+        # sub-clients grouped by their gateway so they can share a single frame
+        routed: Dict[IoTClient, List[IoTClient]] = {}
+
+        # clients whose type receives the event as patches
+        deltas = []
+
+        for client in clients:
+            device = self.__types.get(client.type, None)
+
+            if device is not None and device.delta_events and isinstance(data, dict) and event in device.delta_events:
+                deltas.append(client)
+                continue
+
+            frame = frames.get(client.encoder, None)
+
+            if frame is None:
+                frame = frames[client.encoder] = client.encoder.encode(event, data)
+
+            if isinstance(client.socket, GatewaySocket):
+                routed.setdefault(client.socket.gateway, []).append(client)
+            else:
+                client.send(frame, event, data, priority, key)
+
+        for gateway, sub_clients in routed.items():
+            self.gateways.send(gateway, sub_clients, frames[gateway.encoder], event, data, priority, key)
+
+        if deltas:
+            self.deltas.send(deltas, event, data, priority, key)
+
+    def send_special(self, special_id: str, data: sendable, endpoint_type: Union[EndpointType, str] = None,
+                     client_type: str = None, priority: Priority = Priority.HIGH) -> Dict[str, str]:
+        """
+        Send data to every connected client which exposes an endpoint with the given specialId.
+
+        :param special_id: The specialId of the endpoints.
+        :param data: The data to be sent.
+        :param endpoint_type: Only send to endpoints of this type.
+        :param client_type: Only send to clients of this type.
+        :param priority: Priority class of the data.
+        :return: The validation response for each client with a matching endpoint, keyed by client id.
+        """
+        return self.fleet.send(special_id, data, endpoint_type, client_type, priority)
+
+    def call(self, client_id: str, event: str, data: sendable, timeout: float = 10,
+             priority: Priority = Priority.NORMAL) -> Call:
+        """
+        Call an event of a client and get the data it answers with. Many calls can be in flight per client at once.
+
+        :param client_id: ID of the client.
+        :param event: The client side event to call.
+        :param data: The data passed to the event.
+        :param timeout: Seconds the client has to answer before the call fails with CallTimeout.
+        :param priority: Priority class of the call.
+        :return: The Call, use wait() to block until it is answered or add_callback() to be notified.
+        """
+        return self.calls.call(client_id, event, data, timeout, priority)
+
     def join(self, client: Union[IoTClient, str], room: str, **kwargs):
         """
         Add a client to a specified room.
@@ -513,6 +1149,9 @@ class IoTManager(object):
         if self.__clients.get(client, None) is None:
             return
 
+        if room in self.__clients[client].rooms:
+            return
+
         if not kwargs.pop("called_by_client", False):
             self.__clients[client].join(room, called_by_manager=True)
 
@@ -521,6 +1160,9 @@ class IoTManager(object):
         else:
             self.__rooms[room].append(client)
 
+        self.directory.changed()
+        self.feed.joined(client, room)
+
     def leave(self, client: Union[IoTClient, str], room: str, **kwargs):
         """
         Remove a client from a specified room.
@@ -529,7 +1171,7 @@ class IoTManager(object):
         :param room: ID of the room to be left as a string
         :return:
         """
-        if not isinstance(client, str):
+        if not isinstance(client, str) and not isinstance(client, IoTClient):
             raise TypeError("'client' must be the ID of the client as a str")
         elif not isinstance(room, str):
             raise TypeError("'room' must be an instance of str")
@@ -540,12 +1182,18 @@ class IoTManager(object):
         if self.__clients.get(client, None) is None:
             return
 
+        if room not in self.__clients[client].rooms:
+            return
+
         if not kwargs.pop("called_by_client", False):
-            self.__clients[client].join(room, called_by_manager=True)
+            self.__clients[client].leave(room, called_by_manager=True)
+
+        self.directory.changed()
+        self.feed.left(client, room)
 
         if self.__rooms.get(room, None) is None:
             return
-        else:
+        elif client in self.__rooms[room]:
             self.__rooms[room].remove(client)
 
     def close_room(self, room: str):
@@ -565,6 +1213,9 @@ class IoTManager(object):
                 client = self.__clients.get(client, None)
                 if client:
                     client.leave(room, called_by_manager=True)
+                    self.feed.left(client.id, room)
+
+            self.directory.changed()
 
     # event decorator function
     def event(self, coroutine):
@@ -623,7 +1274,8 @@ class IoTManager(object):
         pass
 
 
-def emit(event: str, data: sendable, client_id: str = None, client_type: str = None, room: str = None):
+def emit(event: str, data: sendable, client_id: str = None, client_type: str = None, room: str = None,
+         ttl: float = None, key: str = None, priority: Priority = Priority.NORMAL, conflate: bool = False):
     """
     Emit function for sending data to a single client, group of client types, or room of clients.
 
@@ -636,9 +1288,17 @@ def emit(event: str, data: sendable, client_id: str = None, client_type: str = N
                         specifier.
     :param room: A room id of which all clients should be specified. If client_type is provided it will act as a
                  filter and only send the data ot clients of that type which are also in the specified room.
+    :param ttl: Seconds the data is held in the offline queue if the client specified by client_id is not
+                connected, defaults to the queue's default_ttl and 0 disables queueing.
+    :param key: Coalescing key used by the offline queue and by conflation, replaces queued data for the client with
+                the same key.
+    :param priority: Priority class of the data, low priority data is shed while the server is overloaded.
+    :param conflate: If True the data replaces data with the same key (or event if no key is given) which is still
+                     waiting to be written to a client, so slow clients only receive the latest value.
     :return:
     """
-    return flask.current_app.extensions["iot.io"].emit(event, data, client_id, client_type, room)
+    return flask.current_app.extensions["iot.io"].emit(event, data, client_id, client_type, room, ttl, key, priority,
+                                                       conflate)
 
 
 def join(client: Union[IoTClient, str], room: str):
@@ -649,7 +1309,7 @@ def join(client: Union[IoTClient, str], room: str):
     :param room: ID of the room to be joined as a string
     :return:
     """
-    return flask.current_app.extensions["iot.io"].emit(client, room)
+    return flask.current_app.extensions["iot.io"].join(client, room)
 
 
 def leave(client: Union[IoTClient, str], room: str):
@@ -660,7 +1320,7 @@ def leave(client: Union[IoTClient, str], room: str):
     :param room: ID of the room to be left as a string
     :return:
     """
-    return flask.current_app.extensions["iot.io"].emit(client, room)
+    return flask.current_app.extensions["iot.io"].leave(client, room)
 
 
 def close_room(room: str):
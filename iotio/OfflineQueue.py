@@ -0,0 +1,243 @@
+# default
+import itertools
+import sqlite3
+import time
+from typing import Dict, List, Tuple, Union
+
+# internal
+from .PacketEncoder import DefaultPacketEncoder
+from .types import sendable
+
+
+class OfflineMessage:
+    __slots__ = ("seq", "event", "data", "expires", "key")
+
+    def __init__(self, seq: int, event: str, data: sendable, expires: float, key: Union[str, None]):
+        """
+        A message held for a client which is not connected.
+
+        :param seq: Sequence number of the message, used to deliver messages in the order they were queued.
+        :param event: The client side event of the message.
+        :param data: The data of the message.
+        :param expires: Time (as returned by time.time()) after which the message is dropped.
+        :param key: Coalescing key of the message, a newer message with the same key replaces it.
+        """
+        self.seq = seq
+        self.event = event
+        self.data = data
+        self.expires = expires
+        self.key = key
+
+
+class OfflineQueue:
+    def __init__(self, default_ttl: float = 300, max_per_client: int = 100, max_memory: int = 10000,
+                 path: str = None, purge_interval: float = 60, commit_interval: float = 1):
+        """
+        Holds messages emitted to clients which are not connected so they can be delivered in one batch when the
+        client connects. Messages are kept in memory up to max_memory messages, after that they are spilled to a
+        SQLite database if a path is provided and dropped otherwise.
+
+        :param default_ttl: Seconds a message is held for if no ttl is given when it is queued.
+        :param max_per_client: Maximum number of messages held for a single client, the oldest are dropped first.
+        :param max_memory: Maximum number of messages held in memory for all clients.
+        :param path: Path of the SQLite database messages are spilled to, ":memory:" can be used for testing.
+        :param purge_interval: Seconds between purges of expired messages, run by the manager the queue is used by.
+        :param commit_interval: Seconds between commits of the changes made to the database, changes are committed
+                                in batches instead of on every message.
+        """
+        self.default_ttl = default_ttl
+        self.max_per_client = max_per_client
+        self.max_memory = max_memory
+        self.purge_interval = purge_interval
+        self.commit_interval = commit_interval
+
+        # messages held in memory keyed by client id and then by coalescing key
+        self.__messages: Dict[str, Dict[Union[str, int], OfflineMessage]] = {}
+        self.__size = 0
+
+        # number of messages spilled to disk for each client
+        self.__spilled: Dict[str, int] = {}
+
+        # used to order messages and to key messages without a coalescing key
+        self.__seq = itertools.count()
+
+        self.__db = None
+
+        # set while the database has uncommitted changes
+        self.__dirty = False
+        self.__purged = time.monotonic()
+
+        if path is not None:
+            self.__db = sqlite3.connect(path)
+            self.__db.execute("CREATE TABLE IF NOT EXISTS messages (client_id TEXT NOT NULL, seq INTEGER NOT NULL, "
+                              "key TEXT, expires REAL NOT NULL, packet BLOB NOT NULL)")
+            self.__db.execute("CREATE INDEX IF NOT EXISTS messages_client ON messages (client_id, seq)")
+
+            # continue numbering after messages left over from a previous run
+            for client_id, count, seq in self.__db.execute("SELECT client_id, COUNT(*), MAX(seq) FROM messages "
+                                                           "GROUP BY client_id").fetchall():
+                self.__spilled[client_id] = count
+                self.__seq = itertools.count(max(next(self.__seq), seq + 1))
+
+    def __len__(self):
+        return self.__size + sum(self.__spilled.values())
+
+    def put(self, client_id: str, event: str, data: sendable, ttl: float = None, key: str = None):
+        """
+        Queue a message for a client.
+
+        :param client_id: ID of the client.
+        :param event: The client side event of the message.
+        :param data: The data of the message.
+        :param ttl: Seconds the message is held for, defaults to default_ttl.
+        :param key: Coalescing key, replaces any queued message for the client with the same key.
+        :return:
+        :raises ValueError: If the data is of a type the encoder does not support, nothing is queued.
+        """
+        # encoded up front so data which can not be sent is refused when it is queued instead of when it is spilled
+        packet = bytes(DefaultPacketEncoder.encode(event, data))
+
+        now = time.time()
+        message = OfflineMessage(next(self.__seq), event, data, now + (self.default_ttl if ttl is None else ttl), key)
+
+        messages = self.__messages.setdefault(client_id, {})
+
+        if key is not None:
+            # replace a message with the same key
+            if messages.pop(key, None) is not None:
+                self.__size -= 1
+            elif self.__spilled.get(client_id, 0):
+                self.__delete(client_id, "key = ?", (key,))
+        else:
+            key = message.seq
+
+        if self.__size >= self.max_memory:
+            self.__purge_memory(now)
+            messages = self.__messages.setdefault(client_id, {})
+
+        if self.__size < self.max_memory:
+            messages[key] = message
+            self.__size += 1
+        elif self.__db is not None:
+            self.__db.execute("INSERT INTO messages VALUES (?, ?, ?, ?, ?)", (
+                client_id, message.seq, message.key, message.expires, packet
+            ))
+            self.__dirty = True
+            self.__spilled[client_id] = self.__spilled.get(client_id, 0) + 1
+        else:
+            if not messages:
+                del self.__messages[client_id]
+
+            return
+
+        # drop the oldest messages of the client once it is over its limit
+        while len(messages) + self.__spilled.get(client_id, 0) > self.max_per_client:
+            self.__drop_oldest(client_id)
+
+    def pop(self, client_id: str) -> List[Tuple[str, sendable]]:
+        """
+        Remove and return all messages held for a client which have not expired.
+
+        :param client_id: ID of the client.
+        :return: A list of event and data pairs in the order they were queued.
+        """
+        now = time.time()
+        messages = list(self.__messages.pop(client_id, {}).values())
+        self.__size -= len(messages)
+
+        if self.__spilled.pop(client_id, 0):
+            rows = self.__db.execute("SELECT seq, key, expires, packet FROM messages WHERE client_id = ?",
+                                     (client_id,)).fetchall()
+            self.__db.execute("DELETE FROM messages WHERE client_id = ?", (client_id,))
+            self.__dirty = True
+
+            for seq, key, expires, packet in rows:
+                event, data = DefaultPacketEncoder.decode(bytearray(packet))
+                messages.append(OfflineMessage(seq, event, data, expires, key))
+
+        messages.sort(key=lambda m: m.seq)
+
+        return [(message.event, message.data) for message in messages if message.expires > now]
+
+    def purge(self):
+        """
+        Drop every expired message.
+
+        :return:
+        """
+        now = time.time()
+
+        self.__purge_memory(now)
+
+        if self.__db is not None and self.__spilled:
+            self.__db.execute("DELETE FROM messages WHERE expires <= ?", (now,))
+            self.__dirty = True
+
+            self.__spilled = {
+                client_id: count for client_id, count in self.__db.execute(
+                    "SELECT client_id, COUNT(*) FROM messages GROUP BY client_id").fetchall()
+            }
+
+    def maintain(self):
+        """
+        Called by the manager every commit_interval seconds, purges expired messages once the purge interval passed and
+        commits the changes made to the database.
+
+        :return:
+        """
+        if time.monotonic() - self.__purged >= self.purge_interval:
+            self.__purged = time.monotonic()
+            self.purge()
+
+        self.flush()
+
+    def flush(self):
+        """
+        Commit the changes made to the database.
+
+        :return:
+        """
+        if self.__db is not None and self.__dirty:
+            self.__db.commit()
+            self.__dirty = False
+
+    def close(self):
+        if self.__db is not None:
+            self.flush()
+            self.__db.close()
+            self.__db = None
+
+    def __purge_memory(self, now: float):
+        for client_id in list(self.__messages.keys()):
+            messages = self.__messages[client_id]
+
+            for key in [key for key, message in messages.items() if message.expires <= now]:
+                del messages[key]
+                self.__size -= 1
+
+            if not messages:
+                del self.__messages[client_id]
+
+    def __delete(self, client_id: str, condition: str, params: tuple):
+        deleted = self.__db.execute("DELETE FROM messages WHERE client_id = ? AND " + condition,
+                                    (client_id,) + params).rowcount
+        self.__dirty = True
+
+        self.__spilled[client_id] -= deleted
+
+        if not self.__spilled[client_id]:
+            del self.__spilled[client_id]
+
+    def __drop_oldest(self, client_id: str):
+        messages = self.__messages.get(client_id, {})
+        oldest = next(iter(messages.values()), None)
+
+        # spilled messages are only older than the messages in memory if their sequence number is lower
+        if self.__spilled.get(client_id, 0):
+            seq = self.__db.execute("SELECT MIN(seq) FROM messages WHERE client_id = ?", (client_id,)).fetchone()[0]
+
+            if oldest is None or seq < oldest.seq:
+                return self.__delete(client_id, "seq = ?", (seq,))
+
+        del messages[oldest.key if oldest.key is not None else oldest.seq]
+        self.__size -= 1
@@ -0,0 +1,167 @@
+# default
+import enum
+import logging
+import time
+from typing import Union
+
+# external
+import eventlet
+
+# internal
+from .Control import Priority
+
+
+class OverloadState(enum.IntEnum):
+    NORMAL = 0
+    # low priority messages are dropped
+    SHEDDING = 1
+    # low priority messages are dropped and new connections are refused
+    REFUSING = 2
+
+
+class OverloadDetector:
+    def __init__(self, shed_lag: float = 0, refuse_lag: float = 0, shed_outbound: int = 0, refuse_outbound: int = 0,
+                 interval: float = 0.1, alpha: float = 0.3, recovery: float = 0.5, logging_level: int = logging.ERROR):
+        """
+        Measures the scheduling lag of the eventlet hub and the number of frames waiting to be written to clients, and
+        degrades the server in stages once they cross their thresholds. While shedding, low priority messages (in
+        both directions) are dropped, while refusing new connections are refused as well. Control traffic is never
+        dropped. A threshold of 0 disables that stage for the metric.
+
+        :param shed_lag: Hub lag in seconds at which low priority messages are shed.
+        :param refuse_lag: Hub lag in seconds at which new connections are refused.
+        :param shed_outbound: Outbound frames at which low priority messages are shed.
+        :param refuse_outbound: Outbound frames at which new connections are refused.
+        :param interval: Seconds between measurements of the hub lag.
+        :param alpha: Smoothing factor of the exponentially weighted moving average of the hub lag.
+        :param recovery: A stage is only left once the metrics which caused it fall below this fraction of its
+                         thresholds, stops the state from flapping.
+        :param logging_level: Logging level of the instance, useful for debugging.
+        """
+        self.logger = logging.Logger("iot.io-overload")
+        self.logger.setLevel(logging_level)
+
+        self.shed_lag = shed_lag
+        self.refuse_lag = refuse_lag
+        self.shed_outbound = shed_outbound
+        self.refuse_outbound = refuse_outbound
+        self.interval = interval
+        self.alpha = alpha
+        self.recovery = recovery
+
+        # smoothed hub lag in seconds and the number of frames waiting to be written
+        self.lag = 0.0
+        self.outbound = 0
+
+        self.state = OverloadState.NORMAL
+
+        # why the current state was entered
+        self.reason: Union[str, None] = None
+
+        # number of messages dropped while shedding
+        self.dropped = 0
+
+        self.__thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.shed_lag or self.refuse_lag or self.shed_outbound or self.refuse_outbound)
+
+    @property
+    def shedding(self) -> bool:
+        return self.state >= OverloadState.SHEDDING
+
+    @property
+    def refusing(self) -> bool:
+        return self.state >= OverloadState.REFUSING
+
+    def start(self):
+        """
+        Start measuring the hub lag in a new green thread, does nothing if no threshold is set.
+
+        :return:
+        """
+        if self.enabled and self.__thread is None:
+            self.__thread = eventlet.spawn(self.__run)
+
+    def stop(self):
+        if self.__thread is not None:
+            self.__thread.kill()
+            self.__thread = None
+
+    def admits(self, priority: Priority) -> bool:
+        """
+        Decide if a message is handled or shed.
+
+        :param priority: Priority of the message.
+        :return: False if the message should be dropped.
+        """
+        if priority >= Priority.LOW and self.shedding:
+            self.dropped += 1
+            return False
+
+        return True
+
+    def sample(self, lag: float):
+        """
+        Record a measurement of the hub lag and update the state.
+
+        :param lag: Seconds the hub was late in resuming a sleeping green thread.
+        :return:
+        """
+        self.lag = self.alpha * max(0.0, lag) + (1 - self.alpha) * self.lag
+        self.update()
+
+    def update(self):
+        """
+        Update the state from the current hub lag and outbound frames.
+
+        :return:
+        """
+        state, reason = self.__level(1)
+
+        # leave a stage only once the metrics fell well below its thresholds
+        if state < self.state:
+            held, held_reason = self.__level(self.recovery)
+
+            if held > state:
+                state, reason = min(held, self.state), held_reason
+
+        if state != self.state:
+            self.logger.warning("Overload state changed from '" + self.state.name.lower() + "' to '"
+                                + state.name.lower() + "': " + str(reason))
+
+            self.state = state
+            self.reason = reason
+
+    def status(self) -> dict:
+        """
+        The current state and the measurements which led to it.
+
+        :return: A JSON serializable dict.
+        """
+        return {
+            "state": self.state.name.lower(),
+            "reason": self.reason,
+            "lag": self.lag,
+            "outbound": self.outbound,
+            "dropped": self.dropped
+        }
+
+    def __level(self, scale: float):
+        for state, lag, outbound in [(OverloadState.REFUSING, self.refuse_lag, self.refuse_outbound),
+                                     (OverloadState.SHEDDING, self.shed_lag, self.shed_outbound)]:
+            if lag and self.lag >= lag * scale:
+                return state, "hub lag " + str(round(self.lag, 3)) + "s over " + str(lag * scale) + "s"
+
+            if outbound and self.outbound >= outbound * scale:
+                return state, str(self.outbound) + " outbound frames over " + str(outbound * scale)
+
+        return OverloadState.NORMAL, None
+
+    def __run(self):
+        while True:
+            start = time.monotonic()
+            eventlet.sleep(self.interval)
+
+            self.sample(time.monotonic() - start - self.interval)
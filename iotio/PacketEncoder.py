@@ -2,8 +2,10 @@
 import enum
 import json
 from .types import sendable
+from .Control import ControlEvent
+from .exceptions import InvalidPacket
 from abc import abstractmethod
-from typing import Tuple
+from typing import Tuple, List, Union
 
 
 class PacketDataType(enum.IntEnum):
@@ -32,6 +34,33 @@ class PacketDataType(enum.IntEnum):
         return bytearray(byte)
 
 
+class PacketProblem(enum.Enum):
+    NOT_BINARY = "not_binary"
+    FRAME_TOO_LARGE = "frame_too_large"
+    TRUNCATED = "truncated"
+    EVENT_TOO_LARGE = "event_too_large"
+    PAYLOAD_TOO_LARGE = "payload_too_large"
+    SIZE_MISMATCH = "size_mismatch"
+    INVALID_TYPE = "invalid_type"
+    INVALID_JSON = "invalid_json"
+
+
+class PacketLimits:
+    def __init__(self, max_frame_size: int = 8388608, max_event_size: int = 65535,
+                 max_payload_size: Union[int, None] = None):
+        """
+        Size limits enforced on packets received from clients before they are decoded.
+
+        :param max_frame_size: Maximum size of a whole frame in bytes, frames larger than this are rejected by the
+                               transport before they are read.
+        :param max_event_size: Maximum size of the event name in bytes.
+        :param max_payload_size: Maximum size of the message in bytes, None limits it only by the frame size.
+        """
+        self.max_frame_size = max_frame_size
+        self.max_event_size = max_event_size
+        self.max_payload_size = max_frame_size if max_payload_size is None else max_payload_size
+
+
 class AbstractPacketEncoder:
     """
     Abstract implementation of a PacketEncoder. Should be used as the base class for any custom PacketEncoder classes.
@@ -46,6 +75,32 @@ class AbstractPacketEncoder:
     def decode(data: bytearray) -> Tuple[str, sendable]:
         return "", ""
 
+    @staticmethod
+    def check(data: bytearray, limits: PacketLimits):
+        """
+        Check a received packet against the limits before it is decoded, raises InvalidPacket if it violates them.
+        The default implementation only checks the size of the frame, text frames are measured in UTF-8 bytes.
+
+        :param data: The received packet.
+        :param limits: The limits to enforce.
+        :return:
+        """
+        size = len(data.encode("UTF-8", "ignore")) if isinstance(data, str) else len(data)
+
+        if size > limits.max_frame_size:
+            raise InvalidPacket(PacketProblem.FRAME_TOO_LARGE)
+
+    @classmethod
+    def encode_batch(cls, packets: List[bytes]) -> bytearray:
+        """
+        Combine several encoded packets into a single frame. By default the packets are concatenated into the binary
+        message of a batch control packet, which works for any encoding whose packets carry their own length.
+
+        :param packets: The encoded packets.
+        :return: The frame containing every packet.
+        """
+        return cls.encode(ControlEvent.BATCH.value, b"".join(packets))
+
 
 # packet object used to encode and decode messages over the iot.io protocol, can be overwritten if desired
 class DefaultPacketEncoder(AbstractPacketEncoder):
@@ -75,7 +130,7 @@ class DefaultPacketEncoder(AbstractPacketEncoder):
         elif isinstance(message, bytearray) or isinstance(message, bytes):
             message = bytearray(message)
         else:
-            raise ValueError("Cannot encode message of type '" + type(message)
+            raise ValueError("Cannot encode message of type '" + type(message).__name__
                              + "'. Please only use the default supported types: [bytes, bytearray, int, string, "
                                "list, dict]. If you would like to support other types then please create and provide "
                                "your own PacketEncoder.")
@@ -87,6 +142,37 @@ class DefaultPacketEncoder(AbstractPacketEncoder):
         # return the fully encoded packet
         return message_type + event_size + event + message_size + message
 
+    @staticmethod
+    def check(data: bytearray, limits: PacketLimits):
+        # the default encoding is binary only
+        if not isinstance(data, (bytes, bytearray)):
+            raise InvalidPacket(PacketProblem.NOT_BINARY)
+
+        AbstractPacketEncoder.check(data, limits)
+
+        # type byte, event size and message size
+        if len(data) < 7:
+            raise InvalidPacket(PacketProblem.TRUNCATED)
+
+        if data[0] > PacketDataType.JSON:
+            raise InvalidPacket(PacketProblem.INVALID_TYPE)
+
+        event_size = int.from_bytes(data[1:3], byteorder="big", signed=False)
+
+        if event_size > limits.max_event_size:
+            raise InvalidPacket(PacketProblem.EVENT_TOO_LARGE)
+
+        if event_size + 7 > len(data):
+            raise InvalidPacket(PacketProblem.TRUNCATED)
+
+        message_size = int.from_bytes(data[event_size + 3:event_size + 7], byteorder="big", signed=False)
+
+        if message_size > limits.max_payload_size:
+            raise InvalidPacket(PacketProblem.PAYLOAD_TOO_LARGE)
+
+        if event_size + message_size + 7 != len(data):
+            raise InvalidPacket(PacketProblem.SIZE_MISMATCH)
+
     @staticmethod
     def decode(data: bytearray) -> Tuple[str, sendable]:
         # get the type byte
@@ -106,7 +192,10 @@ class DefaultPacketEncoder(AbstractPacketEncoder):
 
         # deserialize json
         if message_type == PacketDataType.JSON:
-            message = json.loads(message_bytes.decode("UTF-8", "ignore"))
+            try:
+                message = json.loads(message_bytes.decode("UTF-8", "ignore"))
+            except ValueError:
+                raise InvalidPacket(PacketProblem.INVALID_JSON)
         # deserialize bool
         elif message_type == PacketDataType.BOOLEAN:
             message = bool.from_bytes(message_bytes, byteorder="big", signed=False)
@@ -0,0 +1,247 @@
+# default
+import itertools
+import logging
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Set, Union
+if TYPE_CHECKING:
+    from .Manager import IoTManager
+
+# external
+from eventlet.event import Event
+
+# internal
+from .Client import IoTClient
+from .Control import ControlEvent, Priority
+from .Timer import Timer
+from .exceptions import CallFailed, CallTimeout
+from .types import sendable
+
+
+class Call:
+    __slots__ = ("id", "client_id", "event", "sent", "answered", "result", "error", "timer", "__event", "__callbacks")
+
+    def __init__(self, call_id: int, client_id: str, event: str):
+        """
+        A call made to a client which has not necessarily been answered yet.
+
+        :param call_id: Correlation id of the call, unique per manager.
+        :param client_id: ID of the called client.
+        :param event: The client side event which was called.
+        """
+        self.id = call_id
+        self.client_id = client_id
+        self.event = event
+
+        # time (as returned by time.monotonic()) the call was sent and answered
+        self.sent = time.monotonic()
+        self.answered: Union[float, None] = None
+
+        self.result: sendable = None
+        self.error: Union[CallFailed, None] = None
+
+        # timer which expires the call, cancelled once it is answered
+        self.timer: Union[Timer, None] = None
+
+        self.__event: Union[Event, None] = None
+        self.__callbacks: List[Callable[['Call'], None]] = []
+
+    @property
+    def done(self) -> bool:
+        return self.answered is not None
+
+    @property
+    def latency(self) -> Union[float, None]:
+        """
+        Seconds between the call being sent and answered, None if it was not answered yet.
+        """
+        return self.answered - self.sent if self.answered is not None else None
+
+    def wait(self) -> sendable:
+        """
+        Block the current green thread until the call is answered.
+
+        :return: The data the client answered with.
+        :raises CallFailed: If the client answered with an error or disconnected.
+        :raises CallTimeout: If the client did not answer in time.
+        """
+        if not self.done:
+            if self.__event is None:
+                self.__event = Event()
+
+            self.__event.wait()
+
+        if self.error is not None:
+            raise self.error
+
+        return self.result
+
+    def add_callback(self, callback: Callable[['Call'], None]):
+        """
+        Add a function which is called with the call once it is answered, failed or timed out. Called right away if
+        that already happened. Callbacks do not need a green thread of their own.
+
+        :param callback: The function.
+        :return:
+        """
+        if self.done:
+            callback(self)
+        else:
+            self.__callbacks.append(callback)
+
+    def resolve(self, result: sendable = None, error: CallFailed = None):
+        """
+        Complete the call, used by the CallManager.
+
+        :param result: The data the client answered with.
+        :param error: The reason the call failed.
+        :return:
+        """
+        if self.done:
+            return
+
+        self.answered = time.monotonic()
+        self.result = result
+        self.error = error
+
+        if self.timer is not None:
+            self.timer.cancel()
+
+        if self.__event is not None:
+            self.__event.send()
+
+        callbacks, self.__callbacks = self.__callbacks, []
+        errors = []
+
+        # every callback is called even if one of them fails
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                errors.append(e)
+
+        if errors:
+            raise errors[0]
+
+
+class CallManager:
+    def __init__(self, manager: 'IoTManager', logging_level: int = logging.ERROR):
+        """
+        Sends calls to clients and matches their answers using correlation ids, any number of calls can be in flight
+        per client. Unanswered calls are expired by timers on the manager's TimingWheel.
+
+        Calls are sent on the call control event as {"id": int, "event": str, "data": ...}. Clients answer with
+        {"id": int, "data": ...} or {"id": int, "error": str} on the result control event.
+
+        :param manager: The IoTManager whose clients are called.
+        :param logging_level: Logging level of the instance, useful for debugging.
+        """
+        self.logger = logging.Logger("iot.io-calls")
+        self.logger.setLevel(logging_level)
+
+        self.manager = manager
+
+        self.__ids = itertools.count(1)
+
+        # calls in flight keyed by id, and the ids of the calls in flight to each client
+        self.__calls: Dict[int, Call] = {}
+        self.__clients: Dict[str, Set[int]] = {}
+
+        manager.add_control_handler(ControlEvent.RESULT.value, self.result)
+
+    def __len__(self):
+        return len(self.__calls)
+
+    def call(self, client_id: str, event: str, data: sendable, timeout: float = 10,
+             priority: Priority = Priority.NORMAL) -> Call:
+        """
+        Call an event of a client, the call is answered by the client with a result.
+
+        :param client_id: ID of the client.
+        :param event: The client side event to call.
+        :param data: The data passed to the event.
+        :param timeout: Seconds the client has to answer.
+        :param priority: Priority class of the call.
+        :return: The Call, wait() on it or add a callback to get the result.
+        """
+        call = Call(next(self.__ids), client_id, event)
+        client = self.manager.get_client(client_id)
+
+        if client is None:
+            call.resolve(error=CallFailed("Client '" + client_id + "' is not connected.", "client_not_connected"))
+            return call
+
+        self.__calls[call.id] = call
+        self.__clients.setdefault(client_id, set()).add(call.id)
+
+        call.timer = self.manager.timers.schedule(timeout, self.__expire, call.id)
+
+        client.emit(ControlEvent.CALL.value, {
+            "id": call.id,
+            "event": event,
+            "data": data
+        }, priority)
+
+        return call
+
+    def result(self, client: IoTClient, message: sendable):
+        """
+        Handler for the result control event, completes the call it answers.
+
+        :param client: The client which answered.
+        :param message: The result message.
+        :return:
+        """
+        if not isinstance(message, dict) or not isinstance(message.get("id", None), int):
+            return
+
+        call = self.__calls.get(message["id"], None)
+
+        # clients can only answer their own calls
+        if call is None or call.client_id != client.id:
+            return
+
+        self.__forget(call)
+
+        if message.get("error", None) is not None:
+            self.__resolve(call, error=CallFailed("The client answered the call with an error.",
+                                                  str(message["error"])))
+        else:
+            self.__resolve(call, result=message.get("data", None))
+
+    def removed(self, client: IoTClient):
+        """
+        Called by the manager whenever a client is removed, fails the calls it did not answer.
+
+        :param client: The client which was removed.
+        :return:
+        """
+        for call_id in self.__clients.pop(client.id, ()):
+            call = self.__calls.pop(call_id, None)
+
+            if call is not None:
+                self.__resolve(call, error=CallFailed("Client '" + client.id + "' disconnected.",
+                                                      "client_disconnected"))
+
+    def __expire(self, call_id: int):
+        call = self.__calls.get(call_id, None)
+
+        if call is not None:
+            self.__forget(call)
+            self.__resolve(call, error=CallTimeout())
+
+    def __forget(self, call: Call):
+        self.__calls.pop(call.id, None)
+
+        ids = self.__clients.get(call.client_id, None)
+
+        if ids is not None:
+            ids.discard(call.id)
+
+            if not ids:
+                del self.__clients[call.client_id]
+
+    def __resolve(self, call: Call, result: sendable = None, error: CallFailed = None):
+        try:
+            call.resolve(result, error)
+        except Exception as e:
+            self.logger.error("Error when calling the callback of call " + str(call.id) + ": '" + str(e) + "'")
@@ -0,0 +1,121 @@
+# default
+import enum
+import time
+from typing import List, Tuple, Union
+
+
+class RateLimitAction(enum.Enum):
+    # stop reading from the client until it is back under the limit, pushing back on it through TCP
+    DELAY = "delay"
+    # drop messages which are over the limit
+    DROP = "drop"
+    # send the client_rate_limited error and close the connection
+    DISCONNECT = "disconnect"
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "stamp")
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Token bucket which refills at a constant rate up to its capacity.
+
+        :param rate: Tokens added per second.
+        :param capacity: Maximum number of tokens, the size of the allowed burst.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.stamp = time.monotonic()
+
+    def consume(self, amount: float, now: float, debt: bool) -> float:
+        """
+        Take tokens from the bucket.
+
+        :param amount: Number of tokens to take.
+        :param now: The current time as returned by time.monotonic().
+        :param debt: If True the tokens are taken even if the bucket does not hold enough of them.
+        :return: 0 if the bucket held enough tokens, otherwise the seconds until it will.
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+
+        if debt:
+            self.tokens -= amount
+            return -self.tokens / self.rate
+
+        return (amount - self.tokens) / self.rate
+
+
+class RateLimit:
+    def __init__(self, messages: float = None, bytes_per_second: float = None, burst: float = 1,
+                 action: RateLimitAction = RateLimitAction.DELAY):
+        """
+        Limit on the rate of messages and bytes a client (or a device type) can send to the server.
+
+        :param messages: Messages allowed per second, None for no limit.
+        :param bytes_per_second: Bytes allowed per second, None for no limit.
+        :param burst: Seconds worth of messages and bytes which can be sent at once.
+        :param action: What happens to a client which goes over the limit.
+        """
+        self.messages = messages
+        self.bytes_per_second = bytes_per_second
+        self.burst = burst
+        self.action = action
+
+    def buckets(self) -> Tuple[Union[TokenBucket, None], Union[TokenBucket, None]]:
+        """
+        Create the message and byte buckets enforcing the limit.
+
+        :return: The message bucket and byte bucket, None for limits which are not set.
+        """
+        return (
+            TokenBucket(self.messages, self.messages * self.burst) if self.messages else None,
+            TokenBucket(self.bytes_per_second, self.bytes_per_second * self.burst) if self.bytes_per_second else None
+        )
+
+
+class RateLimiter:
+    __slots__ = ("limits", "exceeded")
+
+    def __init__(self, limits: List[Tuple[RateLimit, Union[TokenBucket, None], Union[TokenBucket, None]]]):
+        """
+        Enforces the rate limits which apply to one client, buckets of device type limits are shared between every
+        client of the type.
+
+        :param limits: Each limit with its message and byte buckets.
+        """
+        self.limits = limits
+
+        # the action of the last limit which was exceeded
+        self.exceeded: Union[RateLimitAction, None] = None
+
+    def check(self, size: int) -> float:
+        """
+        Account for a message received from the client.
+
+        :param size: Size of the message in bytes.
+        :return: 0 if the message is within every limit, otherwise the seconds until the client is back under the
+                 limit. The action of the exceeded limit is stored in exceeded.
+        """
+        now = time.monotonic()
+
+        for limit, messages, size_bucket in self.limits:
+            debt = limit.action is RateLimitAction.DELAY
+            wait = 0.0
+
+            if messages is not None:
+                wait = messages.consume(1, now, debt)
+
+            if size_bucket is not None and (wait == 0.0 or debt):
+                wait = max(wait, size_bucket.consume(size, now, debt))
+
+            if wait:
+                self.exceeded = limit.action
+                return wait
+
+        return 0.0
@@ -0,0 +1,186 @@
+# default
+import collections
+import secrets
+from typing import TYPE_CHECKING, Dict, Union
+if TYPE_CHECKING:
+    from .Manager import IoTManager
+
+# external
+from eventlet.websocket import WebSocket
+
+# internal
+from .Client import IoTClient
+from .Control import ControlEvent, Priority
+
+
+class SuspendedSocket:
+    def __init__(self, ws: WebSocket, max_pending: int):
+        """
+        Takes the place of the socket of a client whose connection dropped, frames sent to the client are held until
+        it resumes its session.
+
+        :param ws: The socket of the dropped connection.
+        :param max_pending: Maximum number of frames which are held, the oldest frames are dropped first.
+        """
+        self.environ = ws.environ
+        self.pending = collections.deque(maxlen=max_pending)
+
+    @property
+    def websocket_closed(self):
+        return False
+
+    def send(self, data: bytearray):
+        self.pending.append(data)
+
+    def wait(self):
+        return None
+
+
+class Session:
+    def __init__(self, token: str, client: IoTClient):
+        """
+        State kept for a client so it can reconnect without a full handshake.
+
+        :param token: The session token issued to the client.
+        :param client: The client the session belongs to.
+        """
+        self.token = token
+        self.client = client
+
+        # timer which removes the client once the grace period ends, set while the client is disconnected
+        self.timer = None
+
+    @property
+    def suspended(self) -> bool:
+        return isinstance(self.client.socket, SuspendedSocket)
+
+
+class SessionManager:
+    def __init__(self, manager: 'IoTManager', grace_period: float = 0, max_pending: int = 100):
+        """
+        Issues session tokens to connecting clients and holds the state of disconnected clients (rooms, endpoints and
+        pending frames) for a grace period. A client which reconnects with a valid token is re-attached to its state
+        without running the connect and disconnect handlers again.
+
+        :param manager: The IoTManager the sessions belong to.
+        :param grace_period: Seconds the state of a disconnected client is held for, 0 disables sessions.
+        :param max_pending: Maximum number of frames held for a disconnected client.
+        """
+        self.manager = manager
+        self.grace_period = grace_period
+        self.max_pending = max_pending
+
+        # sessions keyed by token and the token of each client keyed by client id
+        self.__sessions: Dict[str, Session] = {}
+        self.__tokens: Dict[str, str] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.grace_period > 0
+
+    def issue(self, client: IoTClient):
+        """
+        Create a session for a newly connected client and send it the token.
+
+        :param client: The connected client.
+        :return:
+        """
+        if not self.enabled:
+            return
+
+        self.__drop(self.__tokens.get(client.id, None))
+        self.__start(client)
+
+    def resume(self, token: str, client_id: str, ws: WebSocket) -> Union[IoTClient, None]:
+        """
+        Re-attach a reconnecting client to its session, the token is used up and the client is issued a new one.
+
+        :param token: The token presented by the client.
+        :param client_id: The id presented by the client.
+        :param ws: The socket of the new connection.
+        :return: The client of the session, or None if the token is not valid for the client.
+        """
+        session = self.__sessions.get(token, None)
+
+        if session is None or session.client.id != client_id:
+            return None
+
+        if session.timer is not None:
+            session.timer.cancel()
+            session.timer = None
+
+        client = session.client
+        old = client.socket
+
+        if isinstance(old, SuspendedSocket):
+            pending = old.pending
+        else:
+            pending = ()
+
+            # the old connection may only be half-open, it is closed so it can not be used alongside the new one
+            try:
+                old.close()
+            except OSError:
+                pass
+
+        client.socket = ws
+
+        # deliver the frames sent while the client was disconnected
+        for frame in pending:
+            ws.send(frame)
+
+        # a token can only be used once, the client is issued a new one
+        self.__drop(token)
+        self.__start(client)
+
+        return client
+
+    def suspend(self, client: IoTClient) -> bool:
+        """
+        Hold the state of a client whose connection dropped instead of removing it.
+
+        :param client: The disconnected client.
+        :return: True if the client was suspended, False if it should be removed.
+        """
+        session = self.__sessions.get(self.__tokens.get(client.id, None), None)
+
+        if session is None or session.client is not client or session.suspended:
+            return False
+
+        client.socket = SuspendedSocket(client.socket, self.max_pending)
+        session.timer = self.manager.timers.schedule(self.grace_period, self.manager.remove, client)
+
+        return True
+
+    def removed(self, client: IoTClient):
+        """
+        Called by the manager whenever a client is removed, drops its session.
+
+        :param client: The client which was removed.
+        :return:
+        """
+        token = self.__tokens.get(client.id, None)
+
+        if token is not None and self.__sessions[token].client is client:
+            self.__drop(token)
+
+    def __start(self, client: IoTClient):
+        token = secrets.token_urlsafe(16)
+        self.__sessions[token] = Session(token, client)
+        self.__tokens[client.id] = token
+
+        client.emit(ControlEvent.SESSION.value, {
+            "token": token,
+            "gracePeriod": self.grace_period
+        }, priority=Priority.CONTROL)
+
+    def __drop(self, token: Union[str, None]):
+        session = self.__sessions.pop(token, None)
+
+        if session is None:
+            return
+
+        self.__tokens.pop(session.client.id, None)
+
+        if session.timer is not None:
+            session.timer.cancel()
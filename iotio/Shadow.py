@@ -0,0 +1,256 @@
+# default
+import copy
+import json
+import sqlite3
+from typing import TYPE_CHECKING, Dict, Union
+if TYPE_CHECKING:
+    from .Manager import IoTManager
+
+# internal
+from .Client import IoTClient
+from .Control import ControlEvent, Priority
+from .Delta import merge_patch
+from .types import sendable
+
+
+def shadow_delta(desired: dict, reported: dict) -> dict:
+    """
+    Find the part of the desired state the client has not reported yet.
+
+    :param desired: The desired document.
+    :param reported: The reported document.
+    :return: The members of the desired document which differ from the reported document, nested objects are
+             compared member by member.
+    """
+    delta = {}
+
+    for key, value in desired.items():
+        current = reported.get(key, None)
+
+        if isinstance(value, dict) and isinstance(current, dict):
+            sub_delta = shadow_delta(value, current)
+
+            if sub_delta:
+                delta[key] = sub_delta
+        elif key not in reported or type(value) != type(current) or value != current:
+            delta[key] = value
+
+    return delta
+
+
+class Shadow:
+    __slots__ = ("client_id", "desired", "desired_version", "reported", "reported_version")
+
+    def __init__(self, client_id: str, desired: dict = None, desired_version: int = 0, reported: dict = None,
+                 reported_version: int = 0):
+        """
+        The desired and reported state documents of a client, each version is incremented whenever its document is
+        changed.
+
+        :param client_id: ID of the client.
+        :param desired: The state the client should be in.
+        :param desired_version: Version of the desired document.
+        :param reported: The state the client reported it is in.
+        :param reported_version: Version of the reported document.
+        """
+        self.client_id = client_id
+        self.desired = desired if desired is not None else {}
+        self.desired_version = desired_version
+        self.reported = reported if reported is not None else {}
+        self.reported_version = reported_version
+
+    @property
+    def delta(self) -> dict:
+        """
+        The part of the desired state the client has not reported yet.
+        """
+        return shadow_delta(self.desired, self.reported)
+
+    def __dict__(self):
+        return {
+            "clientId": self.client_id,
+            "desired": self.desired,
+            "desiredVersion": self.desired_version,
+            "reported": self.reported,
+            "reportedVersion": self.reported_version,
+            "delta": self.delta
+        }
+
+
+# abstract shadow store class
+class AbstractShadowStore:
+    def load(self, client_id: str) -> Union[Shadow, None]:
+        """
+        Load the shadow of a client.
+
+        :param client_id: ID of the client.
+        :return: The Shadow, None if the client has none.
+        """
+        pass
+
+    def save(self, shadow: Shadow):
+        """
+        Store a shadow, replacing the stored shadow of the client.
+
+        :param shadow: The Shadow.
+        :return:
+        """
+        pass
+
+    def delete(self, client_id: str):
+        """
+        Delete the shadow of a client.
+
+        :param client_id: ID of the client.
+        :return:
+        """
+        pass
+
+
+class MemoryShadowStore(AbstractShadowStore):
+    def __init__(self):
+        """
+        Keeps shadows in memory, they do not survive a restart.
+        """
+        self.__shadows: Dict[str, Shadow] = {}
+
+    def load(self, client_id: str) -> Union[Shadow, None]:
+        return self.__shadows.get(client_id, None)
+
+    def save(self, shadow: Shadow):
+        self.__shadows[shadow.client_id] = shadow
+
+    def delete(self, client_id: str):
+        self.__shadows.pop(client_id, None)
+
+
+class SQLiteShadowStore(AbstractShadowStore):
+    def __init__(self, path: str):
+        """
+        Keeps shadows in a SQLite database so they survive a restart.
+
+        :param path: Path of the SQLite database, ":memory:" can be used for testing.
+        """
+        self.__db = sqlite3.connect(path)
+        self.__db.execute("CREATE TABLE IF NOT EXISTS shadows (client_id TEXT PRIMARY KEY, desired TEXT NOT NULL, "
+                          "desired_version INTEGER NOT NULL, reported TEXT NOT NULL, "
+                          "reported_version INTEGER NOT NULL)")
+
+    def load(self, client_id: str) -> Union[Shadow, None]:
+        row = self.__db.execute("SELECT desired, desired_version, reported, reported_version FROM shadows "
+                                "WHERE client_id = ?", (client_id,)).fetchone()
+
+        if row is None:
+            return None
+
+        return Shadow(client_id, json.loads(row[0]), row[1], json.loads(row[2]), row[3])
+
+    def save(self, shadow: Shadow):
+        self.__db.execute("INSERT OR REPLACE INTO shadows VALUES (?, ?, ?, ?, ?)", (
+            shadow.client_id, json.dumps(shadow.desired), shadow.desired_version, json.dumps(shadow.reported),
+            shadow.reported_version
+        ))
+        self.__db.commit()
+
+    def delete(self, client_id: str):
+        self.__db.execute("DELETE FROM shadows WHERE client_id = ?", (client_id,))
+        self.__db.commit()
+
+    def close(self):
+        if self.__db is not None:
+            self.__db.close()
+            self.__db = None
+
+
+class ShadowManager:
+    def __init__(self, manager: 'IoTManager', store: AbstractShadowStore = None):
+        """
+        Keeps a shadow for every client and sends clients the part of the desired state they have not reported, when
+        they connect and whenever the desired state changes. Desired state written while a client is not connected
+        is merged into its shadow and sent as a single delta once it connects.
+
+        Deltas are sent on the shadow control event as {"version": int, "delta": dict}, where version is the version
+        of the desired document. A delta still waiting to be written to a slow client is replaced by the next one.
+        Clients report their state as a merge patch of the reported document on the report control event.
+
+        :param manager: The IoTManager whose clients have shadows.
+        :param store: Where shadows are kept, in memory by default.
+        """
+        self.manager = manager
+        self.store = store if store is not None else MemoryShadowStore()
+
+        manager.add_control_handler(ControlEvent.REPORT.value, self.report)
+
+    def get(self, client_id: str) -> Shadow:
+        """
+        Get the shadow of a client.
+
+        :param client_id: ID of the client.
+        :return: The Shadow, an empty shadow if the client has none.
+        """
+        shadow = self.store.load(client_id)
+
+        return shadow if shadow is not None else Shadow(client_id)
+
+    def update(self, client_id: str, desired: dict) -> Shadow:
+        """
+        Change the desired state of a client, the delta is sent to the client if it is connected.
+
+        :param client_id: ID of the client, the client does not have to be connected.
+        :param desired: Merge patch (RFC 7386) applied to the desired document, null removes a member.
+        :return: The updated Shadow.
+        """
+        if not isinstance(desired, dict):
+            raise TypeError("desired must be a dict")
+
+        shadow = self.get(client_id)
+        shadow.desired = merge_patch(shadow.desired, copy.deepcopy(desired))
+        shadow.desired_version += 1
+
+        self.store.save(shadow)
+
+        client = self.manager.get_client(client_id)
+
+        if client is not None:
+            self.__send(client, shadow)
+
+        return shadow
+
+    def report(self, client: IoTClient, message: sendable):
+        """
+        Handler for the report control event, applies the reported state to the shadow of the client.
+
+        :param client: The client.
+        :param message: Merge patch (RFC 7386) applied to the reported document.
+        :return:
+        """
+        if not isinstance(message, dict):
+            return
+
+        shadow = self.get(client.id)
+        shadow.reported = merge_patch(shadow.reported, message)
+        shadow.reported_version += 1
+
+        self.store.save(shadow)
+
+    def added(self, client: IoTClient):
+        """
+        Called by the manager whenever a client is added, sends the client the desired state it has not reported.
+
+        :param client: The client which was added.
+        :return:
+        """
+        shadow = self.store.load(client.id)
+
+        if shadow is not None:
+            self.__send(client, shadow)
+
+    @staticmethod
+    def __send(client: IoTClient, shadow: Shadow):
+        delta = shadow.delta
+
+        if delta:
+            client.emit(ControlEvent.SHADOW.value, {
+                "version": shadow.desired_version,
+                "delta": delta
+            }, Priority.HIGH, conflate=True)
@@ -0,0 +1,177 @@
+# default
+import logging
+import math
+import time
+from typing import Callable, List, Set, Union
+
+# external
+import eventlet
+
+
+class Timer:
+    __slots__ = ("expires", "callback", "args", "slot")
+
+    def __init__(self, expires: int, callback: Callable, args: tuple):
+        """
+        A callback scheduled on a TimingWheel.
+
+        :param expires: The tick on which the timer expires.
+        :param callback: Function called when the timer expires.
+        :param args: Arguments passed to the callback.
+        """
+        self.expires = expires
+        self.callback = callback
+        self.args = args
+
+        # the slot the timer is currently stored in, None once it expired or was cancelled
+        self.slot: Union[Set['Timer'], None] = None
+
+    @property
+    def active(self) -> bool:
+        return self.slot is not None
+
+    def cancel(self):
+        """
+        Cancel the timer, does nothing if it already expired.
+
+        :return:
+        """
+        if self.slot is not None:
+            self.slot.discard(self)
+            self.slot = None
+
+
+class TimingWheel:
+    def __init__(self, tick: float = 0.1, slots: int = 256, levels: int = 4, logging_level: int = logging.ERROR):
+        """
+        Hierarchical timing wheel, used to track large numbers of timers (heartbeats, idle timeouts, grace periods)
+        from a single green thread. Scheduling and cancelling a timer are O(1) and each tick only touches the timers
+        which expire on it or cascade down a level.
+
+        With the defaults the wheel covers 0.1 * 256^4 seconds (over 13 years), longer delays are clamped.
+
+        :param tick: Resolution of the wheel in seconds.
+        :param slots: Number of slots of each level of the wheel.
+        :param levels: Number of levels of the wheel.
+        :param logging_level: Logging level of the instance, useful for debugging.
+        """
+        self.logger = logging.Logger("iot.io-timers")
+        self.logger.setLevel(logging_level)
+
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+
+        self.__wheels: List[List[Set[Timer]]] = [[set() for _ in range(slots)] for _ in range(levels)]
+        self.__current = 0
+        self.__started = None
+        self.__thread = None
+
+    @property
+    def current(self) -> int:
+        """
+        The last tick which was processed.
+        """
+        return self.__current
+
+    def schedule(self, delay: float, callback: Callable, *args) -> Timer:
+        """
+        Call a function after a delay, starts the wheel if it is not running.
+
+        :param delay: Delay in seconds, rounded up to the resolution of the wheel.
+        :param callback: Function to be called.
+        :param args: Arguments passed to the function.
+        :return: The Timer, which can be used to cancel the call.
+        """
+        if self.__thread is None:
+            self.start()
+
+        ticks = min(max(1, math.ceil(delay / self.tick)), self.slots ** self.levels - 1)
+        timer = Timer(self.__current + ticks, callback, args)
+
+        self.__insert(timer)
+
+        return timer
+
+    def start(self):
+        """
+        Start advancing the wheel in a new green thread.
+
+        :return:
+        """
+        if self.__thread is None:
+            self.__started = time.monotonic() - self.__current * self.tick
+            self.__thread = eventlet.spawn(self.__run)
+
+    def stop(self):
+        """
+        Stop advancing the wheel, scheduled timers are kept.
+
+        :return:
+        """
+        if self.__thread is not None:
+            self.__thread.kill()
+            self.__thread = None
+
+    def advance(self, ticks: int = 1):
+        """
+        Advance the wheel, calling the callbacks of every timer which expires.
+
+        :param ticks: Number of ticks to advance.
+        :return:
+        """
+        for _ in range(ticks):
+            self.__current += 1
+
+            # find the highest level whose lower levels all wrapped around on this tick
+            top = 0
+            while top < self.levels - 1 and self.__current % (self.slots ** (top + 1)) == 0:
+                top += 1
+
+            # cascade timers down from the highest level first so none skip a level
+            for level in range(top, 0, -1):
+                slot = self.__wheels[level][(self.__current // (self.slots ** level)) % self.slots]
+                timers = list(slot)
+                slot.clear()
+
+                for timer in timers:
+                    self.__insert(timer)
+
+            slot = self.__wheels[0][self.__current % self.slots]
+            timers = list(slot)
+            slot.clear()
+
+            for timer in timers:
+                timer.slot = None
+
+                try:
+                    timer.callback(*timer.args)
+                except Exception as e:
+                    self.logger.error("Error when calling timer callback: '" + str(e) + "'")
+
+    def __insert(self, timer: Timer):
+        ticks = timer.expires - self.__current
+
+        # timers cascading down on the tick they expire go into the slot which is processed next
+        if ticks < 0:
+            timer.expires = self.__current
+            ticks = 0
+
+        # find the lowest level which can hold the timer
+        level = 0
+        while level < self.levels - 1 and ticks >= self.slots ** (level + 1):
+            level += 1
+
+        slot = self.__wheels[level][(timer.expires // (self.slots ** level)) % self.slots]
+        slot.add(timer)
+        timer.slot = slot
+
+    def __run(self):
+        while True:
+            eventlet.sleep(self.tick)
+
+            # catch up on ticks missed while the hub was busy
+            due = int((time.monotonic() - self.__started) / self.tick)
+
+            if due > self.__current:
+                self.advance(due - self.__current)
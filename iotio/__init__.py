@@ -1,6 +1,10 @@
 from .Manager import IoTManager, emit, join, leave, close_room
 from .Client import IoTClient
 from .Device import DeviceType
+from .MQTT import MQTTServer
+from .OfflineQueue import OfflineQueue
+from .Admission import AdmissionControl
+from .Shadow import SQLiteShadowStore
 
 __title = "iot.io"
 __author__ = "Dylan Crockett"
@@ -1,3 +1,7 @@
+# default
+import enum
+
+
 # iot error base
 class IoTError(Exception):
     """
@@ -90,3 +94,36 @@ class ClientIncompatibleProtocolVersion(ConnectionFailed):
 
     def __init__(self, message: str = "The version of the client's protocol is incompatible with that of the server."):
         super().__init__(message)
+
+
+# error when a client sends a packet which cannot be decoded
+class InvalidPacket(IoTError):
+    """
+    Exception thrown when a packet received from a client is malformed or exceeds the configured size limits.
+    """
+
+    def __init__(self, problem: enum.Enum, message: str = "Client sent an invalid packet."):
+        super().__init__(message + " (" + str(problem.value) + ")")
+        self.problem = problem
+
+
+# error when a call to a client does not succeed
+class CallFailed(IoTError):
+    """
+    Exception thrown when waiting on a call which the client answered with an error, or which could not be delivered
+    because the client disconnected.
+    """
+
+    def __init__(self, message: str = "The call to the client failed.", error: str = None):
+        super().__init__(message)
+        self.error = error
+
+
+# error when a client does not answer a call in time
+class CallTimeout(CallFailed):
+    """
+    Exception thrown when waiting on a call which the client did not answer before its timeout.
+    """
+
+    def __init__(self, message: str = "The client did not answer the call in time."):
+        super().__init__(message, "timeout")
@@ -0,0 +1,22 @@
+from iotio.PacketEncoder import DefaultPacketEncoder
+
+
+# pretends to be a functioning eventlet WebSocket object, records the frames sent to it and replays the given frames
+class RecordingWebSocket:
+    def __init__(self, frames: list = (), decode: bool = True):
+        self.environ = {}
+        self.frames = list(frames)
+        self.sent = []
+        self.websocket_closed = False
+
+        # if False the frames are recorded as they were sent instead of as (event, data) pairs
+        self.decode = decode
+
+    def send(self, data: bytearray):
+        self.sent.append(DefaultPacketEncoder.decode(data) if self.decode else data)
+
+    def wait(self):
+        return self.frames.pop(0) if self.frames else None
+
+    def close(self):
+        self.websocket_closed = True
@@ -0,0 +1,63 @@
+from unittest import TestCase
+from flask import Flask
+from iotio import IoTManager
+from iotio.Admission import AdmissionControl
+from iotio.RateLimit import RateLimit
+import eventlet
+
+
+class TestAdmissionControl(TestCase):
+    def test_ip_rate_limit(self):
+        admission = AdmissionControl(ip_rate_limit=RateLimit(messages=1, burst=2), retry_after=1, jitter=0)
+
+        self.assertIsNone(admission.admit({"REMOTE_ADDR": "10.0.0.1"}))
+        self.assertIsNone(admission.admit({"REMOTE_ADDR": "10.0.0.1"}))
+        self.assertEqual(admission.admit({"REMOTE_ADDR": "10.0.0.1"}), 1)
+
+        # other addresses have their own bucket
+        self.assertIsNone(admission.admit({"REMOTE_ADDR": "10.0.0.2"}))
+        self.assertEqual(admission.rejected, 1)
+
+    def test_retry_after_jitter(self):
+        admission = AdmissionControl(type_rate_limit=RateLimit(messages=1), retry_after=2, jitter=1)
+        admission.admit({"HTTP_IOT_IO_TYPE": "sensor"})
+
+        for _ in range(20):
+            self.assertIn(admission.admit({"HTTP_IOT_IO_TYPE": "sensor"}), [2, 3, 4])
+
+    def test_handshake_queue(self):
+        admission = AdmissionControl(max_handshakes=1, max_queue=1, queue_timeout=1)
+        first, second, third = {}, {}, {}
+
+        self.assertIsNone(admission.admit(first))
+        self.assertEqual(admission.active, 1)
+
+        # the second connection waits for the slot, the third does not fit in the queue
+        waiting = eventlet.spawn(admission.admit, second)
+        eventlet.sleep(0)
+
+        self.assertEqual(admission.waiting, 1)
+        self.assertIsNotNone(admission.admit(third))
+
+        admission.release(first)
+        admission.release(first)
+
+        self.assertIsNone(waiting.wait())
+        self.assertEqual(admission.active, 1)
+
+        admission.release(second)
+        self.assertEqual(admission.active, 0)
+
+    def test_middleware_refusal(self):
+        app = Flask("")
+        manager = IoTManager(app, admission=AdmissionControl(ip_rate_limit=RateLimit(messages=1), jitter=0))
+        self.addCleanup(manager.stop)
+        app.extensions["iot.io"].admission.admit({"REMOTE_ADDR": "10.0.0.1"})
+
+        responses = []
+        body = app.wsgi_app({"PATH_INFO": "/iot.io", "REMOTE_ADDR": "10.0.0.1"},
+                            lambda status, headers: responses.append((status, dict(headers))))
+
+        self.assertEqual(body, [b""])
+        self.assertEqual(responses[0][0], "503 Service Unavailable")
+        self.assertEqual(responses[0][1]["Retry-After"], "1")
@@ -0,0 +1,223 @@
+from unittest import TestCase
+from flask import Flask
+from iotio import IoTManager, IoTClient
+from iotio.Control import ControlEvent
+import eventlet
+from .fakes import RecordingWebSocket
+
+
+class TestCommandResource(TestCase):
+    def setUp(self):
+        app = Flask("")
+        self.manager = IoTManager(app, endpoint_api=True)
+        self.http = app.test_client()
+
+        self.ws = RecordingWebSocket()
+        self.client = IoTClient(self.ws, "lamp_1", "lamp", {}, self.manager)
+        self.client.parse_endpoints([{"id": "power", "name": "Power", "type": "boolean"}])
+        self.manager.add(self.client)
+
+    def tearDown(self):
+        self.manager.stop()
+
+    def status(self, command_id: str) -> dict:
+        response = self.http.get("/api/iot.io/commands/" + command_id)
+        self.assertEqual(response.status_code, 200)
+
+        return response.get_json()["command"]
+
+    def test_async_command(self):
+        response = self.http.post("/api/iot.io", json={"clientId": "lamp_1", "endpointId": "power", "data": True,
+                                                       "async": True})
+
+        self.assertEqual(response.status_code, 202)
+        command_id = response.get_json()["commandId"]
+
+        self.assertEqual(self.status(command_id)["status"], "queued")
+        self.assertEqual(self.ws.sent, [])
+
+        eventlet.sleep(0)
+
+        self.assertEqual(self.ws.sent, [("power", True)])
+        self.assertEqual(set(self.status(command_id)["timestamps"].keys()), {"queued", "sent"})
+
+    def test_acknowledged_command(self):
+        command_id = self.http.post("/api/iot.io", json={"clientId": "lamp_1", "endpointId": "power", "data": False,
+                                                         "async": True, "ack": True}).get_json()["commandId"]
+        eventlet.sleep(0)
+
+        event, message = self.ws.sent[0]
+        self.assertEqual(event, ControlEvent.CALL.value)
+        self.assertEqual(self.status(command_id)["status"], "sent")
+
+        self.manager.dispatch(self.client, ControlEvent.RESULT.value, {"id": message["id"]})
+
+        self.assertEqual(self.status(command_id)["status"], "acknowledged")
+
+    def test_commanded_after_delivery(self):
+        # the value of an acknowledged command is only recorded once the client answered
+        self.http.post("/api/iot.io", json={"clientId": "lamp_1", "endpointId": "power", "data": True, "async": True,
+                                            "ack": True})
+        eventlet.sleep(0)
+
+        self.assertIsNone(self.manager.states.get("lamp_1", "power"))
+
+        self.manager.dispatch(self.client, ControlEvent.RESULT.value, {"id": self.ws.sent[0][1]["id"]})
+
+        self.assertEqual(self.manager.states.get("lamp_1", "power").commanded, True)
+
+        # a command which was refused by the client is never recorded
+        self.http.post("/api/iot.io", json={"clientId": "lamp_1", "endpointId": "power", "data": False,
+                                            "async": True, "ack": True})
+        eventlet.sleep(0)
+
+        self.manager.dispatch(self.client, ControlEvent.RESULT.value, {"id": self.ws.sent[1][1]["id"],
+                                                                       "error": "refused"})
+
+        self.assertEqual(self.manager.states.get("lamp_1", "power").commanded, True)
+
+    def test_failed_command(self):
+        command = self.manager.commands.put("lamp_2", "power", True)
+        eventlet.sleep(0)
+
+        self.assertEqual(self.status(command.id)["status"], "failed")
+        self.assertEqual(self.status(command.id)["error"], "client_not_connected")
+
+        self.assertEqual(self.http.get("/api/iot.io/commands/unknown").status_code, 404)
+
+        # the connection closed before the command was written
+        self.ws.websocket_closed = True
+        command = self.manager.commands.put("lamp_1", "power", True)
+        eventlet.sleep(0)
+
+        self.assertEqual(self.status(command.id)["error"], "client_not_connected")
+        self.assertEqual(self.ws.sent, [])
+
+    def test_slow_client(self):
+        slow = RecordingWebSocket()
+        slow.send = lambda data: eventlet.sleep(1)
+        self.manager.add(IoTClient(slow, "lamp_2", "lamp", {}, self.manager))
+
+        blocked = self.manager.commands.put("lamp_2", "power", True)
+        queued = self.manager.commands.put("lamp_2", "power", False)
+        command = self.manager.commands.put("lamp_1", "power", True)
+        eventlet.sleep(0.01)
+
+        # a client whose connection is slow to write to only holds up its own commands
+        self.assertEqual(self.status(command.id)["status"], "sent")
+        self.assertEqual(self.status(blocked.id)["status"], "queued")
+        self.assertEqual(self.status(queued.id)["status"], "queued")
+
+
+class TestBatchEndpointResource(TestCase):
+    def setUp(self):
+        app = Flask("")
+        self.manager = IoTManager(app, endpoint_api=True)
+        self.http = app.test_client()
+
+        self.sockets = {}
+
+        for client_id in ["lamp_1", "lamp_2"]:
+            self.sockets[client_id] = RecordingWebSocket()
+            client = IoTClient(self.sockets[client_id], client_id, "lamp", {}, self.manager)
+            client.parse_endpoints([{"id": "power", "name": "Power", "type": "boolean"},
+                                    {"id": "level", "name": "Level", "type": "integer",
+                                     "constraints": {"min": 0, "max": 100}}])
+            self.manager.add(client)
+
+    def tearDown(self):
+        self.manager.stop()
+
+    def test_batch(self):
+        response = self.http.post("/api/iot.io/batch", json={"commands": [
+            {"clientId": "lamp_1", "endpointId": "power", "data": True},
+            {"clientId": "lamp_1", "endpointId": "level", "data": 50},
+            {"clientId": "lamp_2", "endpointId": "level", "data": 500},
+            {"clientId": "lamp_2", "endpointId": "power", "data": True},
+            {"clientId": "lamp_3", "endpointId": "power", "data": True},
+            {"clientId": "lamp_2"}
+        ]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["results"], [
+            {"success": True},
+            {"success": True},
+            {"success": False, "error": "higher_than_max"},
+            {"success": True},
+            {"success": False, "error": "client_not_connected"},
+            {"success": False, "error": "invalid_command"}
+        ])
+
+        # the commands for a client are sent in a single frame
+        self.assertEqual(len(self.sockets["lamp_1"].sent), 1)
+        self.assertEqual(self.sockets["lamp_1"].sent[0][0], ControlEvent.BATCH.value)
+        self.assertEqual(self.sockets["lamp_2"].sent, [("power", True)])
+
+    def test_disconnect_during_batch(self):
+        # lamp_2 disconnects while the frame for lamp_1 is being written
+        sent = self.sockets["lamp_1"].send
+        self.sockets["lamp_1"].send = lambda data: (sent(data), self.manager.remove("lamp_2"))
+
+        response = self.http.post("/api/iot.io/batch", json={"commands": [
+            {"clientId": "lamp_1", "endpointId": "power", "data": True},
+            {"clientId": "lamp_2", "endpointId": "power", "data": True}
+        ]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["results"], [
+            {"success": True},
+            {"success": False, "error": "client_not_connected"}
+        ])
+        self.assertEqual(self.sockets["lamp_1"].sent, [("power", True)])
+
+    def test_invalid_batch(self):
+        self.assertEqual(self.http.post("/api/iot.io/batch", json=[]).status_code, 400)
+
+
+class TestEndpointCommands(TestCase):
+    def setUp(self):
+        app = Flask("")
+        self.wrapped = []
+
+        def auth(f):
+            self.wrapped.append(f.__qualname__)
+            return f
+
+        self.manager = IoTManager(app, endpoint_api=True, endpoint_auth_decorator=auth)
+        self.http = app.test_client()
+
+        self.ws = RecordingWebSocket()
+        client = IoTClient(self.ws, "lamp_1", "lamp", {}, self.manager)
+        client.parse_endpoints([{"id": "level", "name": "Level", "type": "integer"}])
+        self.manager.add(client)
+
+    def tearDown(self):
+        self.manager.stop()
+
+    def test_built_once(self):
+        for _ in range(3):
+            self.http.post("/api/iot.io", json={"clientId": "lamp_1", "endpointId": "level", "data": 5})
+
+        # the handlers are decorated when the manager is built, not on every request
+        self.assertEqual(self.wrapped.count("EndpointCommands.__post"), 1)
+        self.assertEqual(len(self.wrapped), len(set(self.wrapped)))
+        self.assertTrue(set(self.wrapped) >= {
+            "EndpointCommands.__post", "EndpointCommands.__post_batch", "EndpointCommands.__get_command",
+            "EndpointCommands.__post_special", "EndpointCommands.__get", "ClientListing.__get", "FeedStream.__get"
+        })
+        self.assertEqual(self.ws.sent, [("level", 5)] * 3)
+
+    def test_arguments(self):
+        response = self.http.post("/api/iot.io?clientId=lamp_1&endpointId=level&data=7")
+
+        self.assertEqual(response.get_json(), {"success": True})
+        self.assertEqual(self.ws.sent, [("level", 7)])
+
+        response = self.http.post("/api/iot.io", json={"clientId": "lamp_1", "data": 5})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json(), {"message": {"endpointId": "ID of Endpoint where data should be sent."}})
+
+        response = self.http.post("/api/iot.io", json={"clientId": "lamp_1", "endpointId": "level", "data": "high"})
+
+        self.assertEqual(response.get_json(), {"success": False, "error": "invalid_data_type"})
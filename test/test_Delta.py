@@ -0,0 +1,87 @@
+from unittest import TestCase
+from flask import Flask
+from iotio import IoTManager, IoTClient, DeviceType
+from iotio.Control import ControlEvent
+from iotio.Delta import merge_diff, merge_patch
+from .fakes import RecordingWebSocket
+
+
+class ThermostatType(DeviceType):
+    delta_events = {"state"}
+
+
+class TestMergePatch(TestCase):
+    def test_round_trip(self):
+        old = {"a": 1, "b": {"c": 2, "d": [1, 2]}, "e": "x"}
+        new = {"a": 1, "b": {"c": 3, "d": [1, 2]}, "f": True}
+
+        patch = merge_diff(old, new)
+
+        self.assertEqual(patch, {"b": {"c": 3}, "e": None, "f": True})
+        self.assertEqual(merge_patch(old, patch), new)
+
+    def test_null_value(self):
+        self.assertIsNone(merge_diff({"a": 1}, {"a": None}))
+        self.assertIsNone(merge_diff({"a": {"b": 1}}, {"a": {"b": None}}))
+
+
+class TestDeltaTracker(TestCase):
+    def setUp(self):
+        self.manager = IoTManager(Flask(""), delta_keyframe_interval=2)
+        self.manager.add_type(ThermostatType("thermostat"))
+
+        self.ws = RecordingWebSocket()
+        self.client = IoTClient(self.ws, "thermostat_1", "thermostat", {}, self.manager)
+        self.manager.add(self.client)
+
+    def tearDown(self):
+        self.manager.stop()
+
+    def push(self, state: dict) -> dict:
+        self.manager.emit("state", state, client_id="thermostat_1")
+
+        event, message = self.ws.sent[-1]
+        self.assertEqual(event, ControlEvent.DELTA.value)
+
+        return message
+
+    def ack(self, seq: int):
+        self.manager.dispatch(self.client, ControlEvent.ACK.value, {"event": "state", "seq": seq})
+
+    def test_patches(self):
+        state = {"setpoint": 20, "mode": "heat", "schedule": list(range(50))}
+
+        self.assertEqual(self.push(state), {"event": "state", "seq": 1, "state": state})
+
+        # nothing was acknowledged yet so the full state is sent again
+        self.assertIn("state", self.push(dict(state, setpoint=21)))
+
+        self.ack(2)
+
+        self.assertEqual(self.push(dict(state, setpoint=22)),
+                         {"event": "state", "seq": 3, "base": 2, "patch": {"setpoint": 22}})
+
+        # patches are made against the acknowledged state until a newer one is acknowledged
+        self.assertEqual(self.push(dict(state, setpoint=22, mode="cool"))["patch"], {"setpoint": 22, "mode": "cool"})
+
+        # keyframe once the interval is reached
+        self.assertIn("state", self.push(dict(state, setpoint=23)))
+
+    def test_resync(self):
+        self.push({"setpoint": 20})
+        self.ack(1)
+        self.push({"setpoint": 21})
+
+        self.manager.dispatch(self.client, ControlEvent.RESYNC.value, {})
+
+        self.assertEqual(self.ws.sent[-1][1], {"event": "state", "seq": 3, "state": {"setpoint": 21}})
+
+    def test_other_events(self):
+        self.manager.emit("info", {"a": 1}, client_id="thermostat_1")
+
+        self.assertEqual(self.ws.sent[-1], ("info", {"a": 1}))
+
+    def test_default_delta_events(self):
+        # the default set is shared by every device type so it can not be written to
+        with self.assertRaises(AttributeError):
+            DeviceType("plain").delta_events.add("state")
@@ -0,0 +1,126 @@
+from unittest import TestCase
+from flask import Flask
+from iotio import IoTManager, IoTClient
+from .fakes import RecordingWebSocket
+
+
+class TestClientDirectory(TestCase):
+    def setUp(self):
+        app = Flask("")
+        self.manager = IoTManager(app, endpoint_api=True)
+        self.http = app.test_client()
+
+        for i in range(10):
+            self.add("client_" + str(i), "lamp" if i % 2 else "fan")
+
+    def tearDown(self):
+        self.manager.stop()
+
+    def add(self, client_id: str, client_type: str) -> IoTClient:
+        client = IoTClient(RecordingWebSocket(decode=False), client_id, client_type, {}, self.manager)
+        self.manager.add(client)
+
+        return client
+
+    def test_clients(self):
+        clients = self.manager.clients
+
+        # the list is not a live view of the clients
+        self.manager.remove("client_0")
+
+        self.assertIn("client_0", clients)
+        self.assertNotIn("client_0", self.manager.clients)
+
+    def test_pages(self):
+        ids = []
+        page = self.manager.list_clients(limit=3)
+
+        # clients connecting while paging do not change the listing
+        self.add("client_00", "fan")
+
+        while True:
+            ids.extend(client["id"] for client in page.clients)
+
+            if page.cursor is None:
+                break
+
+            page = self.manager.list_clients(limit=3, cursor=page.cursor)
+
+        self.assertEqual(ids, ["client_" + str(i) for i in range(10)])
+        self.assertEqual(len(self.manager.list_clients(limit=20).clients), 11)
+
+    def test_filters(self):
+        self.manager.join("client_1", "hall")
+        self.manager.join("client_4", "hall")
+
+        page = self.manager.list_clients(client_type="lamp", limit=2)
+
+        self.assertEqual([client["id"] for client in page.clients], ["client_1", "client_3"])
+        self.assertEqual([client["id"] for client in self.manager.list_clients(room="hall").clients],
+                         ["client_1", "client_4"])
+        self.assertEqual(self.manager.list_clients(client_type="lamp", room="hall").clients,
+                         [{"id": "client_1", "type": "lamp", "rooms": ["hall"]}])
+
+    def test_expired_snapshot(self):
+        page = self.manager.list_clients(limit=5)
+
+        # the snapshot of the cursor is no longer retained, paging continues in the latest snapshot
+        for i in range(self.manager.directory.retained):
+            self.manager.directory.changed()
+            self.manager.list_clients()
+
+        self.manager.remove("client_6")
+
+        page = self.manager.list_clients(limit=5, cursor=page.cursor)
+
+        self.assertEqual([client["id"] for client in page.clients],
+                         ["client_5", "client_7", "client_8", "client_9"])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            self.manager.list_clients(cursor="not a cursor")
+
+        with self.assertRaises(ValueError):
+            self.manager.list_clients(limit=0)
+
+    def test_resource(self):
+        response = self.http.get("/api/iot.io/clients?limit=4&type=fan")
+        body = response.get_json()
+
+        self.assertEqual([client["id"] for client in body["clients"]],
+                         ["client_0", "client_2", "client_4", "client_6"])
+
+        etag = response.headers["ETag"]
+        response = self.http.get("/api/iot.io/clients?limit=4&type=fan&cursor=" + body["next"])
+
+        self.assertEqual([client["id"] for client in response.get_json()["clients"]], ["client_8"])
+        self.assertIsNone(response.get_json()["next"])
+
+        # a change to other clients leaves the page unchanged
+        self.add("client_99", "lamp")
+
+        response = self.http.get("/api/iot.io/clients?limit=4&type=fan", headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 304)
+
+        self.manager.remove("client_2")
+
+        response = self.http.get("/api/iot.io/clients?limit=4&type=fan", headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.http.get("/api/iot.io/clients?cursor=abc").status_code, 400)
+
+    def test_etag_next_page(self):
+        response = self.http.get("/api/iot.io/clients?limit=5&type=fan")
+
+        self.assertIsNone(response.get_json()["next"])
+
+        # the full last page gains a next page, the clients in it are unchanged
+        self.add("client_9a", "fan")
+
+        response = self.http.get("/api/iot.io/clients?limit=5&type=fan",
+                                 headers={"If-None-Match": response.headers["ETag"]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.get_json()["next"])
+        self.assertEqual(self.http.get("/api/iot.io/clients?limit=5000").status_code, 400)
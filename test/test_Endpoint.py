@@ -1,6 +1,7 @@
 from unittest import TestCase
 from iotio.Endpoint import ValidationResponse, EndpointType, AbstractEndpointValidator, BooleanEndpointValidator, \
-    IntegerEndpointValidator, StringEndpointValidator, EnumEndpointValidator, EndpointParseResponse
+    IntegerEndpointValidator, StringEndpointValidator, EnumEndpointValidator, EndpointParseResponse, EndpointManager, \
+    EndpointCache
 
 
 class TestAbstractEndpointValidator(TestCase):
@@ -151,6 +152,46 @@ class TestNumberEndpointValidator(TestCase):
         self.assertEqual(self.validator_5.validate(12), ValidationResponse.VALID)
         self.assertEqual(self.validator_5.validate(""), ValidationResponse.INVALID_TYPE)
 
+    def test_increment(self):
+        validator = IntegerEndpointValidator("abc", "def", "ghi", 1, 11, 5)
+
+        self.assertEqual(validator.validate(6), ValidationResponse.VALID)
+        self.assertEqual(validator.validate(5), ValidationResponse.INVALID_INCREMENT)
+
+        validator = IntegerEndpointValidator("abc", "def", "ghi", None, None, 5)
+
+        self.assertEqual(validator.validate(-10), ValidationResponse.VALID)
+        self.assertEqual(validator.validate(6), ValidationResponse.INVALID_INCREMENT)
+
+    def test_override(self):
+        # a subclass overriding validate is used instead of the compiled checks, by validate_many as well
+        class EvenEndpointValidator(IntegerEndpointValidator):
+            def validate(self, data) -> ValidationResponse:
+                response = super().validate(data)
+
+                if response == ValidationResponse.VALID and data % 2:
+                    return ValidationResponse.INVALID_INCREMENT
+
+                return response
+
+        validator = EvenEndpointValidator("abc", "def", "ghi", 0, 10)
+
+        self.assertEqual(validator.validate(4), ValidationResponse.VALID)
+        self.assertEqual(validator.validate(5), ValidationResponse.INVALID_INCREMENT)
+        self.assertEqual(validator.validate_many([12, 3]), [
+            ValidationResponse.HIGHER_THAN_MAX,
+            ValidationResponse.INVALID_INCREMENT
+        ])
+
+    def test_validate_many(self):
+        self.assertEqual(self.validator_4.validate_many([5, 7, 3, 12, ""]), [
+            ValidationResponse.VALID,
+            ValidationResponse.VALID,
+            ValidationResponse.LOWER_THAN_MIN,
+            ValidationResponse.HIGHER_THAN_MAX,
+            ValidationResponse.INVALID_TYPE
+        ])
+
     def test_parse(self):
         val_1 = self.validator_1.parse(self.validator_1.__dict__())
         val_1: IntegerEndpointValidator
@@ -582,3 +623,42 @@ class TestEnumEndpointValidator(TestCase):
         self.assertEqual(data.get("specialId", None), self.validator.special_id)
         self.assertIsNotNone(data.get("constraints", None))
         self.assertEqual(data.get("constraints").get("values", None), self.validator.values)
+
+
+class TestEndpointCache(TestCase):
+    declaration = [{"id": "a", "name": "A", "type": "boolean"}]
+
+    def test_lru(self):
+        cache = EndpointCache(2)
+        manager = EndpointManager()
+        manager.parse(self.declaration)
+
+        cache.put("1", manager.endpoints)
+        cache.put("2", manager.endpoints)
+        self.assertIsNotNone(cache.get("1"))
+
+        # "2" is the least recently used declaration
+        cache.put("3", manager.endpoints)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("2"))
+        self.assertIsNotNone(cache.get("1"))
+
+    def test_shared_validators(self):
+        cache = EndpointCache()
+        parsed = EndpointManager()
+        parsed.parse(self.declaration)
+        endpoints = cache.put("key", parsed.endpoints)
+
+        manager_1 = EndpointManager()
+        manager_2 = EndpointManager()
+        manager_1.load(cache.get("key"))
+        manager_2.load(cache.get("key"))
+
+        self.assertTrue(manager_1.initialized)
+        self.assertIs(manager_1.get_validator("a"), manager_2.get_validator("a"))
+
+        # modifying a manager does not modify the shared validators
+        manager_1.parse([{"id": "b", "name": "B", "type": "boolean"}])
+        self.assertIsInstance(manager_1.get_validator("b"), BooleanEndpointValidator)
+        self.assertNotIn("b", endpoints)
+        self.assertEqual(manager_2.get_validator("b"), ValidationResponse.ENDPOINT_NOT_DEFINED_BY_CLIENT)
@@ -0,0 +1,97 @@
+from unittest import TestCase
+from flask import Flask
+from iotio import IoTManager, IoTClient
+from iotio.Control import ControlEvent
+from iotio.EndpointState import SuppressPolicy
+from .fakes import RecordingWebSocket
+
+
+class TestEndpointStateCache(TestCase):
+    def setUp(self):
+        self.ws = RecordingWebSocket()
+
+    def build(self, policy: SuppressPolicy = SuppressPolicy.NEVER):
+        app = Flask("")
+        self.manager = IoTManager(app, endpoint_api=True, command_suppression=policy)
+        self.addCleanup(self.manager.stop)
+        self.http = app.test_client()
+
+        self.client = IoTClient(self.ws, "lamp_1", "lamp", {}, self.manager)
+        self.client.parse_endpoints([{"id": "level", "name": "Level", "type": "integer"},
+                                     {"id": "power", "name": "Power", "type": "boolean"}])
+        self.manager.add(self.client)
+
+    def post(self, endpoint_id: str, data):
+        return self.http.post("/api/iot.io", json={"clientId": "lamp_1", "endpointId": endpoint_id,
+                                                   "data": data}).get_json()
+
+    def test_commanded(self):
+        self.build()
+
+        self.assertEqual(self.post("level", 5), {"success": True})
+        self.assertEqual(self.post("level", 5), {"success": True})
+        self.assertEqual(self.ws.sent, [("level", 5)] * 2)
+
+        value = self.manager.states.get("lamp_1", "level")
+
+        self.assertEqual(value.commanded, 5)
+        self.assertIsNone(value.reported_at)
+        self.assertIsNone(self.manager.states.get("lamp_1", "power"))
+
+    def test_suppress_commanded(self):
+        self.build(SuppressPolicy.COMMANDED)
+
+        self.assertEqual(self.post("level", 5), {"success": True})
+        self.assertEqual(self.post("level", 5), {"success": True, "suppressed": True})
+        self.assertEqual(self.post("power", True), {"success": True})
+        self.assertEqual(self.post("level", 6), {"success": True})
+
+        self.assertEqual(self.ws.sent, [("level", 5), ("power", True), ("level", 6)])
+
+    def test_suppress_current(self):
+        self.build(SuppressPolicy.CURRENT)
+
+        # the device already is in the commanded state
+        self.manager.dispatch(self.client, ControlEvent.STATE.value, {"level": 3, "power": "on", "other": 1})
+
+        self.assertEqual(self.post("level", 3), {"success": True, "suppressed": True})
+        self.assertIsNone(self.manager.states.get("lamp_1", "power"))
+
+        self.assertEqual(self.post("level", 5), {"success": True})
+
+        # the device was changed locally after the command
+        self.manager.dispatch(self.client, ControlEvent.STATE.value, {"level": 3})
+
+        self.assertEqual(self.post("level", 5), {"success": True})
+        self.assertEqual(self.ws.sent, [("level", 5), ("level", 5)])
+
+    def test_get(self):
+        self.build()
+        self.post("level", 5)
+        self.manager.dispatch(self.client, ControlEvent.STATE.value, {"level": 4})
+
+        response = self.http.get("/api/iot.io?clientId=lamp_1&endpointId=level").get_json()
+
+        self.assertEqual(response["value"]["commanded"], 5)
+        self.assertEqual(response["value"]["reported"], 4)
+        self.assertEqual(response["value"]["current"], 4)
+
+        response = self.http.get("/api/iot.io?clientId=lamp_1").get_json()
+
+        self.assertEqual(list(response["endpoints"].keys()), ["level"])
+        self.assertEqual(self.http.get("/api/iot.io?clientId=lamp_1&endpointId=power").get_json(),
+                         {"success": True, "value": None})
+        self.assertEqual(self.http.get("/api/iot.io?clientId=lamp_2").status_code, 400)
+
+    def test_forgotten(self):
+        self.build()
+        self.post("level", 5)
+        self.post("power", True)
+
+        self.manager.dispatch(self.client, ControlEvent.ENDPOINTS.value, {"remove": ["power"]})
+
+        self.assertEqual(list(self.manager.states.values("lamp_1").keys()), ["level"])
+
+        self.manager.remove(self.client)
+
+        self.assertEqual(self.manager.states.values("lamp_1"), {})
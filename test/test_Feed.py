@@ -0,0 +1,122 @@
+from unittest import TestCase
+from flask import Flask
+from iotio import IoTManager, IoTClient
+from iotio.Control import ControlEvent
+import json
+from .fakes import RecordingWebSocket
+
+
+def parse(frame: str) -> tuple:
+    fields = dict(line.split(": ", 1) for line in frame.strip().split("\n"))
+
+    return fields["event"], json.loads(fields["data"])
+
+
+class TestChangeFeed(TestCase):
+    def setUp(self):
+        app = Flask("")
+        self.manager = IoTManager(app, endpoint_api=True)
+        self.manager.timers.stop()
+        self.http = app.test_client()
+        self.feed = self.manager.feed
+
+        self.lamp = self.add("lamp_1", "lamp")
+
+    def tearDown(self):
+        self.manager.stop()
+
+    def add(self, client_id: str, client_type: str) -> IoTClient:
+        client = IoTClient(RecordingWebSocket(decode=False), client_id, client_type, {}, self.manager)
+        client.parse_endpoints([{"id": "level", "name": "Level", "type": "integer"}])
+        self.manager.add(client)
+
+        return client
+
+    def frames(self, subscriber) -> list:
+        frames = []
+
+        while not subscriber.queue.empty():
+            frames.append(parse(subscriber.queue.get()))
+
+        return frames
+
+    def test_snapshot(self):
+        self.manager.join("lamp_1", "hall")
+        self.manager.dispatch(self.lamp, ControlEvent.STATE.value, {"level": 3})
+
+        subscriber = self.feed.subscribe()
+        (event, data), = self.frames(subscriber)
+
+        self.assertEqual(event, "snapshot")
+        self.assertEqual(data["clients"][0]["rooms"], ["hall"])
+        self.assertEqual(data["clients"][0]["endpoints"]["level"]["reported"], 3)
+
+        # nothing is collected once the subscriber is gone
+        self.feed.unsubscribe(subscriber)
+        self.manager.remove(self.lamp)
+        self.feed.flush()
+
+        self.assertEqual(self.frames(subscriber), [])
+
+    def test_batches(self):
+        subscriber = self.feed.subscribe()
+        self.frames(subscriber)
+
+        fan = self.add("fan_1", "fan")
+        self.manager.join(fan, "hall")
+
+        for level in range(5):
+            self.manager.dispatch(self.lamp, ControlEvent.STATE.value, {"level": level})
+
+        self.manager.close_room("hall")
+        self.manager.remove(fan)
+
+        # nothing is sent until the interval is over
+        self.assertEqual(self.frames(subscriber), [])
+
+        self.feed.flush()
+        (event, changes), = self.frames(subscriber)
+
+        self.assertEqual(event, "changes")
+        self.assertEqual([change["type"] for change in changes], ["connect", "join", "endpoint", "leave",
+                                                                  "disconnect"])
+        self.assertEqual(changes[2]["value"]["reported"], 4)
+
+    def test_late_subscriber(self):
+        first = self.feed.subscribe()
+        self.manager.join("lamp_1", "hall")
+
+        # the join is already part of the snapshot of the second subscriber
+        second = self.feed.subscribe()
+        self.manager.leave("lamp_1", "hall")
+        self.feed.flush()
+
+        self.assertEqual([change["type"] for change in self.frames(first)[1][1]], ["join", "leave"])
+        self.assertEqual([change["type"] for change in self.frames(second)[1][1]], ["leave"])
+
+    def test_slow_subscriber(self):
+        self.feed.max_queued = 2
+        subscriber = self.feed.subscribe()
+
+        for room in ["a", "b", "c"]:
+            self.manager.join("lamp_1", room)
+            self.feed.flush()
+
+        self.assertTrue(subscriber.closed)
+        self.assertNotIn(subscriber, self.feed.subscribers)
+        self.assertEqual(len(list(self.feed.stream(subscriber))), 2)
+
+    def test_resource(self):
+        response = self.http.get("/api/iot.io/feed")
+
+        self.assertEqual(response.mimetype, "text/event-stream")
+        self.assertEqual(len(self.feed.subscribers), 1)
+
+        event, data = parse(next(response.response).decode("utf-8"))
+
+        self.assertEqual(event, "snapshot")
+        self.assertEqual([client["id"] for client in data["clients"]], ["lamp_1"])
+
+        response.close()
+
+        self.assertEqual(len(self.feed.subscribers), 0)
@@ -0,0 +1,69 @@
+from unittest import TestCase
+from flask import Flask
+from iotio import IoTManager, IoTClient
+from iotio.Control import ControlEvent
+from iotio.Endpoint import EndpointType
+from .fakes import RecordingWebSocket
+
+
+class TestFleetIndex(TestCase):
+    def setUp(self):
+        app = Flask("")
+        self.manager = IoTManager(app, endpoint_api=True)
+        self.http = app.test_client()
+        self.sockets = {}
+
+        self.add("lamp_1", "lamp", [{"id": "power", "name": "Power", "type": "boolean", "specialId": "power"}])
+        self.add("lamp_2", "lamp", [{"id": "power", "name": "Power", "type": "boolean", "specialId": "power"}])
+        self.add("fan_1", "fan", [{"id": "on", "name": "On", "type": "boolean", "specialId": "power"},
+                                  {"id": "speed", "name": "Speed", "type": "integer", "specialId": "speed"}])
+
+    def tearDown(self):
+        self.manager.stop()
+
+    def add(self, client_id: str, client_type: str, endpoints: list) -> IoTClient:
+        self.sockets[client_id] = RecordingWebSocket()
+        client = IoTClient(self.sockets[client_id], client_id, client_type, {}, self.manager)
+        client.parse_endpoints(endpoints)
+        self.manager.add(client)
+
+        return client
+
+    def test_find(self):
+        self.assertEqual(sorted(client.id for client, validator in self.manager.fleet.find("power")),
+                         ["fan_1", "lamp_1", "lamp_2"])
+        self.assertEqual([client.id for client, _ in self.manager.fleet.find("power", client_type="fan")], ["fan_1"])
+        self.assertEqual(self.manager.fleet.find("power", EndpointType.INTEGER), [])
+
+        self.manager.remove("lamp_2")
+
+        self.assertEqual(sorted(client.id for client, _ in self.manager.fleet.find("power")), ["fan_1", "lamp_1"])
+
+    def test_updated_endpoints(self):
+        client = self.manager.get_client("lamp_1")
+        self.manager.dispatch(client, ControlEvent.ENDPOINTS.value, {"remove": ["power"]})
+
+        self.assertEqual(sorted(client.id for client, _ in self.manager.fleet.find("power")), ["fan_1", "lamp_2"])
+
+    def test_send_special(self):
+        results = self.manager.send_special("power", False)
+
+        self.assertEqual(results, {"lamp_1": "valid", "lamp_2": "valid", "fan_1": "valid"})
+        self.assertEqual(self.sockets["lamp_1"].sent, [("power", False)])
+        self.assertEqual(self.sockets["fan_1"].sent, [("on", False)])
+
+        self.assertEqual(self.manager.send_special("speed", "fast"), {"fan_1": "invalid_data_type"})
+        self.assertEqual(len(self.sockets["fan_1"].sent), 1)
+
+    def test_resource(self):
+        response = self.http.post("/api/iot.io/special", json={"specialId": "power", "data": True,
+                                                               "clientType": "lamp"})
+
+        self.assertEqual(response.get_json(), {"success": True, "results": {"lamp_1": "valid", "lamp_2": "valid"}})
+        self.assertEqual(self.sockets["lamp_2"].sent, [("power", True)])
+        self.assertEqual(self.sockets["fan_1"].sent, [])
+
+        response = self.http.post("/api/iot.io/special", json={"specialId": "power", "data": True,
+                                                               "endpointType": "float"})
+
+        self.assertEqual(response.status_code, 400)
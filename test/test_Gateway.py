@@ -0,0 +1,116 @@
+from unittest import TestCase
+from flask import Flask
+from iotio import IoTManager, IoTClient, DeviceType
+from iotio.Control import ControlEvent, Priority
+from iotio.Gateway import encode_route, decode_route
+from iotio.Overload import OverloadDetector
+from iotio.PacketEncoder import DefaultPacketEncoder
+from .fakes import RecordingWebSocket
+
+
+class EchoType(DeviceType):
+    def on_echo(self, message, client: IoTClient):
+        return "echo_response", message
+
+
+class MeterType(EchoType):
+    event_priorities = {"echo": Priority.LOW}
+
+
+class TestRoute(TestCase):
+    def test_round_trip(self):
+        frame = DefaultPacketEncoder.encode("a", "b")
+
+        self.assertEqual(decode_route(encode_route(["x", "yz"], frame)), (["x", "yz"], frame))
+
+
+class TestGatewayManager(TestCase):
+    def setUp(self):
+        self.manager = IoTManager(Flask(""))
+        self.manager.add_type(EchoType("gateway"))
+        self.manager.add_type(EchoType("sensor"))
+
+        self.socket = RecordingWebSocket(decode=False)
+        self.gateway = IoTClient(self.socket, "gw", "gateway", {}, self.manager)
+        self.manager.add(self.gateway)
+
+        for client_id in ["s1", "s2"]:
+            self.manager.dispatch(self.gateway, ControlEvent.ATTACH.value, {"id": client_id, "type": "sensor"})
+
+    def tearDown(self):
+        self.manager.stop()
+
+    def routed(self, index: int):
+        event, message = DefaultPacketEncoder.decode(self.socket.sent[index])
+        self.assertEqual(event, ControlEvent.ROUTE.value)
+
+        client_ids, frame = decode_route(message)
+        return client_ids, DefaultPacketEncoder.decode(frame)
+
+    def test_attach(self):
+        self.assertIn("s1", self.manager.clients)
+        self.assertEqual(self.manager.get_client("s2").type, "sensor")
+        self.assertEqual(sorted(self.manager.gateways.sub_clients(self.gateway)), ["s1", "s2"])
+
+    def test_attach_id_in_use(self):
+        other = IoTClient(RecordingWebSocket(decode=False), "direct", "sensor", {}, self.manager)
+        self.manager.add(other)
+
+        for client_id in ["gw", "direct"]:
+            self.manager.dispatch(self.gateway, ControlEvent.ATTACH.value, {"id": client_id, "type": "sensor"})
+
+            self.assertEqual(DefaultPacketEncoder.decode(self.socket.sent[-1])[1]["error"], "client_id_in_use")
+
+        self.assertIs(self.manager.get_client("gw"), self.gateway)
+        self.assertIs(self.manager.get_client("direct"), other)
+
+        # re-attaching one of its own sub-clients replaces it
+        self.manager.dispatch(self.gateway, ControlEvent.ATTACH.value, {"id": "s1", "type": "sensor"})
+
+        self.assertEqual(sorted(self.manager.gateways.sub_clients(self.gateway)), ["s1", "s2"])
+
+    def test_attach_invalid_endpoints(self):
+        # a malformed attach only fails its own sub-client, the gateway stays connected
+        self.manager.dispatch(self.gateway, ControlEvent.ATTACH.value, {"id": "s3", "type": "sensor",
+                                                                        "endpoints": [1]})
+
+        self.assertEqual(DefaultPacketEncoder.decode(self.socket.sent[-1])[1],
+                         {"error": "client_invalid_endpoints", "clientId": "s3",
+                          "info": {"endpointId": "", "endpointProblem": "invalid_json"}})
+        self.assertIsNone(self.manager.get_client("s3"))
+        self.assertIs(self.manager.get_client("gw"), self.gateway)
+
+    def test_route_to_sub_client(self):
+        frame = DefaultPacketEncoder.encode("echo", "hello")
+        self.manager.dispatch(self.gateway, ControlEvent.ROUTE.value, bytes(encode_route(["s1"], frame)))
+
+        self.assertEqual(self.routed(0), (["s1"], ("echo_response", "hello")))
+
+    def test_routed_priority(self):
+        self.manager.add_type(MeterType("meter"))
+        self.manager.dispatch(self.gateway, ControlEvent.ATTACH.value, {"id": "m1", "type": "meter"})
+
+        self.manager.overload = OverloadDetector(shed_lag=0.1, alpha=1)
+        self.manager.overload.sample(1)
+
+        # routed events are shed by the priority the type of their sub-client gives them, not passed as control events
+        frame = DefaultPacketEncoder.encode("echo", "hello")
+        self.manager.handle(self.gateway, ControlEvent.ROUTE.value, bytes(encode_route(["m1", "s1"], frame)))
+
+        self.assertEqual(len(self.socket.sent), 1)
+        self.assertEqual(self.routed(0), (["s1"], ("echo_response", "hello")))
+
+    def test_coalesced_emit(self):
+        self.manager.join("s1", "room")
+        self.manager.join("s2", "room")
+        self.manager.emit("on", True, room="room")
+
+        self.assertEqual(len(self.socket.sent), 1)
+        self.assertEqual(self.routed(0), (["s1", "s2"], ("on", True)))
+
+    def test_detach(self):
+        self.manager.dispatch(self.gateway, ControlEvent.DETACH.value, {"id": "s1"})
+        self.assertNotIn("s1", self.manager.clients)
+
+        self.manager.remove(self.gateway)
+        self.assertNotIn("s2", self.manager.clients)
@@ -0,0 +1,139 @@
+from unittest import TestCase
+from flask import Flask
+from iotio import IoTManager, IoTClient
+from iotio.Control import ControlEvent, Priority
+from iotio.Lanes import Outbox, HandlerLanes
+from iotio.PacketEncoder import DefaultPacketEncoder
+import eventlet
+
+
+# pretends to be a functioning eventlet WebSocket object whose writes block until it is released
+class BlockingWebSocket:
+    def __init__(self):
+        self.environ = {}
+        self.sent = []
+        self.websocket_closed = False
+        self.blocked = True
+
+    def send(self, data: bytearray):
+        while self.blocked:
+            eventlet.sleep(0.001)
+
+        self.sent.append(DefaultPacketEncoder.decode(data))
+
+
+class TestOutbox(TestCase):
+    def test_order(self):
+        outbox = Outbox()
+        outbox.put(b"bulk", Priority.LOW)
+        outbox.put(b"telemetry", Priority.NORMAL)
+        outbox.put(b"error", Priority.CONTROL)
+
+        self.assertEqual(len(outbox), 3)
+        self.assertEqual(outbox.pop(), (b"error", Priority.CONTROL, None))
+        self.assertEqual(outbox.pop()[0], b"telemetry")
+        self.assertEqual(outbox.pop()[0], b"bulk")
+        self.assertIsNone(outbox.pop())
+
+    def test_conflation(self):
+        outbox = Outbox()
+
+        self.assertTrue(outbox.put(b"level 1", Priority.NORMAL, "level"))
+        self.assertTrue(outbox.put(b"other", Priority.NORMAL))
+        self.assertFalse(outbox.put(b"level 2", Priority.NORMAL, "level"))
+
+        # the newest value takes the place of the stale one
+        self.assertEqual(len(outbox), 2)
+        self.assertEqual(outbox.pop(), (b"level 2", Priority.NORMAL, "level"))
+        self.assertTrue(outbox.put(b"level 3", Priority.NORMAL, "level"))
+
+    def test_write_order(self):
+        manager = IoTManager(Flask(""))
+        self.addCleanup(manager.stop)
+        ws = BlockingWebSocket()
+        client = IoTClient(ws, "sensor_1", "sensor", {}, manager)
+
+        # the first chunk blocks the connection, the command overtakes the chunks queued behind it
+        writer = eventlet.spawn(client.emit, "chunk_1", b"", Priority.LOW)
+        eventlet.sleep(0)
+
+        client.emit("chunk_2", b"", Priority.LOW)
+        client.emit("off", True, Priority.HIGH)
+
+        self.assertEqual(manager.overload.outbound, 3)
+
+        ws.blocked = False
+        writer.wait()
+
+        self.assertEqual([event for event, data in ws.sent], ["chunk_1", "off", "chunk_2"])
+        self.assertEqual(manager.overload.outbound, 0)
+
+
+    def test_control_frames(self):
+        manager = IoTManager(Flask(""), session_grace_period=10)
+        self.addCleanup(manager.stop)
+        ws = BlockingWebSocket()
+        client = IoTClient(ws, "sensor_1", "sensor", {}, manager)
+
+        writer = eventlet.spawn(client.emit, "chunk_1", b"", Priority.HIGH)
+        eventlet.sleep(0)
+
+        # heartbeats and session tokens are control traffic and overtake commands
+        client.emit("off", True, Priority.HIGH)
+        manager.latency.ping(client)
+        manager.sessions.issue(client)
+
+        ws.blocked = False
+        writer.wait()
+
+        self.assertEqual([event for event, data in ws.sent],
+                         ["chunk_1", ControlEvent.PING.value, ControlEvent.SESSION.value, "off"])
+
+
+class TestHandlerLanes(TestCase):
+    def test_priority(self):
+        lanes = HandlerLanes(1)
+        order = []
+
+        def handle(name: str, priority: Priority):
+            lanes.acquire(priority)
+            order.append(name)
+            lanes.release()
+
+        lanes.acquire(Priority.NORMAL)
+
+        threads = [eventlet.spawn(handle, "bulk", Priority.LOW), eventlet.spawn(handle, "control", Priority.CONTROL)]
+        eventlet.sleep(0)
+
+        self.assertEqual(lanes.waiting, 2)
+
+        lanes.release()
+
+        for thread in threads:
+            thread.wait()
+
+        self.assertEqual(order, ["control", "bulk"])
+        self.assertEqual(lanes.active, 0)
+
+
+class TestConflation(TestCase):
+    def test_latest_value(self):
+        manager = IoTManager(Flask(""))
+        self.addCleanup(manager.stop)
+        ws = BlockingWebSocket()
+        manager.add(IoTClient(ws, "dimmer_1", "dimmer", {}, manager))
+
+        writer = eventlet.spawn(manager.emit, "level", 1, client_id="dimmer_1")
+        eventlet.sleep(0)
+
+        # only the latest of the conflated values waiting behind the first frame is delivered
+        for level in range(2, 6):
+            manager.emit("level", level, client_id="dimmer_1", conflate=True)
+
+        manager.emit("other", 0, client_id="dimmer_1")
+        self.assertEqual(manager.overload.outbound, 3)
+
+        ws.blocked = False
+        writer.wait()
+
+        self.assertEqual(ws.sent, [("level", 1), ("level", 5), ("other", 0)])
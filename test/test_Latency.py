@@ -0,0 +1,63 @@
+from unittest import TestCase
+from flask import Flask
+from iotio import IoTManager, IoTClient, DeviceType
+from iotio.Control import ControlEvent
+from iotio.Latency import LatencyHistogram
+from iotio.PacketEncoder import DefaultPacketEncoder
+import eventlet
+
+
+# pretends to be a client which answers every ping with a pong
+class EchoingWebSocket:
+    def __init__(self):
+        self.pings = []
+        self.websocket_closed = False
+        self.environ = {}
+
+    def send(self, data: bytearray):
+        event, message = DefaultPacketEncoder.decode(data)
+
+        if event == ControlEvent.PING.value:
+            self.pings.append(message)
+
+    def wait(self):
+        return None
+
+
+class TestLatencyHistogram(TestCase):
+    def test_percentile(self):
+        histogram = LatencyHistogram()
+        self.assertIsNone(histogram.percentile(50))
+
+        for rtt in [0.5, 3, 3, 4, 40, 15000]:
+            histogram.record(rtt)
+
+        self.assertEqual(histogram.percentile(50), 5)
+        self.assertEqual(histogram.percentile(80), 50)
+        self.assertEqual(histogram.percentile(100), float("inf"))
+
+
+class TestLatencyTracker(TestCase):
+    def test_round_trip(self):
+        manager = IoTManager(Flask(""), latency_interval=0.1)
+        self.addCleanup(manager.stop)
+        manager.add_type(DeviceType("sensor"))
+
+        socket = EchoingWebSocket()
+        client = IoTClient(socket, "sensor_1", "sensor", {}, manager)
+        manager.add(client)
+
+        eventlet.sleep(0.15)
+        self.assertEqual(len(socket.pings), 1)
+
+        eventlet.sleep(0.01)
+        manager.dispatch(client, ControlEvent.PONG.value, socket.pings[0])
+
+        stats = manager.latency.get("sensor_1")
+        self.assertEqual(stats.samples, 1)
+        self.assertGreaterEqual(stats.last, 10)
+        self.assertEqual(stats.ewma, stats.last)
+        self.assertEqual(manager.latency.histogram("sensor").total, 1)
+
+        manager.remove(client)
+        self.assertIsNone(manager.latency.get("sensor_1"))
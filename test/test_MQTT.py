@@ -0,0 +1,118 @@
+from unittest import TestCase
+from flask import Flask
+from iotio import IoTManager, IoTClient, DeviceType, MQTTServer
+from iotio.Admission import AdmissionControl
+from iotio.MQTT import MQTTPacketEncoder, MQTTPacketType, encode_packet, encode_string
+from iotio.Overload import OverloadDetector
+from iotio.RateLimit import RateLimit
+import eventlet
+
+
+class EchoType(DeviceType):
+    def on_echo(self, message, client: IoTClient):
+        return "echo_response", message
+
+
+def connect_packet(client_id: str, username: str = None) -> bytearray:
+    flags = 0x02
+
+    if username is not None:
+        flags |= 0x80
+
+    body = encode_string("MQTT") + bytes([4, flags, 0, 60]) + encode_string(client_id)
+
+    if username is not None:
+        body += encode_string(username)
+
+    return encode_packet(MQTTPacketType.CONNECT, 0, body)
+
+
+def read_packet(sock) -> bytes:
+    header = sock.recv(1)
+    length = sock.recv(1)[0]
+    body = b""
+
+    while len(body) < length:
+        body += sock.recv(length - len(body))
+
+    return header + bytes([length]) + body
+
+
+class TestMQTTPacketEncoder(TestCase):
+    def test_round_trip(self):
+        self.assertEqual(MQTTPacketEncoder.decode(MQTTPacketEncoder.encode("a", {"b": 1})), ("a", {"b": 1}))
+        self.assertEqual(MQTTPacketEncoder.decode(MQTTPacketEncoder.encode("a", "text")), ("a", "text"))
+        self.assertEqual(MQTTPacketEncoder.decode(MQTTPacketEncoder.encode("a", True)), ("a", True))
+        self.assertEqual(MQTTPacketEncoder.decode(MQTTPacketEncoder.encode("a", b"\xff\x00")), ("a", b"\xff\x00"))
+
+
+class TestMQTTServer(TestCase):
+    def setUp(self):
+        self.manager = IoTManager(Flask(""))
+        self.manager.add_type(EchoType("echo"))
+
+        self.server = MQTTServer(self.manager, host="127.0.0.1", port=0)
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+        self.manager.stop()
+
+    def test_publish_and_subscribe(self):
+        sock = eventlet.connect(self.server.address)
+        sock.sendall(connect_packet("mqtt_client", "echo"))
+        self.assertEqual(read_packet(sock), bytes([0x20, 2, 0, 0]))
+
+        # publishes are passed to the device type's handlers
+        sock.sendall(MQTTPacketEncoder.encode("echo", "hello"))
+        self.assertEqual(MQTTPacketEncoder.decode(read_packet(sock)), ("echo_response", "hello"))
+
+        # subscriptions join rooms
+        sock.sendall(encode_packet(MQTTPacketType.SUBSCRIBE, 2, b"\x00\x01" + encode_string("rooms/kitchen") + b"\x00"))
+        self.assertEqual(read_packet(sock), bytes([0x90, 3, 0, 1, 0]))
+
+        self.manager.emit("light", {"on": True}, room="kitchen")
+        self.assertEqual(MQTTPacketEncoder.decode(read_packet(sock)), ("light", {"on": True}))
+
+        sock.sendall(encode_packet(MQTTPacketType.DISCONNECT, 0, b""))
+        eventlet.sleep(0.01)
+        self.assertNotIn("mqtt_client", self.manager.clients)
+
+    def test_invalid_type(self):
+        sock = eventlet.connect(self.server.address)
+        sock.sendall(connect_packet("mqtt_client", "unknown"))
+        self.assertEqual(read_packet(sock), bytes([0x20, 2, 0, 5]))
+
+    def test_admission(self):
+        self.manager.admission = AdmissionControl(ip_rate_limit=RateLimit(messages=1), jitter=0)
+
+        first = eventlet.connect(self.server.address)
+        first.sendall(connect_packet("mqtt_1", "echo"))
+        self.assertEqual(read_packet(first), bytes([0x20, 2, 0, 0]))
+
+        # the address used up its connection attempts, refused as server unavailable
+        second = eventlet.connect(self.server.address)
+        second.sendall(connect_packet("mqtt_2", "echo"))
+        self.assertEqual(read_packet(second), bytes([0x20, 2, 0, 3]))
+        self.assertNotIn("mqtt_2", self.manager.clients)
+
+    def test_overload_refusal(self):
+        self.manager.overload = OverloadDetector(refuse_outbound=1)
+        self.manager.overload.outbound = 1
+        self.manager.overload.update()
+
+        sock = eventlet.connect(self.server.address)
+        sock.sendall(connect_packet("mqtt_client", "echo"))
+        self.assertEqual(read_packet(sock), bytes([0x20, 2, 0, 3]))
+        self.assertNotIn("mqtt_client", self.manager.clients)
+
+    def test_malformed_packet(self):
+        sock = eventlet.connect(self.server.address)
+        sock.sendall(connect_packet("mqtt_client", "echo"))
+        self.assertEqual(read_packet(sock), bytes([0x20, 2, 0, 0]))
+
+        # the topic length runs past the end of the packet
+        sock.sendall(encode_packet(MQTTPacketType.SUBSCRIBE, 2, b"\x00\x01\x00\x10ab"))
+
+        self.assertEqual(sock.recv(1), b"")
+        self.assertNotIn("mqtt_client", self.manager.clients)
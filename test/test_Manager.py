@@ -3,4 +3,70 @@ from flask import Flask
 from iotio import IoTManager, IoTClient, DeviceType
 import eventlet
 from eventlet import wsgi
+import json
+import zlib
+from iotio.Control import ControlEvent
+from iotio.Endpoint import ValidationResponse, BooleanEndpointValidator
+from iotio.PacketEncoder import DefaultPacketEncoder, PacketLimits
+from .fakes import RecordingWebSocket
 
+
+class TestEndpointUpdates(TestCase):
+    power = {"id": "power", "name": "Power", "type": "boolean", "specialId": "power"}
+    level = {"id": "level", "name": "Level", "type": "integer"}
+
+    def setUp(self):
+        self.manager = IoTManager(Flask(""))
+        self.manager.add_type(DeviceType("light"))
+
+        self.socket = RecordingWebSocket(decode=False)
+        self.client = IoTClient(self.socket, "light_1", "light", {}, self.manager)
+        self.client.parse_endpoints([self.power])
+        self.manager.add(self.client)
+
+    def tearDown(self):
+        self.manager.stop()
+
+    def test_add_and_remove(self):
+        self.manager.dispatch(self.client, ControlEvent.ENDPOINTS.value, {"add": [self.level], "remove": ["power"]})
+
+        self.assertEqual(self.manager.get_validator("light_1", "power"),
+                         ValidationResponse.ENDPOINT_NOT_DEFINED_BY_CLIENT)
+        self.assertEqual(self.manager.get_validator("light_1", "level").id, "level")
+
+    def test_invalid_update(self):
+        self.manager.dispatch(self.client, ControlEvent.ENDPOINTS.value, {"add": [{"id": "a", "name": "A"}]})
+
+        # the update is rejected as a whole and reported to the client
+        self.assertEqual(len(self.socket.sent), 1)
+        self.assertIsInstance(self.manager.get_validator("light_1", "power"), BooleanEndpointValidator)
+
+    def test_invalid_remove(self):
+        self.manager.dispatch(self.client, ControlEvent.ENDPOINTS.value, {"remove": [{"a": 1}]})
+
+        self.assertEqual(DefaultPacketEncoder.decode(self.socket.sent[-1])[1]["error"], "client_invalid_endpoints")
+        self.assertIsInstance(self.manager.get_validator("light_1", "power"), BooleanEndpointValidator)
+
+    def test_compressed_catalog(self):
+        catalog = zlib.compress(json.dumps([self.level]).encode("UTF-8"))
+        self.manager.dispatch(self.client, ControlEvent.ENDPOINTS.value, catalog)
+
+        self.assertEqual(list(self.client.endpoints.keys()), ["level"])
+
+        # identical catalogs share their validators
+        other = IoTClient(RecordingWebSocket(decode=False), "light_2", "light", {}, self.manager)
+        self.manager.add(other)
+        self.manager.dispatch(other, ControlEvent.ENDPOINTS.value, catalog)
+
+        self.assertIs(other.get_validator("level"), self.client.get_validator("level"))
+
+    def test_compressed_catalog_limit(self):
+        self.manager.packet_limits = PacketLimits(max_frame_size=1024)
+
+        # a few bytes which decompress to far more than a frame may hold
+        bomb = zlib.compress(b" " * 1024 * 1024)
+        self.manager.dispatch(self.client, ControlEvent.ENDPOINTS.value, bomb)
+
+        self.assertEqual(DefaultPacketEncoder.decode(self.socket.sent[-1])[1]["info"],
+                         {"packetProblem": "frame_too_large"})
+        self.assertEqual(list(self.client.endpoints.keys()), ["power"])
@@ -0,0 +1,113 @@
+from unittest import TestCase
+from flask import Flask
+from iotio import IoTManager, IoTClient, DeviceType, OfflineQueue
+from iotio.Control import ControlEvent
+from iotio.PacketEncoder import DefaultPacketEncoder
+import eventlet
+import os
+import sqlite3
+import tempfile
+import time
+from .fakes import RecordingWebSocket
+
+
+class TestOfflineQueue(TestCase):
+    def test_ttl_and_coalescing(self):
+        queue = OfflineQueue()
+        queue.put("a", "expired", 1, ttl=-1)
+        queue.put("a", "level", 1, key="level")
+        queue.put("a", "power", True)
+        queue.put("a", "level", 2, key="level")
+
+        self.assertEqual(queue.pop("a"), [("power", True), ("level", 2)])
+        self.assertEqual(queue.pop("a"), [])
+        self.assertEqual(len(queue), 0)
+
+    def test_max_per_client(self):
+        queue = OfflineQueue(max_per_client=2)
+
+        for i in range(4):
+            queue.put("a", "count", i)
+
+        self.assertEqual(queue.pop("a"), [("count", 2), ("count", 3)])
+
+    def test_spill(self):
+        queue = OfflineQueue(max_memory=2, max_per_client=3, path=":memory:")
+
+        for i in range(4):
+            queue.put("a", "count", i)
+
+        queue.put("b", "data", {"b": [1, 2]}, key="b")
+        queue.put("b", "data", {"b": [3]}, key="b")
+
+        self.assertEqual(len(queue), 4)
+        self.assertEqual(queue.pop("a"), [("count", 1), ("count", 2), ("count", 3)])
+        self.assertEqual(queue.pop("b"), [("data", {"b": [3]})])
+
+    def test_unencodable(self):
+        queue = OfflineQueue(max_memory=1, path=":memory:")
+        queue.put("a", "data", 1, key="data")
+
+        # refused when queued, whether it would be held in memory or spilled, and it replaces nothing
+        for client_id in ["a", "b"]:
+            with self.assertRaises(ValueError):
+                queue.put(client_id, "data", object(), key="data")
+
+        self.assertEqual(queue.pop("a"), [("data", 1)])
+        self.assertEqual(len(queue), 0)
+
+    def test_purge(self):
+        queue = OfflineQueue(max_memory=1, path=":memory:")
+        queue.put("a", "old", 1, ttl=0.01)
+        queue.put("a", "old", 2, ttl=0.01)
+
+        time.sleep(0.02)
+        queue.purge()
+
+        self.assertEqual(len(queue), 0)
+
+
+class TestOfflineDelivery(TestCase):
+    def test_flush_on_connect(self):
+        manager = IoTManager(Flask(""), offline_queue=OfflineQueue())
+        self.addCleanup(manager.stop)
+        manager.add_type(DeviceType("sensor"))
+
+        manager.emit("set", 1, client_id="sensor_1")
+        manager.emit("set", 2, client_id="sensor_1")
+        manager.emit("skip", 3, client_id="sensor_1", ttl=0)
+
+        socket = RecordingWebSocket(decode=False)
+        manager.add(IoTClient(socket, "sensor_1", "sensor", {}, manager))
+
+        # both messages are delivered in a single batch frame
+        self.assertEqual(len(socket.sent), 1)
+        self.assertEqual(DefaultPacketEncoder.decode(socket.sent[0])[1],
+                         DefaultPacketEncoder.encode("set", 1) + DefaultPacketEncoder.encode("set", 2))
+        self.assertEqual(DefaultPacketEncoder.decode(socket.sent[0])[0], ControlEvent.BATCH.value)
+
+    def test_maintained(self):
+        queue = OfflineQueue(max_memory=0, path=":memory:", purge_interval=0.05, commit_interval=0.01)
+        manager = IoTManager(Flask(""), offline_queue=queue)
+        self.addCleanup(manager.stop)
+
+        manager.emit("old", 1, client_id="sensor_1", ttl=0.01)
+        manager.emit("kept", 2, client_id="sensor_1")
+
+        # expired spilled messages are purged by the manager's timers
+        eventlet.sleep(0.3)
+
+        self.assertEqual(len(queue), 1)
+
+    def test_batched_commits(self):
+        path = os.path.join(tempfile.mkdtemp(), "queue.db")
+        queue = OfflineQueue(max_memory=0, path=path)
+        queue.put("a", "count", 1)
+
+        # the spilled message is only committed once the queue is flushed
+        self.assertEqual(sqlite3.connect(path).execute("SELECT COUNT(*) FROM messages").fetchone()[0], 0)
+
+        queue.flush()
+
+        self.assertEqual(sqlite3.connect(path).execute("SELECT COUNT(*) FROM messages").fetchone()[0], 1)
+        queue.close()
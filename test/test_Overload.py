@@ -0,0 +1,92 @@
+from unittest import TestCase
+from flask import Flask
+from iotio import IoTManager, IoTClient, DeviceType
+from iotio.Control import Priority
+from iotio.Overload import OverloadDetector, OverloadState
+from iotio.PacketEncoder import DefaultPacketEncoder
+from .fakes import RecordingWebSocket
+
+
+class TelemetryType(DeviceType):
+    event_priorities = {"reading": Priority.LOW}
+
+    def __init__(self, type_name: str):
+        super().__init__(type_name)
+        self.received = []
+
+    def on_reading(self, message, client: IoTClient):
+        self.received.append(("reading", message))
+
+    def on_command(self, message, client: IoTClient):
+        self.received.append(("command", message))
+
+
+class TestOverloadDetector(TestCase):
+    def test_stages(self):
+        detector = OverloadDetector(shed_lag=0.1, refuse_lag=0.5, alpha=1)
+
+        detector.sample(0.2)
+        self.assertEqual(detector.state, OverloadState.SHEDDING)
+        self.assertFalse(detector.admits(Priority.LOW))
+        self.assertTrue(detector.admits(Priority.NORMAL))
+
+        detector.sample(0.6)
+        self.assertTrue(detector.refusing)
+        self.assertIn("hub lag", detector.status()["reason"])
+
+        # the state is held until the lag falls below half of the thresholds
+        detector.sample(0.3)
+        self.assertEqual(detector.state, OverloadState.REFUSING)
+
+        detector.sample(0.2)
+        self.assertEqual(detector.state, OverloadState.SHEDDING)
+
+        detector.sample(0.01)
+        self.assertEqual(detector.state, OverloadState.NORMAL)
+        self.assertEqual(detector.dropped, 1)
+
+    def test_outbound(self):
+        detector = OverloadDetector(shed_outbound=10)
+
+        detector.outbound = 10
+        detector.update()
+
+        self.assertTrue(detector.shedding)
+        self.assertEqual(detector.status()["state"], "shedding")
+
+
+class TestLoadShedding(TestCase):
+    def setUp(self):
+        self.manager = IoTManager(Flask(""), overload=OverloadDetector(shed_lag=0.1, alpha=1, interval=60))
+        self.type = TelemetryType("sensor")
+        self.manager.add_type(self.type)
+
+    def tearDown(self):
+        self.manager.stop()
+
+    def test_shed_outbound(self):
+        ws = RecordingWebSocket()
+        self.manager.add(IoTClient(ws, "sensor_1", "sensor", {}, self.manager))
+        self.manager.overload.sample(1)
+
+        self.manager.emit("bulk", 1, client_type="sensor", priority=Priority.LOW)
+        self.manager.emit("command", 2, client_type="sensor")
+
+        self.assertEqual(ws.sent, [("command", 2)])
+
+    def test_shed_inbound(self):
+        ws = RecordingWebSocket([DefaultPacketEncoder.encode("reading", 1), DefaultPacketEncoder.encode("command", 2)])
+        self.manager.overload.sample(1)
+
+        self.manager.serve(IoTClient(ws, "sensor_1", "sensor", {}, self.manager))
+
+        self.assertEqual(self.type.received, [("command", 2)])
+
+    def test_default_priorities(self):
+        device = DeviceType("plain")
+
+        self.assertEqual(device.priority("reading"), Priority.NORMAL)
+
+        # the default mapping is shared by every device type so it can not be written to
+        with self.assertRaises(TypeError):
+            device.event_priorities["reading"] = Priority.LOW
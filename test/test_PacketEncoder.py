@@ -1,5 +1,7 @@
 from unittest import TestCase
-from iotio.PacketEncoder import PacketDataType, DefaultPacketEncoder
+from iotio.PacketEncoder import PacketDataType, AbstractPacketEncoder, DefaultPacketEncoder, PacketLimits, \
+    PacketProblem
+from iotio.exceptions import InvalidPacket
 
 
 class TestPacketDataType(TestCase):
@@ -56,3 +58,44 @@ class TestDefaultPacketEncoder(TestCase):
         self.assertEqual(self.integer_2, DefaultPacketEncoder.decode(self.integer_2_enc)[1])
         self.assertEqual(self.string, DefaultPacketEncoder.decode(self.string_enc)[1])
         self.assertEqual(self.json, DefaultPacketEncoder.decode(self.json_enc)[1])
+
+
+class TestPacketLimits(TestCase):
+    limits = PacketLimits(max_frame_size=64, max_event_size=8, max_payload_size=16)
+
+    def assertProblem(self, data, problem: PacketProblem):
+        with self.assertRaises(InvalidPacket) as context:
+            DefaultPacketEncoder.check(data, self.limits)
+
+        self.assertEqual(context.exception.problem, problem)
+
+    def test_valid(self):
+        DefaultPacketEncoder.check(DefaultPacketEncoder.encode("test", "data"), self.limits)
+
+    def test_violations(self):
+        frame = DefaultPacketEncoder.encode("test", "data")
+
+        self.assertProblem("text frame", PacketProblem.NOT_BINARY)
+        self.assertProblem(DefaultPacketEncoder.encode("test", "a" * 64), PacketProblem.FRAME_TOO_LARGE)
+        self.assertProblem(DefaultPacketEncoder.encode("long_event", "data"), PacketProblem.EVENT_TOO_LARGE)
+        self.assertProblem(DefaultPacketEncoder.encode("test", "a" * 20), PacketProblem.PAYLOAD_TOO_LARGE)
+        self.assertProblem(frame[:5], PacketProblem.TRUNCATED)
+        self.assertProblem(frame[:-1], PacketProblem.SIZE_MISMATCH)
+        self.assertProblem(b'\x09' + frame[1:], PacketProblem.INVALID_TYPE)
+
+    def test_text_encoder(self):
+        # the base check only enforces the size, so encoders for text frames can use it
+        AbstractPacketEncoder.check("text frame", self.limits)
+
+        with self.assertRaises(InvalidPacket) as context:
+            AbstractPacketEncoder.check("\u00e9" * 40, self.limits)
+
+        self.assertEqual(context.exception.problem, PacketProblem.FRAME_TOO_LARGE)
+
+    def test_invalid_json(self):
+        frame = DefaultPacketEncoder.encode("test", {"a": 5})
+
+        with self.assertRaises(InvalidPacket) as context:
+            DefaultPacketEncoder.decode(frame[:-1] + b'!')
+
+        self.assertEqual(context.exception.problem, PacketProblem.INVALID_JSON)
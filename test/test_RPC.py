@@ -0,0 +1,73 @@
+from unittest import TestCase
+from flask import Flask
+from iotio import IoTManager, IoTClient
+from iotio.Control import ControlEvent
+from iotio.exceptions import CallFailed, CallTimeout
+import eventlet
+from .fakes import RecordingWebSocket
+
+
+class TestCallManager(TestCase):
+    def setUp(self):
+        self.manager = IoTManager(Flask(""))
+        self.ws = RecordingWebSocket()
+        self.client = IoTClient(self.ws, "lamp_1", "lamp", {}, self.manager)
+        self.manager.add(self.client)
+
+    def tearDown(self):
+        self.manager.stop()
+
+    def answer(self, message: dict):
+        self.manager.dispatch(self.client, ControlEvent.RESULT.value, message)
+
+    def test_pipelined_calls(self):
+        first = self.manager.call("lamp_1", "brightness", None)
+        second = self.manager.call("lamp_1", "power", None)
+
+        self.assertEqual([message["id"] for event, message in self.ws.sent], [first.id, second.id])
+        self.assertEqual(self.ws.sent[0], (ControlEvent.CALL.value, {"id": first.id, "event": "brightness",
+                                                                     "data": None}))
+
+        results = []
+        first.add_callback(lambda call: results.append(call.result))
+
+        # answers can arrive in any order
+        self.answer({"id": second.id, "data": True})
+        self.answer({"id": first.id, "data": 80})
+
+        self.assertEqual(results, [80])
+        self.assertEqual(second.wait(), True)
+        self.assertEqual(len(self.manager.calls), 0)
+
+    def test_wait(self):
+        call = self.manager.call("lamp_1", "power", None)
+        eventlet.spawn_after(0.01, self.answer, {"id": call.id, "data": False})
+
+        self.assertEqual(call.wait(), False)
+        self.assertGreater(call.latency, 0)
+
+    def test_failures(self):
+        with self.assertRaises(CallFailed):
+            self.manager.call("lamp_2", "power", None).wait()
+
+        error = self.manager.call("lamp_1", "power", None)
+        self.answer({"id": error.id, "error": "busy"})
+
+        with self.assertRaises(CallFailed) as context:
+            error.wait()
+
+        self.assertEqual(context.exception.error, "busy")
+
+        disconnected = self.manager.call("lamp_1", "power", None)
+        self.manager.remove(self.client)
+
+        with self.assertRaises(CallFailed):
+            disconnected.wait()
+
+    def test_timeout(self):
+        call = self.manager.call("lamp_1", "power", None, timeout=0.1)
+
+        with self.assertRaises(CallTimeout):
+            call.wait()
+
+        self.assertEqual(len(self.manager.calls), 0)
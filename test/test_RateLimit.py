@@ -0,0 +1,100 @@
+from unittest import TestCase
+from flask import Flask
+from iotio import IoTManager, IoTClient, DeviceType
+from iotio.Errors import Errors
+from iotio.PacketEncoder import DefaultPacketEncoder
+from iotio.RateLimit import TokenBucket, RateLimit, RateLimitAction
+import time
+
+
+class CountingType(DeviceType):
+    def __init__(self, type_name: str):
+        super().__init__(type_name)
+        self.count = 0
+
+    def on_data(self, message, client: IoTClient):
+        self.count += 1
+
+
+# pretends to be a functioning eventlet WebSocket object which receives the given number of messages
+class ScriptedWebSocket:
+    def __init__(self, count: int):
+        self.messages = [DefaultPacketEncoder.encode("data", i) for i in range(count)]
+        self.sent = []
+        self.websocket_closed = False
+        self.environ = {}
+
+    def send(self, data: bytearray):
+        self.sent.append(DefaultPacketEncoder.decode(data))
+
+    def wait(self):
+        return self.messages.pop(0) if self.messages else None
+
+
+class TestTokenBucket(TestCase):
+    def test_consume(self):
+        bucket = TokenBucket(10, 2)
+        now = bucket.stamp
+
+        self.assertEqual(bucket.consume(1, now, False), 0)
+        self.assertEqual(bucket.consume(1, now, False), 0)
+        self.assertAlmostEqual(bucket.consume(1, now, False), 0.1)
+
+        # refilled after a fifth of a second
+        self.assertEqual(bucket.consume(1, now + 0.2, False), 0)
+
+        # going into debt reports how long until the bucket is empty instead of negative
+        self.assertAlmostEqual(bucket.consume(2, now + 0.2, True), 0.1)
+
+
+class TestRateLimit(TestCase):
+    def serve(self, device: DeviceType, count: int, rate_limit: RateLimit = None) -> ScriptedWebSocket:
+        manager = IoTManager(Flask(""), rate_limit=rate_limit)
+        self.addCleanup(manager.stop)
+        manager.add_type(device)
+
+        socket = ScriptedWebSocket(count)
+        manager.serve(IoTClient(socket, "sensor_1", device.type, {}, manager))
+
+        return socket
+
+    def test_drop(self):
+        device = CountingType("sensor")
+        self.serve(device, 10, RateLimit(messages=1, burst=3, action=RateLimitAction.DROP))
+
+        self.assertEqual(device.count, 3)
+
+    def test_disconnect(self):
+        device = CountingType("sensor")
+        device.rate_limit = RateLimit(bytes_per_second=100, action=RateLimitAction.DISCONNECT)
+        socket = self.serve(device, 10)
+
+        self.assertLess(device.count, 10)
+        self.assertEqual(socket.sent[-1][1]["error"], Errors.CLIENT_RATE_LIMITED.value)
+
+    def test_disconnect_with_session(self):
+        manager = IoTManager(Flask(""), session_grace_period=10)
+        self.addCleanup(manager.stop)
+        device = CountingType("sensor")
+        device.rate_limit = RateLimit(bytes_per_second=100, action=RateLimitAction.DISCONNECT)
+        manager.add_type(device)
+
+        socket = ScriptedWebSocket(10)
+        client = IoTClient(socket, "sensor_1", device.type, {}, manager)
+        manager.serve(client, issue_session=True)
+
+        # the client is removed instead of being held for its session
+        token = socket.sent[0][1]["token"]
+
+        self.assertIsNone(manager.get_client("sensor_1"))
+        self.assertIsNone(manager.sessions.resume(token, "sensor_1", ScriptedWebSocket(0)))
+
+    def test_delay(self):
+        device = CountingType("sensor")
+        device.type_rate_limit = RateLimit(messages=100, burst=0.05)
+
+        start = time.monotonic()
+        self.serve(device, 10)
+
+        self.assertEqual(device.count, 10)
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
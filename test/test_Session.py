@@ -0,0 +1,118 @@
+from unittest import TestCase
+from flask import Flask
+from iotio import IoTManager, IoTClient, DeviceType
+from iotio.Control import ControlEvent
+from iotio.PacketEncoder import DefaultPacketEncoder
+import eventlet
+
+
+class CountingType(DeviceType):
+    def __init__(self, type_name: str):
+        super().__init__(type_name)
+        self.connects = 0
+        self.disconnects = 0
+
+    def on_connect(self, client: IoTClient):
+        self.connects += 1
+
+    def on_disconnect(self, client: IoTClient):
+        self.disconnects += 1
+
+
+# pretends to be a functioning eventlet WebSocket object which connects with the given headers
+class ScriptedWebSocket:
+    def __init__(self, headers: dict):
+        self.environ = {"headers_raw": list(headers.items()), "QUERY_STRING": "", "REQUEST_METHOD": "GET"}
+        self.sent = []
+        self.websocket_closed = False
+
+    def send(self, data: bytearray):
+        self.sent.append(DefaultPacketEncoder.decode(data))
+
+    def close(self):
+        self.websocket_closed = True
+
+    def wait(self):
+        return None
+
+
+class TestSessionManager(TestCase):
+    headers = {
+        "IoT-IO-Id": "sensor_1",
+        "IoT-IO-Type": "sensor",
+        "IoT-IO-ProtocolVersion": "1"
+    }
+
+    def setUp(self):
+        self.manager = IoTManager(Flask(""), session_grace_period=0.05)
+        self.type = CountingType("sensor")
+        self.manager.add_type(self.type)
+
+    def tearDown(self):
+        self.manager.stop()
+
+    def connect(self) -> str:
+        ws = ScriptedWebSocket(self.headers)
+        self.manager.socket(ws)
+
+        event, message = ws.sent[0]
+        self.assertEqual(event, ControlEvent.SESSION.value)
+
+        return message["token"]
+
+    def test_resume(self):
+        token = self.connect()
+        client = self.manager.get_client("sensor_1")
+        self.manager.join(client, "room")
+
+        # the connection ended but the client is held
+        self.assertIs(self.manager.get_client("sensor_1"), client)
+        self.assertEqual(self.type.disconnects, 0)
+
+        self.manager.emit("reading", 5, room="room")
+
+        ws = ScriptedWebSocket(dict(self.headers, **{"IoT-IO-Session": token}))
+        self.manager.socket(ws)
+
+        # pending frames are delivered and no handlers are run again
+        self.assertEqual(ws.sent[0], ("reading", 5))
+        self.assertEqual(self.type.connects, 1)
+        self.assertEqual(client.rooms, ["room"])
+
+        # the client is issued a new token and the old one can not be replayed
+        event, message = ws.sent[1]
+
+        self.assertEqual(event, ControlEvent.SESSION.value)
+        self.assertNotEqual(message["token"], token)
+        self.assertIsNone(self.manager.sessions.resume(token, "sensor_1", ScriptedWebSocket(self.headers)))
+        self.assertIs(self.manager.sessions.resume(message["token"], "sensor_1", ScriptedWebSocket(self.headers)),
+                      client)
+
+    def test_resume_half_open(self):
+        old = ScriptedWebSocket(self.headers)
+        client = IoTClient(old, "sensor_1", "sensor", {}, self.manager)
+        self.manager.add(client)
+        self.manager.sessions.issue(client)
+
+        # the old connection was never noticed to be dead
+        ws = ScriptedWebSocket(self.headers)
+
+        self.assertIs(self.manager.sessions.resume(old.sent[0][1]["token"], "sensor_1", ws), client)
+        self.assertTrue(old.websocket_closed)
+        self.assertIs(client.socket, ws)
+
+    def test_invalid_token(self):
+        self.connect()
+
+        ws = ScriptedWebSocket(dict(self.headers, **{"IoT-IO-Session": "invalid"}))
+        self.manager.socket(ws)
+
+        self.assertEqual(self.type.connects, 2)
+        self.assertEqual(self.type.disconnects, 1)
+
+    def test_grace_period(self):
+        self.connect()
+        eventlet.sleep(0.3)
+
+        self.assertIsNone(self.manager.get_client("sensor_1"))
+        self.assertEqual(self.type.disconnects, 1)
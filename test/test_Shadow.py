@@ -0,0 +1,97 @@
+from unittest import TestCase
+from flask import Flask
+from iotio import IoTManager, IoTClient, SQLiteShadowStore
+from iotio.Control import ControlEvent
+from iotio.Shadow import Shadow, shadow_delta
+from .fakes import RecordingWebSocket
+
+
+class TestShadowDelta(TestCase):
+    def test_delta(self):
+        desired = {"power": True, "level": 5, "color": {"r": 1, "g": 2}}
+        reported = {"power": True, "level": 4, "color": {"r": 1, "g": 3}, "uptime": 10}
+
+        self.assertEqual(shadow_delta(desired, reported), {"level": 5, "color": {"g": 2}})
+        self.assertEqual(shadow_delta(desired, desired), {})
+        self.assertEqual(shadow_delta({"level": 1}, {"level": True}), {"level": 1})
+
+
+class TestShadowManager(TestCase):
+    def setUp(self):
+        self.manager = IoTManager(Flask(""))
+        self.ws = RecordingWebSocket()
+
+    def tearDown(self):
+        self.manager.stop()
+
+    def connect(self) -> IoTClient:
+        client = IoTClient(self.ws, "lamp_1", "lamp", {}, self.manager)
+        self.manager.add(client)
+
+        return client
+
+    def test_offline_writes(self):
+        self.manager.shadows.update("lamp_1", {"power": True, "level": 5})
+        self.manager.shadows.update("lamp_1", {"level": 7, "color": "red"})
+        self.manager.shadows.update("lamp_1", {"color": None})
+
+        self.assertEqual(self.manager.shadows.get("lamp_1").desired_version, 3)
+
+        # the writes are sent as one delta once the client connects
+        self.connect()
+
+        self.assertEqual(self.ws.sent, [(ControlEvent.SHADOW.value, {"version": 3,
+                                                                     "delta": {"power": True, "level": 7}})])
+
+    def test_report(self):
+        client = self.connect()
+        self.assertEqual(self.ws.sent, [])
+
+        self.manager.shadows.update("lamp_1", {"power": True, "level": 5})
+        self.manager.dispatch(client, ControlEvent.REPORT.value, {"power": True, "level": 3})
+
+        shadow = self.manager.shadows.get("lamp_1")
+
+        self.assertEqual(shadow.reported, {"power": True, "level": 3})
+        self.assertEqual(shadow.reported_version, 1)
+        self.assertEqual(shadow.delta, {"level": 5})
+
+        # only the part which was not reported is sent
+        self.manager.shadows.update("lamp_1", {"color": "red"})
+
+        self.assertEqual(self.ws.sent[-1], (ControlEvent.SHADOW.value, {"version": 2,
+                                                                        "delta": {"level": 5, "color": "red"}}))
+
+        # a client which already reached the desired state is not sent anything on reconnect
+        self.manager.dispatch(client, ControlEvent.REPORT.value, {"level": 5, "color": "red"})
+        self.manager.remove(client)
+        self.ws.sent.clear()
+        self.connect()
+
+        self.assertEqual(self.ws.sent, [])
+
+
+class TestSQLiteShadowStore(TestCase):
+    def test_store(self):
+        store = SQLiteShadowStore(":memory:")
+
+        self.assertIsNone(store.load("a"))
+
+        store.save(Shadow("a", {"level": 5}, 2, {"level": {"value": 4}}, 1))
+        shadow = store.load("a")
+
+        self.assertEqual((shadow.desired, shadow.desired_version), ({"level": 5}, 2))
+        self.assertEqual((shadow.reported, shadow.reported_version), ({"level": {"value": 4}}, 1))
+
+        store.delete("a")
+
+        self.assertIsNone(store.load("a"))
+        store.close()
+
+    def test_manager(self):
+        manager = IoTManager(Flask(""), shadow_store=SQLiteShadowStore(":memory:"))
+        self.addCleanup(manager.stop)
+        manager.shadows.update("a", {"level": 5})
+        manager.shadows.update("a", {"power": False})
+
+        self.assertEqual(manager.shadows.get("a").desired, {"level": 5, "power": False})
@@ -0,0 +1,61 @@
+from unittest import TestCase
+from flask import Flask
+from iotio import IoTManager, IoTClient, DeviceType
+from iotio.Control import ControlEvent
+from iotio.Timer import TimingWheel
+import eventlet
+import random
+from .fakes import RecordingWebSocket
+
+
+class TestTimingWheel(TestCase):
+    def test_expiry(self):
+        wheel = TimingWheel(tick=1, slots=4, levels=3)
+        wheel.start = lambda: None
+        fired = []
+
+        for i in range(300):
+            delay = random.randint(1, 63)
+            timer = wheel.schedule(delay, lambda d=wheel.current + delay: fired.append((wheel.current, d)))
+
+            if i % 10 == 0:
+                timer.cancel()
+
+            wheel.advance(random.randint(0, 3))
+
+        wheel.advance(100)
+
+        # every timer which was not cancelled fires exactly on its tick
+        self.assertEqual(len(fired), 270)
+        self.assertTrue(all(current == expected for current, expected in fired))
+
+    def test_cancel(self):
+        wheel = TimingWheel(tick=1, slots=4, levels=2)
+        wheel.start = lambda: None
+
+        timer = wheel.schedule(5, self.fail)
+        self.assertTrue(timer.active)
+
+        timer.cancel()
+        wheel.advance(10)
+        self.assertFalse(timer.active)
+
+
+class TestLiveness(TestCase):
+    def test_heartbeat_and_idle_timeout(self):
+        manager = IoTManager(Flask(""), heartbeat_interval=0.1, idle_timeout=0.3)
+        self.addCleanup(manager.stop)
+        manager.add_type(DeviceType("sensor"))
+
+        socket = RecordingWebSocket()
+        client = IoTClient(socket, "sensor_1", "sensor", {}, manager)
+        manager.add(client)
+
+        eventlet.sleep(0.25)
+        self.assertIn(ControlEvent.PING.value, [event for event, _ in socket.sent])
+        self.assertIn("sensor_1", manager.clients)
+
+        eventlet.sleep(0.3)
+        self.assertNotIn("sensor_1", manager.clients)
+        self.assertTrue(socket.websocket_closed)
+